@@ -3,7 +3,7 @@ from time import perf_counter
 import inspect
 
 from PyQt6 import QtCore, QtGui
-from PyQt6.QtCore import Qt, QRect, QMetaObject, QCoreApplication
+from PyQt6.QtCore import Qt, QRect, QMetaObject, QCoreApplication, QObject, QThread, QTimer, pyqtSignal
 from PyQt6.QtGui import QIcon, QAction, QPixmap, QPainterPath, QPainter,\
                         QKeySequence, QDoubleValidator
 from PyQt6.QtWidgets import (QApplication, QMainWindow, QWidget, QHBoxLayout, QVBoxLayout, \
@@ -17,14 +17,14 @@ import matplotlib.pyplot as plt
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas, NavigationToolbar2QT as NavigationToolbar
 from matplotlib.ticker import MaxNLocator, ScalarFormatter, MultipleLocator
 import matplotlib.style as mplstyle
-from numpy import sqrt, std, mean, ones, linspace, array, nan
-from scipy import signal
-import allantools
+from numpy import sqrt, std, mean, ones, linspace, array, nan, concatenate, flatnonzero
 
 # custom imports
 from bvd_stats import bvd_stat
 from magnicon_ccc import magnicon_ccc
-from create_mag_ccc_datafile import writeDataFile
+from create_mag_ccc_datafile import writeDataFile, write_adev_file, write_psd_file, write_mea_files
+from ccc_analysis import ccc_analysis, ccc_results, calc_allan, calc_spec, calc_coherence
+from batch_analysis import run_batch, batch_parser, batch_kwargs
 import mystat
 from env import env
 from argparse import ArgumentParser
@@ -32,7 +32,9 @@ from argparse import ArgumentParser
 import logging
 from logging.handlers import TimedRotatingFileHandler
 
-from threading import Thread
+from hashlib import sha1
+from tempfile import gettempdir
+from multiprocessing import freeze_support
 
 # base directory of the project
 base_dir = os.path.dirname(os.path.abspath(__file__))
@@ -50,6 +52,8 @@ winSizeH    = 1000
 winSizeV    = 845
 #c           = 0.8465 # specific gravity of oil used
 g           = 9.81 # local acceleration due to gravity
+diagram_cache_size = 50*2**20 # bytes of circuit diagrams kept in the diagrams folder of the cache directory
+follow_interval = 5 # seconds between the reads of a run that is followed while it is being written
 # I- == blue, I+ == Red
 params = {
            'axes.labelsize': 14,
@@ -151,6 +155,151 @@ class timingDiagramWindow(QWidget):
         layout.addWidget(lbl_timing_diagram)
         self.setLayout(layout)
 
+class analysisWorker(QObject):
+    progress = pyqtSignal(str)
+    finished = pyqtSignal(object)
+
+    def __init__(self, analysis: ccc_analysis):
+        """QObject class that reads and analyzes a run (ccc_analysis) on a QThread so the GUI stays
+           responsive, the status of every step is sent with progress and the worker itself with finished.
+           Setting cancelled stops the analysis before its next step.
+        """
+        if debug_mode:
+            logger.debug('In class: ' + self.__class__.__name__ + ' In function: ' + inspect.stack()[0][3])
+        super().__init__()
+        self.analysis = analysis
+        self.cancelled = False
+        self.error = ''
+
+    def run(self) -> None:
+        if debug_mode:
+            logger.debug('In class: ' + self.__class__.__name__ + ' In function: ' + inspect.stack()[0][3])
+        try:
+            self.analysis.run(self.step)
+        except Exception as e:
+            logger.warning('In class: ' + self.__class__.__name__ + ' In function: ' + inspect.stack()[0][3] + \
+                           ' Error: ' + str(e))
+            self.error = str(e)
+            pass
+        self.finished.emit(self)
+
+    def step(self, message: str) -> bool:
+        if not self.cancelled:
+            self.progress.emit(message + '...')
+        return not self.cancelled
+
+class statsWorker(QObject):
+    finished = pyqtSignal(object)
+
+    def __init__(self, tab, calculate):
+        """QObject class that calculates the spectra, Allan deviations or coherences that the plots of tab need
+           on a QThread, calculate is called with the worker and returns them in a dict (see
+           Ui_mainWindow.tabData). The results are kept in result and the worker itself is sent with finished.
+           Setting cancelled skips the deviations that did not start yet, the results are not used.
+        """
+        if debug_mode:
+            logger.debug('In class: ' + self.__class__.__name__ + ' In function: ' + inspect.stack()[0][3])
+        super().__init__()
+        self.tab = tab
+        self.calculate = calculate
+        self.cancelled = False
+        self.result = {}
+        self.error = ''
+
+    def run(self) -> None:
+        if debug_mode:
+            logger.debug('In class: ' + self.__class__.__name__ + ' In function: ' + inspect.stack()[0][3])
+        try:
+            self.result = self.calculate(self)
+        except Exception as e:
+            logger.warning('In class: ' + self.__class__.__name__ + ' In function: ' + inspect.stack()[0][3] + \
+                           ' Error: ' + str(e))
+            self.error = str(e)
+            pass
+        self.finished.emit(self)
+
+class diagramWorker(QObject):
+    finished = pyqtSignal(object)
+
+    def __init__(self, key: tuple, path: str):
+        """QObject class that draws the circuit diagram for the parameters key (see Ui_mainWindow.CCCDiagram)
+           with lcapy and LaTeX to the png file path on a QThread, that takes seconds. The worker itself is
+           sent with finished.
+        """
+        if debug_mode:
+            logger.debug('In class: ' + self.__class__.__name__ + ' In function: ' + inspect.stack()[0][3])
+        super().__init__()
+        self.key = key
+        self.path = path
+        self.error = ''
+
+    def run(self) -> None:
+        if debug_mode:
+            logger.debug('In class: ' + self.__class__.__name__ + ' In function: ' + inspect.stack()[0][3])
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            # drawn to a temporary file first, so a diagram in the cache is always complete
+            tmp = self.path[:-len('.png')] + '_' + str(os.getpid()) + '.tmp.png'
+            self.draw(tmp, *self.key)
+            os.replace(tmp, self.path)
+        except Exception as e:
+            logger.warning('In class: ' + self.__class__.__name__ + ' In function: ' + inspect.stack()[0][3] + \
+                           ' Error: ' + str(e))
+            self.error = str(e)
+            pass
+        self.finished.emit(self)
+
+    @staticmethod
+    def draw(path, R1="0", R2="0", N1="0", N2="0", I1="", I2="", BVD="", Na="1", RH="", RL="", Ia="") -> None:
+        # Draw the circuit diagram
+        # E 15 0 opamp 16 17 V; up, scale=0.3, size=0.4, color=red
+        # W 6 16; right, color=red, size=0.3, scale=0.3
+        # W 9 17; left, color=red, size=0.3, scale=0.3
+        cct = Circuit("""
+            I1 3 2; down, color=red, scale=0.5, l^={I_1}, i_>=""" + str(I1) + """
+            W 3 4; down, steps=|-, free, color=red, size=1
+            W 4 5; down, color=red, size=0.75
+            R1 5 6; down=1, color=red,scale=0.5, l^={R_1}, a_=""" + str(R1) + """, label_style=split
+            W 5 16; right, color=red, size=0.75
+            R2 16 9; down, color=red, scale=0.5, l_={R_2}, a^=""" + str(R2) + """
+            L2 9 10 {N_2}; down, mirror, color=blue, scale=0.5, size=1, l_={N_2}, a^=""" + str(N2) + """
+            W 9 0; right=0.02, ground, color=red, label_nodes=none
+            VM 6 9; right, scale=0.6, color=red, l_={\Delta{U}}, a^=""" + str(BVD) + """
+            W 10 11; down, color=blue, size=1.25
+            W 11 12; right, color=blue, size=0.75
+            W 12 13; up, color=red, size=1.25
+            I2 14 13 {I_2}; down, color=red, scale=0.5, l_={I_2}, i^>=""" + str(I2) + """,
+            W 14 15; up, steps=|-, free, color=red, size=0.75
+            W 15 16; down, color=red, size=0.75
+            L1 6 7 {N_1}; down=1, color=blue, scale=0.5, size=0.5, l^={N_1}, a_=""" + str(N1) + """
+            L3 7 8 {N_A}; down, color=blue, scale=0.5, size=1, l_={N_A}, i^={I_A}, a^=""" + str(Ia) + """
+            R3 1 8; variable, right, color=red, scale=0.5, size=0.75, l^={R_H}, a_=""" + str(RH) + """, label_style=split
+            R4 2 7; variable, right, color=red, scale=0.5, size=0.75, l^={R_L}, a_=""" + str(RL) + """, label_style=split
+            W 1 2; up, color=red, size=1.25
+            S1 circle; color=blue, size=0.4, l^={\phi}
+            W 7 S1.mid; right, dotted, line width=0pt, size=0.5
+            W 10 S1.mid; left, dotted, line width=0pt, size=0.5
+            W S1.s 17; down, color=red, size=0.25, dashed, i={i_f}
+            W 17 13; right, steps=-|, free, color=red, size=0.5, dashed, i={I_f}
+            ;draw_nodes=connections, label_ids=false, label_nodes=none, label_style=aligned, dpi=600""")
+        cct.draw(path, debug=2)
+
+    @staticmethod
+    def evict(folder: str, max_bytes: int) -> None:
+        """Removes the least recently shown diagrams in folder until they use at most max_bytes"""
+        try:
+            files = sorted((i.stat().st_mtime, i.stat().st_size, i.path) for i in os.scandir(folder) \
+                           if i.name.endswith('.png') and not i.name.endswith('.tmp.png'))
+            total = sum(i[1] for i in files)
+            for (mtime, size, path) in files:
+                if total <= max_bytes:
+                    break
+                os.remove(path)
+                total -= size
+        except Exception as e:
+            logger.warning('In function: ' + inspect.stack()[0][3] + ' Error: ' + str(e))
+            pass
+
 class Ui_mainWindow(object):
     def setupUi(self, mainWindow) -> None:
         if debug_mode:
@@ -191,6 +340,7 @@ class Ui_mainWindow(object):
         self.BVDTabSetUp()
         self.AllanTabSetUp()
         self.SpecTabSetUp()
+        self.CohTabSetUp()
 
         # options and actions for the top window menu
         self.file_action = QAction("&Open...")
@@ -263,21 +413,106 @@ class Ui_mainWindow(object):
             pyi_splash.close()
     
     def onTabChanged(self, index: int):
-        if index == 0 and self.dat != None and self.draw_flag == False:
-            try:
-                self.draw_thread = Thread(target = self.CCCDiagram, args=(round(self.dat.R1NomVal, 2), round(self.dat.R2NomVal, 2), \
-                                self.dat.N1, self.dat.N2, format(self.dat.I1, ".1e"), \
-                                format(self.dat.I2, ".1e"), format(self.dat.bvdMean, ".1e"), \
-                                self.dat.NA, "10k*" + str(self.dat.dac12), "10k/" + str(self.dat.rangeShunt), format(self.dat.I1*self.k, ".1e"),), daemon=True)
-                self.draw_thread.start()
-                self.draw_thread.join()
-                self.draw_flag = True
-            except Exception as e:
-                logger.debug('In class: ' + self.__class__.__name__ + ' In function: ' + inspect.stack()[0][3] + ' Error: ' + str(e))
-                self.draw_flag == False
-                if self.draw_thread is not None:
-                    self.draw_thread.join()
-                pass
+        # the plots of a tab are calculated when it is shown
+        self.plotTab(self.tabWidget.widget(index))
+
+    def tabPlots(self) -> dict:
+        """Function that calculates and draws the plots of each tab"""
+        return {self.CCCDiagramTab: lambda: self.CCCDiagram(*self.diagramArgs()), self.voltageTab: self.plotRaw, \
+                self.BVDTab: self.plotBVD, self.AllanTab: self.plotAllan, self.SpecTab: self.plotSpec, \
+                self.CohTab: self.plotCoh}
+
+    def plotTab(self, tab) -> None:
+        """Draws the plots of tab if they are out of date, they stay until invalidate is called for the tab. The
+        spectra, Allan deviations and coherences that the plots need are calculated first by a statsWorker on
+        a QThread, statsCalculated draws the tab when they are done.
+        """
+        if debug_mode:
+            logger.debug('In class: ' + self.__class__.__name__ + ' In function: ' + inspect.stack()[0][3])
+        if self.validFile and tab in self.stale:
+            calculate = self.tabData(tab)
+            if calculate is not None:
+                if not any(worker.tab is tab and not worker.cancelled for (thread, worker) in self.calculators):
+                    self.statusbar.showMessage('Calculating ' + self.tabWidget.tabText(self.tabWidget.indexOf(tab)) + '...')
+                    thread = QThread()
+                    worker = statsWorker(tab, calculate)
+                    worker.moveToThread(thread)
+                    thread.started.connect(worker.run)
+                    worker.finished.connect(self.statsCalculated)
+                    worker.finished.connect(thread.quit)
+                    thread.finished.connect(lambda: self.calculators.remove((thread, worker)))
+                    self.calculators.append((thread, worker))
+                    thread.start()
+                return
+            self.stale.discard(tab)
+            self.tabPlots()[tab]()
+
+    def tabData(self, tab):
+        """Function that calculates the spectra, Allan deviations or coherences that the plots of tab need and
+        are not calculated yet, on a statsWorker with the data and settings of now. None if there are none.
+        """
+        if debug_mode:
+            logger.debug('In class: ' + self.__class__.__name__ + ' In function: ' + inspect.stack()[0][3])
+        dat, corr_bvdList, V1, V2, AA, BB, A, B = self.dat, self.corr_bvdList, self.V1, self.V2, self.AA, self.BB, \
+                                                  self.A, self.B
+        spec = None
+        if tab in (self.SpecTab, self.AllanTab) and self.spec is None:
+            spec = self.specSettings()
+        if tab is self.AllanTab and self.corr_bvdList != []:
+            (overlapping, variance, mytaus, keys) = self.adevSettings()
+        else:
+            keys = ()
+        coh = None
+        if tab is self.CohTab and (self.cohSettings()['segments'], self.cohSettings()['window']) not in self.coh:
+            coh = self.cohSettings()
+        if spec is None and not keys and coh is None:
+            return None
+        def calculate(worker) -> dict:
+            result = {}
+            if spec is not None:
+                result['spec'] = calc_spec(dat, corr_bvdList, A, B, **spec)
+            if keys:
+                result['adev'] = calc_allan(dat, corr_bvdList, V1, V2, AA, BB, A, B, overlapping, variance, mytaus, \
+                                            keys, progress=lambda done: not worker.cancelled)
+            if coh is not None:
+                result['coh'] = {(coh['segments'], coh['window']): calc_coherence(dat, V1, V2, A, B, **coh)}
+            return result
+        return calculate
+
+    def statsCalculated(self, worker: statsWorker) -> None:
+        """Keeps the results of a statsWorker and draws its tab if it is shown"""
+        if debug_mode:
+            logger.debug('In class: ' + self.__class__.__name__ + ' In function: ' + inspect.stack()[0][3])
+        if worker.cancelled:
+            return
+        if 'spec' in worker.result:
+            self.spec = worker.result['spec']
+        if 'adev' in worker.result:
+            self.adev.update(worker.result['adev'])
+            self.adevNew.update(worker.result['adev'])
+        if 'coh' in worker.result:
+            self.coh.update(worker.result['coh'])
+        self.statusbar.clearMessage()
+        if worker.tab is self.tabWidget.currentWidget() and worker.tab in self.stale:
+            # on an error the plots calculate the missing data again and are left empty
+            self.stale.discard(worker.tab)
+            self.tabPlots()[worker.tab]()
+
+    def cancelStats(self) -> None:
+        """Cancels the spectra, deviations and coherences being calculated, their data or settings changed"""
+        if debug_mode:
+            logger.debug('In class: ' + self.__class__.__name__ + ' In function: ' + inspect.stack()[0][3])
+        for (thread, worker) in self.calculators:
+            worker.cancelled = True
+
+    def invalidate(self, *tabs) -> None:
+        """Marks the plots of tabs as out of date, the shown tab is drawn again now and the others when they
+        are shown. cleanUp marks all tabs.
+        """
+        if debug_mode:
+            logger.debug('In class: ' + self.__class__.__name__ + ' In function: ' + inspect.stack()[0][3])
+        self.stale.update(tabs)
+        self.plotTab(self.tabWidget.currentWidget())
 
     def drawTimingDiagram(self,):
         if debug_mode:
@@ -366,8 +601,12 @@ class Ui_mainWindow(object):
             self.stats_thread.join()
         if self.plot_bvd_thread is not None:
             self.plot_bvd_thread.join()
-        if self.draw_thread is not None:
-            self.draw_thread.join()
+        self.cancelLoading()
+        self.cancelStats()
+        self.followTimer.stop()
+        for (thread, worker) in list(self.loaders) + list(self.calculators) + list(self.drawers.values()):
+            thread.quit()
+            thread.wait()
         file_handler.close()
         mainWindow.close()
         self.quit()
@@ -399,17 +638,22 @@ class Ui_mainWindow(object):
         self.plottedRaw   = False
         self.plottedAllan = False
         self.plottedSpec  = False
+        self.plottedCoh   = False
         self.changedDeltaI2R2Ct = 0
         self.changedR1STPBool = False
         self.changedR2STPBool = False
         self.stats_thread = None
         self.plot_bvd_thread = None
-        self.draw_thread = None
-        self.draw_flag = False
+        self.drawers = {} # (QThread, diagramWorker) of the diagrams being drawn by their parameters
+        self.diagram_key = None # parameters of the diagram shown
+        self.loaders = [] # (QThread, analysisWorker) of the runs being analyzed
+        self.calculators = [] # (QThread, statsWorker) of the tabs whose data is being calculated
+        self.stale = set() # tabs with plots that are out of date, they are drawn when shown (see plotTab)
         self.user_warn_msg = ""
         self.deletePressed = False
         self.restorePressed = False
         self.outlierPressed = False
+        self.runGrew = False
 
         self.R1Temp     = 23
         self.R2Temp     = 23
@@ -431,11 +675,14 @@ class Ui_mainWindow(object):
         self.bvdCount     = []
         self.deletedIndex = []
         self.deletedCount = []
-        self.deletedBVD   = []
-        self.deletedR1    = []
-        self.deletedR2    = []
         self.dat          = None # magnicon_ccc class object
         self.bvd_stat_obj = None # bvd_stats class object
+        self.res          = None # ccc_results class object
+        self.adev         = {} # calc_allan results of the BVD, see adevData
+        self.adevNew      = set() # keys of adev calculated since the Allan tab was drawn
+        self.spec         = None # calc_spec results of the BVD, see specData
+        self.h0           = nan
+        self.coh          = {} # calc_coherence results of the run for each (segments, window)
         self.bvdList      = []
         self.corr_bvdList = []
         self.bvdList_chk  = []
@@ -1056,6 +1303,7 @@ class Ui_mainWindow(object):
         self.saveButton.setToolTip('')
         self.C1C2LineEdit.setToolTip('')
         self.chb_outlier.setToolTip('')
+        self.chb_follow.setToolTip('')
 
     def show_tooltip(self) -> None:
         if debug_mode:
@@ -1136,6 +1384,8 @@ class Ui_mainWindow(object):
         self.MDSSButton.setToolTip('Click to save pipe seperated results file')
         self.saveButton.setToolTip('Save a pipe seperated results file')
         self.chb_outlier.setToolTip('Check to remove BVD values that are more than 3 sigma from the mean')
+        self.chb_follow.setToolTip('Check to add the samples of a run that is still being measured every ' + \
+                                   str(follow_interval) + ' s')
         self.lbl_cnOutput_rbv.setToolTip('Compensation output')
     
     def show_warning_dialog(self):
@@ -1169,57 +1419,73 @@ class Ui_mainWindow(object):
         self.lbl_cccdiagram.setSizePolicy(mysp)
         self.CCCDiagram()
     
+    def diagramArgs(self) -> tuple:
+        """Parameters of the circuit diagram of the run for CCCDiagram"""
+        return (round(self.dat.R1NomVal, 2), round(self.dat.R2NomVal, 2), \
+                self.dat.N1, self.dat.N2, format(self.dat.I1, ".1e"), \
+                format(self.dat.I2, ".1e"), format(self.dat.bvdMean, ".1e"), \
+                self.dat.NA, "10k*" + str(self.dat.dac12), "10k/" + str(self.dat.rangeShunt), format(self.dat.I1*self.k, ".1e"))
+
     def CCCDiagram(self, R1="0", R2="0", N1="0", N2="0", I1="", I2="", BVD="", Na="1", RH="", RL="", Ia="") -> None:
-        # Draw the circuit diagram
-        # E 15 0 opamp 16 17 V; up, scale=0.3, size=0.4, color=red
-        # W 6 16; right, color=red, size=0.3, scale=0.3
-        # W 9 17; left, color=red, size=0.3, scale=0.3
-        try:
-            cct = Circuit("""
-            I1 3 2; down, color=red, scale=0.5, l^={I_1}, i_>=""" + str(I1) + """
-            W 3 4; down, steps=|-, free, color=red, size=1
-            W 4 5; down, color=red, size=0.75
-            R1 5 6; down=1, color=red,scale=0.5, l^={R_1}, a_=""" + str(R1) + """, label_style=split
-            W 5 16; right, color=red, size=0.75
-            R2 16 9; down, color=red, scale=0.5, l_={R_2}, a^=""" + str(R2) + """
-            L2 9 10 {N_2}; down, mirror, color=blue, scale=0.5, size=1, l_={N_2}, a^=""" + str(N2) + """
-            W 9 0; right=0.02, ground, color=red, label_nodes=none
-            VM 6 9; right, scale=0.6, color=red, l_={\Delta{U}}, a^=""" + str(BVD) + """
-            W 10 11; down, color=blue, size=1.25
-            W 11 12; right, color=blue, size=0.75
-            W 12 13; up, color=red, size=1.25
-            I2 14 13 {I_2}; down, color=red, scale=0.5, l_={I_2}, i^>=""" + str(I2) + """,
-            W 14 15; up, steps=|-, free, color=red, size=0.75
-            W 15 16; down, color=red, size=0.75
-            L1 6 7 {N_1}; down=1, color=blue, scale=0.5, size=0.5, l^={N_1}, a_=""" + str(N1) + """
-            L3 7 8 {N_A}; down, color=blue, scale=0.5, size=1, l_={N_A}, i^={I_A}, a^=""" + str(Ia) + """
-            R3 1 8; variable, right, color=red, scale=0.5, size=0.75, l^={R_H}, a_=""" + str(RH) + """, label_style=split
-            R4 2 7; variable, right, color=red, scale=0.5, size=0.75, l^={R_L}, a_=""" + str(RL) + """, label_style=split
-            W 1 2; up, color=red, size=1.25
-            S1 circle; color=blue, size=0.4, l^={\phi}
-            W 7 S1.mid; right, dotted, line width=0pt, size=0.5
-            W 10 S1.mid; left, dotted, line width=0pt, size=0.5
-            W S1.s 17; down, color=red, size=0.25, dashed, i={i_f}
-            W 17 13; right, steps=-|, free, color=red, size=0.5, dashed, i={I_f}
-            ;draw_nodes=connections, label_ids=false, label_nodes=none, label_style=aligned, dpi=600""")
-            cct.draw(base_dir + r'\data\ccc_diagram.png', debug=2)
-            plt.close('all')
-            self.pixmap_cccdiagram = QPixmap(base_dir + r'\data\ccc_diagram.png')
-            # Set the pixmap to the label
-            scaled_pixmap = self.pixmap_cccdiagram.scaled(self.lbl_cccdiagram.size(), Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation)
-            self.lbl_cccdiagram.setPixmap(scaled_pixmap)
-            # Resize the label to fit the image
-            self.lbl_cccdiagram.setScaledContents(True)
-            self.lbl_cccdiagram.show()
-        except Exception as e:
-            self.pixmap_cccdiagram = QPixmap(base_dir + r'\data\ccc_diagram_default.png')
-            # Set the pixmap to the label
-            scaled_pixmap = self.pixmap_cccdiagram.scaled(self.lbl_cccdiagram.size(), Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation)
-            self.lbl_cccdiagram.setPixmap(scaled_pixmap)
-            # Resize the label to fit the image
-            self.lbl_cccdiagram.setScaledContents(True)
-            self.lbl_cccdiagram.show()
-        
+        """Shows the circuit diagram for these parameters. A diagram drawn before is read from the diagram
+        cache, otherwise the default image is shown while a diagramWorker draws it on a QThread. Without a
+        cache directory the diagram is drawn to a temporary file of its parameters that is removed once shown.
+        """
+        if debug_mode:
+            logger.debug('In class: ' + self.__class__.__name__ + ' In function: ' + inspect.stack()[0][3])
+        key = (R1, R2, N1, N2, I1, I2, BVD, Na, RH, RL, Ia)
+        self.diagram_key = key
+        name = sha1(repr(key).encode()).hexdigest()[:16]
+        if cachedir != '':
+            path = os.path.join(cachedir, 'diagrams', name + '.png')
+        else:
+            path = os.path.join(gettempdir(), 'ccc_diagram_' + name + '_' + str(os.getpid()) + '.png')
+        if cachedir != '' and os.path.exists(path):
+            try:
+                # the most recently shown diagrams are kept when the cache is full
+                os.utime(path)
+            except OSError:
+                pass
+            self.setDiagram(path)
+            return
+        self.setDiagram(base_dir + r'\data\ccc_diagram_default.png')
+        if key in self.drawers:
+            return
+        thread = QThread()
+        worker = diagramWorker(key, path)
+        worker.moveToThread(thread)
+        thread.started.connect(worker.run)
+        worker.finished.connect(self.diagramDrawn)
+        worker.finished.connect(thread.quit)
+        thread.finished.connect(lambda: self.drawers.pop(key, None))
+        self.drawers[key] = (thread, worker)
+        thread.start()
+
+    def diagramDrawn(self, worker) -> None:
+        """Shows a diagram drawn by a diagramWorker if it is still the one of the run"""
+        if debug_mode:
+            logger.debug('In class: ' + self.__class__.__name__ + ' In function: ' + inspect.stack()[0][3])
+        plt.close('all')
+        if worker.error == '' and worker.key == self.diagram_key:
+            self.setDiagram(worker.path)
+        if cachedir != '':
+            diagramWorker.evict(os.path.join(cachedir, 'diagrams'), diagram_cache_size)
+        else:
+            # the pixmap is in memory, the diagram is not kept without a cache
+            try:
+                os.remove(worker.path)
+            except OSError:
+                pass
+
+    def setDiagram(self, path: str) -> None:
+        self.pixmap_cccdiagram = QPixmap(path)
+        # Set the pixmap to the label
+        scaled_pixmap = self.pixmap_cccdiagram.scaled(self.lbl_cccdiagram.size(), Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation)
+        self.lbl_cccdiagram.setPixmap(scaled_pixmap)
+        # Resize the label to fit the image
+        self.lbl_cccdiagram.setScaledContents(True)
+        self.lbl_cccdiagram.show()
+
     def voltageTabSetUp(self) -> None:
         if debug_mode:
             logger.debug('In class: ' + self.__class__.__name__ + ' In function: ' + inspect.stack()[0][3])
@@ -1342,6 +1608,12 @@ class Ui_mainWindow(object):
         self.chb_outlier.setTristate(False)
         self.chb_outlier.setCheckState(Qt.CheckState.Unchecked)
         self.chb_outlier.stateChanged.connect(self.changedOutlier)
+        self.chb_follow = QCheckBox("Follow", parent=gridWidget)
+        self.chb_follow.setTristate(False)
+        self.chb_follow.setCheckState(Qt.CheckState.Unchecked)
+        self.chb_follow.stateChanged.connect(self.changedFollow)
+        self.followTimer = QTimer()
+        self.followTimer.timeout.connect(self.followRun)
         # self.LogoLabelBVD = QLabel(parent=gridWidget)
         # self.LogoLabelBVD.setPixmap(self.LogoPixmap)
         # self.LogoLabelBVD.setGeometry(QRect(550, 700, 300, 76))
@@ -1354,6 +1626,7 @@ class Ui_mainWindow(object):
         grid.addWidget(self.RestoreBut, 1, 3, 2, 1)
         grid.addWidget(self.RePlotBut, 3, 3, 2, 1)
         grid.addWidget(self.chb_outlier, 1, 4, 2, 1)
+        grid.addWidget(self.chb_follow, 3, 4, 2, 1)
         grid.addItem(Spacer2, 1, 4)
         grid.addItem(Spacer2, 3, 4)
         # grid.addWidget(self.LogoLabelBVD, 2, 5, 3, 2)
@@ -1572,6 +1845,132 @@ class Ui_mainWindow(object):
         grid.addWidget (lbl_alpha_bvb, 5, 3, 1, 1)
         grid.addWidget(self.le_alpha_bvb, 7, 3, 1, 1)
 
+        # settings of the Welch PSD
+        lbl_segments = QLabel('PSD segments', parent=gridWidget)
+        self.SegmentsComboBox = QComboBox(parent=gridWidget)
+        self.SegmentsComboBox.setEditable(False)
+        for i in ('1', '2', '4', '8', '16', '32'):
+            self.SegmentsComboBox.addItem(i)
+        self.SegmentsComboBox.setFixedWidth(100)
+        self.SegmentsComboBox.currentIndexChanged.connect(self.replotSpec)
+
+        lbl_overlap = QLabel('PSD overlap', parent=gridWidget)
+        self.OverlapComboBox = QComboBox(parent=gridWidget)
+        self.OverlapComboBox.setEditable(False)
+        for i in ('50 %', '0 %', '75 %'):
+            self.OverlapComboBox.addItem(i)
+        self.OverlapComboBox.setFixedWidth(100)
+        self.OverlapComboBox.currentIndexChanged.connect(self.replotSpec)
+
+        lbl_window = QLabel('PSD window', parent=gridWidget)
+        self.WindowComboBox = QComboBox(parent=gridWidget)
+        self.WindowComboBox.setEditable(False)
+        for i in ('hann', 'rect', 'welch'):
+            self.WindowComboBox.addItem(i)
+        self.WindowComboBox.setFixedWidth(100)
+        self.WindowComboBox.currentIndexChanged.connect(self.replotSpec)
+
+        grid.addWidget(lbl_segments, 1, 4, 1, 1)
+        grid.addWidget(self.SegmentsComboBox, 3, 4, 1, 1)
+
+        grid.addWidget(lbl_overlap, 1, 5, 1, 1)
+        grid.addWidget(self.OverlapComboBox, 3, 5, 1, 1)
+
+        grid.addWidget(lbl_window, 1, 6, 1, 1)
+        grid.addWidget(self.WindowComboBox, 3, 6, 1, 1)
+
+    def CohTabSetUp(self) -> None:
+        """Set up the tab widget for showing the coherence and cross spectral density of C1 and C2 and of
+        I- and I+
+        Returns
+        -------
+        None.
+        """
+        if debug_mode:
+            logger.debug('In class: ' + self.__class__.__name__ + ' In function: ' + inspect.stack()[0][3])
+        global winSizeH
+        self.CohTab = QWidget()
+        self.tabWidget.addTab(self.CohTab, "")
+        self.CohVerticalLayoutWidget = QWidget(parent=self.CohTab)
+        self.CohVerticalLayoutWidget.setGeometry(QRect(0, 0, winSizeH - 125, 675))
+        self.CohVerticalLayout = QVBoxLayout(self.CohVerticalLayoutWidget)
+
+        self.Cohfig = plt.figure()
+        self.Cohax1 = self.Cohfig.add_subplot(2,2,1)
+        self.Cohax2 = self.Cohfig.add_subplot(2,2,2)
+        self.Cohax3 = self.Cohfig.add_subplot(2,2,3)
+        self.Cohax4 = self.Cohfig.add_subplot(2,2,4)
+        for ax in (self.Cohax1, self.Cohax2, self.Cohax3, self.Cohax4):
+            ax.tick_params(axis='both', which='both', direction='in')
+            ax.set_xlabel('Frequency [Hz]')
+            ax.set_xscale('log')
+            ax.grid(which='both')
+
+        self.Cohax1.set_ylabel('Coherence')
+        self.Cohax1.set_ylim(0, 1.05)
+        self.Cohax2.set_ylabel('Coherence')
+        self.Cohax2.set_ylim(0, 1.05)
+        self.Cohax3.set_ylabel('|CSD| [$V^2$/' + 'Hz' + ']')
+        self.Cohax3.set_yscale('log')
+        self.Cohax4.set_ylabel('|CSD| [$V^2$/' + 'Hz' + ']')
+        self.Cohax4.set_yscale('log')
+
+        self.Cohfig.set_tight_layout(True)
+        self.CohCanvas = FigureCanvas(self.Cohfig)
+
+        self.CohVerticalLayout.addWidget(NavigationToolbar(self.CohCanvas))
+        self.CohVerticalLayout.addWidget(self.CohCanvas)
+
+        gridWidget = QWidget(self.CohTab)
+        gridWidget.setGeometry(QRect(0, 675, winSizeH-125, 90))
+        grid = QGridLayout(gridWidget)
+        grid.setSpacing(5)
+
+        lbl_coh_C12 = QLabel('Mean coherence C1, C2', parent=gridWidget)
+        self.le_coh_C12 = QLineEdit(gridWidget)
+        self.le_coh_C12.setReadOnly(True)
+        self.le_coh_C12.setFixedWidth(130)
+        self.le_coh_C12.setFixedHeight(18)
+        self.le_coh_C12.setStyleSheet(
+                """QLineEdit { background-color: rgb(215, 214, 213); color: black}""")
+
+        lbl_coh_bv = QLabel('Mean coherence I-, I+', parent=gridWidget)
+        self.le_coh_bv = QLineEdit(gridWidget)
+        self.le_coh_bv.setReadOnly(True)
+        self.le_coh_bv.setFixedWidth(130)
+        self.le_coh_bv.setFixedHeight(18)
+        self.le_coh_bv.setStyleSheet(
+                """QLineEdit { background-color: rgb(215, 214, 213); color: black}""")
+
+        # segments, overlapping by half, and window of spectral.mycsdcoherence
+        lbl_coh_segments = QLabel('Segments', parent=gridWidget)
+        self.CohSegmentsComboBox = QComboBox(parent=gridWidget)
+        self.CohSegmentsComboBox.setEditable(False)
+        for i in ('8', '2', '4', '16', '32'):
+            self.CohSegmentsComboBox.addItem(i)
+        self.CohSegmentsComboBox.setFixedWidth(100)
+        self.CohSegmentsComboBox.currentIndexChanged.connect(self.replotCoh)
+
+        lbl_coh_window = QLabel('Window', parent=gridWidget)
+        self.CohWindowComboBox = QComboBox(parent=gridWidget)
+        self.CohWindowComboBox.setEditable(False)
+        for i in ('hann', 'rect'):
+            self.CohWindowComboBox.addItem(i)
+        self.CohWindowComboBox.setFixedWidth(100)
+        self.CohWindowComboBox.currentIndexChanged.connect(self.replotCoh)
+
+        grid.addWidget(lbl_coh_C12, 1, 1, 1, 1)
+        grid.addWidget(self.le_coh_C12, 3, 1, 1, 1)
+
+        grid.addWidget(lbl_coh_bv, 1, 2, 1, 1)
+        grid.addWidget(self.le_coh_bv, 3, 2, 1, 1)
+
+        grid.addWidget(lbl_coh_segments, 1, 3, 1, 1)
+        grid.addWidget(self.CohSegmentsComboBox, 3, 3, 1, 1)
+
+        grid.addWidget(lbl_coh_window, 1, 4, 1, 1)
+        grid.addWidget(self.CohWindowComboBox, 3, 4, 1, 1)
+
     def setButtons(self) -> None:
         global red_style
         if debug_mode:
@@ -1743,6 +2142,7 @@ class Ui_mainWindow(object):
         self.tabWidget.setTabText(self.tabWidget.indexOf(self.BVDTab), _translate("mainWindow", "BVD"))
         self.tabWidget.setTabText(self.tabWidget.indexOf(self.AllanTab), _translate("mainWindow", "Allan Dev."))
         self.tabWidget.setTabText(self.tabWidget.indexOf(self.SpecTab), _translate("mainWindow", "Power Spec."))
+        self.tabWidget.setTabText(self.tabWidget.indexOf(self.CohTab), _translate("mainWindow", "Coherence"))
         self.txtFileLabel.setText(_translate("mainWindow", ".txt file"))
         self.VMeanChkLabel.setText(_translate("mainWindow", "Mean Chk [V]"))
         self.StdDevChkLabel.setText(_translate("mainWindow", "Std. Dev. Chk [V]"))
@@ -1772,8 +2172,8 @@ class Ui_mainWindow(object):
                     pass
                 else:
                     self.BB_used_2d.append(i)
-            aa_2d = array(self.AA_used_2d).flatten().tolist()
-            bb_2d = array(self.BB_used_2d).flatten().tolist()
+            aa_2d = concatenate(self.AA_used_2d)
+            bb_2d = concatenate(self.BB_used_2d)
             
             count_aa_2D = linspace(0, len(aa_2d)-1, num=len(aa_2d))
             count_bb_2D = linspace(0, len(bb_2d)-1, num=len(bb_2d))
@@ -1912,7 +2312,7 @@ class Ui_mainWindow(object):
         self.R1STP = float(self.R1STPLineEdit.text())
         self.results(self.dat, self.R1Temp, self.R2Temp, self.R1TotPres, self.R2TotPres)
         self.setValidData()
-        self.plotBVD()
+        self.invalidate(self.BVDTab)
 
     def changedR2STPPred(self,):
         if debug_mode:
@@ -1921,7 +2321,7 @@ class Ui_mainWindow(object):
         self.R2STP = float(self.R2STPLineEdit.text())
         self.results(self.dat, self.R1Temp, self.R2Temp, self.R1TotPres, self.R2TotPres)
         self.setValidData()
-        self.plotBVD()
+        self.invalidate(self.BVDTab)
         return
 
     def changedDeltaI2R2(self, ):
@@ -1933,7 +2333,7 @@ class Ui_mainWindow(object):
             self.getBVD()
             self.results(self.dat, self.R1Temp, self.R2Temp, self.R1TotPres, self.R2TotPres)
             self.setValidData()
-            self.plotBVD()
+            self.invalidate(self.BVDTab)
 
     # def changedSamplesUsed(self, ):
     #     if debug_mode:
@@ -1959,8 +2359,66 @@ class Ui_mainWindow(object):
         self.getBVD()
         self.results(self.dat, self.R1Temp, self.R2Temp, self.R1TotPres, self.R2TotPres)
         self.setValidData()
-        self.plotBVD()
-        self.plotStatMeasures()
+        self.invalidate()
+
+    def changedFollow(self, state):
+        if debug_mode:
+            logger.debug('In class: ' + self.__class__.__name__ + ' In function: ' + inspect.stack()[0][3])
+        if state == 2:
+            self.followTimer.start(int(follow_interval*1000))
+        else:
+            self.followTimer.stop()
+
+    def followRun(self) -> None:
+        """Adds the samples that the Magnicon software appended to the raw data file since the last call, every
+        follow_interval seconds while Follow is checked. Only the new lines are parsed (magnicon_ccc.append_raw)
+        and only the new samples and the incomplete last half cycle are averaged (bvd_stat.update). The
+        ratios and statistics are calculated from the first BVD that changed (ccc_results.extend), unless the
+        outliers are removed, the 3 sigma limits change with every BVD. The run is read again when it stopped.
+        """
+        if debug_mode:
+            logger.debug('In class: ' + self.__class__.__name__ + ' In function: ' + inspect.stack()[0][3])
+        if not self.validFile or self.loaders or self.res is None or self.bvd_stat_obj is None:
+            return
+        try:
+            appended = self.dat.append_raw()
+            if appended == -1:
+                # the header was written again when the run stopped
+                self.getData()
+                return
+            elif appended == 0:
+                return
+            self.dat.load_bvd()
+            count = len(self.corr_bvdList)
+            self.bvdCount = []
+            if self.outliers:
+                self.corr_bvdList, self.bvdList_chk, self.res = [], [], None
+                self.getBVD(update=True)
+                self.results(self.dat, self.R1Temp, self.R2Temp, self.R1TotPres, self.R2TotPres)
+            else:
+                self.getBVD(update=True)
+                # the deleted BVDs stay deleted
+                self.res.extend(self.V1, self.V2, self.corr_bvdList, self.stdbvdList, self.bvdList_chk)
+                for name in ccc_results.attributes:
+                    setattr(self, name, getattr(self.res, name))
+                self.bvdCount = flatnonzero(self.res.masks['corr_bvdList']).tolist()
+                for i in range(count, len(self.corr_bvdList)):
+                    self.plotCountCombo.insertItem(0, f'ct {i}')
+                self.runGrew = True
+        except Exception as e:
+            logger.warning('In class: ' + self.__class__.__name__ + ' In function: ' + inspect.stack()[0][3] + \
+                           ' Error: ' + str(e))
+            return
+        # the warnings of the run were shown when it was read
+        user_warn_msg = self.user_warn_msg
+        self.setValidData()
+        self.user_warn_msg = user_warn_msg
+        self.cancelStats()
+        self.adev = {}
+        self.spec = None
+        self.coh = {}
+        self.invalidate(*self.tabPlots())
+        self.statusbar.showMessage(str(appended) + ' samples added, ' + str(self.N) + ' BVDs', 5000)
 
     def changedIgnoredFirst(self, ):
         if debug_mode:
@@ -1971,8 +2429,7 @@ class Ui_mainWindow(object):
             self.getBVD()
             self.results(self.dat, self.R1Temp, self.R2Temp, self.R1TotPres, self.R2TotPres)
             self.setValidData()
-            self.plotBVD()
-            self.plotStatMeasures()
+            self.invalidate()
 
     def changedIgnoredLast(self, ):
         if debug_mode:
@@ -1983,8 +2440,7 @@ class Ui_mainWindow(object):
             self.getBVD()
             self.results(self.dat, self.R1Temp, self.R2Temp, self.R1TotPres, self.R2TotPres)
             self.setValidData()
-            self.plotBVD()
-            self.plotStatMeasures()
+            self.invalidate()
 
     def is_overlapping(self, overlapping: str) -> bool:
         if debug_mode:
@@ -2004,16 +2460,72 @@ class Ui_mainWindow(object):
             x = x*2
         return arr
 
+    def noiseLabel(self, tau: list, alpha: list) -> str:
+        """Dominant noise types over the octave tau ranges of an Allan deviation, e.g.
+        White FM (60-480 s), Flicker PM (960 s)
+        """
+        if debug_mode:
+            logger.debug('In class: ' + self.__class__.__name__ + ' In function: ' + inspect.stack()[0][3])
+        ranges = []
+        for t, a in zip(tau, alpha):
+            m = int(round(t/tau[0]))
+            # only octave taus to keep the legend short with all taus, nan where there were too few averages
+            if m & (m - 1) != 0 or a not in mystat.noise_types:
+                continue
+            if ranges != [] and ranges[-1][0] == a:
+                ranges[-1][2] = t
+            else:
+                ranges.append([a, t, t])
+        label = []
+        for a, first, last in ranges:
+            if first == last:
+                label.append(mystat.noise_types[a] + f' ({first:.4g} s)')
+            else:
+                label.append(mystat.noise_types[a] + f' ({first:.4g}-{last:.4g} s)')
+        return ', '.join(label)
+
+    def adevData(self) -> dict:
+        """Results of calc_allan with the settings of the Allan tab, only the deviations that are not in adev
+        are calculated, see plotAdev and deletedChanged
+        """
+        if debug_mode:
+            logger.debug('In class: ' + self.__class__.__name__ + ' In function: ' + inspect.stack()[0][3])
+        (overlapping, variance, mytaus, keys) = self.adevSettings()
+        if keys:
+            self.adev.update(calc_allan(self.dat, self.corr_bvdList, self.V1, self.V2, self.AA, self.BB, self.A, self.B, \
+                                        overlapping, variance, mytaus, keys))
+            self.adevNew.update(keys)
+        return self.adev
+
+    def adevSettings(self) -> tuple:
+        """Overlapping, variance and taus of calc_allan from the Allan tab and the keys of the deviations that
+        are not in adev
+        """
+        if debug_mode:
+            logger.debug('In class: ' + self.__class__.__name__ + ' In function: ' + inspect.stack()[0][3])
+        if self.AllanTypeComboBox.currentText() == '2^n (octave)':
+            # tau_list = self.powers_of_2(int(len(self.corr_bvdList)//2))
+            mytaus = 'octave'
+        elif self.AllanTypeComboBox.currentText() == 'all':
+            # tau_list = list(map(int, linspace(1, len(self.corr_bvdList)//2, len(self.corr_bvdList)//2)))
+            mytaus = 'all'
+        keys = tuple(i for i in ('bvd', 'C1', 'C2', 'aa', 'bb', 'bva', 'bvb') if i not in self.adev)
+        return (self.overlapping, self.VarianceTypeComboBox.currentText(), mytaus, keys)
+
     def plotAllan(self) -> None:
+        """Plots the Allan deviations and writes them to the _pyadev.txt file. If only the deviations of the
+        BVD, C1 and C2 data changed (deletedChanged) only they are calculated and redrawn.
+        """
         if debug_mode:
             logger.debug('In class: ' + self.__class__.__name__ + ' In function: ' + inspect.stack()[0][3])
+        bvd_only = self.plottedAllan and all(i in self.adev and i not in self.adevNew for i in ('aa', 'bb', 'bva', 'bvb'))
         if self.corr_bvdList != []:
-            if self.AllanTypeComboBox.currentText() == '2^n (octave)':
-                # tau_list = self.powers_of_2(int(len(self.corr_bvdList)//2))
-                mytaus = 'octave'
-            elif self.AllanTypeComboBox.currentText() == 'all':
-                # tau_list = list(map(int, linspace(1, len(self.corr_bvdList)//2, len(self.corr_bvdList)//2)))
-                mytaus = 'all'
+            try:
+                # the white noise level of the BVD
+                self.h0 = self.specData()['h0']
+            except Exception as e:
+                logger.warning('In class: ' + self.__class__.__name__ + ' In function: ' + inspect.stack()[0][3] + ' Error: ' + str(e))
+                pass
             # tau list is same for all...
             # tau_list_C1 = tau_list
             # tau_list_C2 = tau_list
@@ -2024,44 +2536,20 @@ class Ui_mainWindow(object):
             # C2_tau, C2_adev, C2_aerr = mystat.adev(array(self.V2), self.overlapping, tau_list_C2)
             # bva_tau, bva_adev, bva_aerr = mystat.adev(array(self.A), self.overlapping, tau_list_bva)
             # bvb_tau, bvb_adev, bvb_aerr = mystat.adev(array(self.B), self.overlapping, tau_list_bvb)
-            # using allantools because it is faster than O(n^2)
+            # using mystat.deviation (same results as allantools), one numpy pass per tau: O(n log n) for the octave
+            # taus, still O(n^2) for all taus, which is what makes 'all' slow on the raw BV (aa, bb) series
             # print(self.dat.intTime, self.dat.timeBase)
             # print("sampling times: ", self.dat.fullCyc, self.dat.intTime/self.dat.timeBase, self.dat.dt )
             try:
-                if self.overlapping:
-                    if self.VarianceTypeComboBox.currentText() == 'Allan':
-                        (bvd_tau_time, bvd_adev, bvd_aerr, bvd_adn) = allantools.oadev(array(self.corr_bvdList), rate=1./self.dat.fullCyc, data_type="freq", taus=mytaus)
-                        (C1_tau, C1_adev, C1_aerr, C1_adn) = allantools.oadev(array(self.V1), rate=1./self.dat.fullCyc, data_type="freq", taus=mytaus)
-                        (C2_tau, C2_adev, C2_aerr, C2_adn) = allantools.oadev(array(self.V2), rate=1./self.dat.fullCyc, data_type="freq", taus=mytaus)
-                        (aa_tau_time, aa_adev, aa_aerr, aa_adn) = allantools.oadev(array(self.AA), rate=1./(self.dat.intTime/self.dat.timeBase), data_type="freq", taus=mytaus)
-                        (bb_tau_time, bb_adev, bb_aerr, bb_adn) = allantools.oadev(array(self.BB), rate=1./(self.dat.intTime/self.dat.timeBase), data_type="freq", taus=mytaus)
-                        (bva_tau_time, bva_adev, bva_aerr, bva_adn) = allantools.oadev(array(self.A), rate=1./self.dat.dt, data_type="freq", taus=mytaus)
-                        (bvb_tau_time, bvb_adev, bvb_aerr, bvb_adn) = allantools.oadev(array(self.B), rate=1./self.dat.dt, data_type="freq", taus=mytaus)
-                    elif self.VarianceTypeComboBox.currentText() == 'Hadamard':
-                        (bvd_tau_time, bvd_adev, bvd_aerr, bvd_adn) = allantools.ohdev(array(self.corr_bvdList), rate=1./self.dat.fullCyc, data_type="freq", taus=mytaus)
-                        (C1_tau, C1_adev, C1_aerr, C1_adn) = allantools.ohdev(array(self.V1), rate=1./self.dat.fullCyc, data_type="freq", taus=mytaus)
-                        (C2_tau, C2_adev, C2_aerr, C2_adn) = allantools.ohdev(array(self.V2), rate=1./self.dat.fullCyc, data_type="freq", taus=mytaus)
-                        (aa_tau_time, aa_adev, aa_aerr, aa_adn) = allantools.ohdev(array(self.AA), rate=1./(self.dat.intTime/self.dat.timeBase), data_type="freq", taus=mytaus)
-                        (bb_tau_time, bb_adev, bb_aerr, bb_adn) = allantools.ohdev(array(self.BB), rate=1./(self.dat.intTime/self.dat.timeBase), data_type="freq", taus=mytaus)
-                        (bva_tau_time, bva_adev, bva_aerr, bva_adn) = allantools.ohdev(array(self.A), rate=1./self.dat.dt, data_type="freq", taus=mytaus)
-                        (bvb_tau_time, bvb_adev, bvb_aerr, bvb_adn) = allantools.ohdev(array(self.B), rate=1./self.dat.dt, data_type="freq", taus=mytaus)
-                else:
-                    if self.VarianceTypeComboBox.currentText() == 'Allan':
-                        (bvd_tau_time, bvd_adev, bvd_aerr, bvd_adn) = allantools.adev(array(self.corr_bvdList), rate=1./self.dat.fullCyc, data_type="freq", taus=mytaus)  # Compute the overlapping ADEV
-                        (C1_tau, C1_adev, C1_aerr, C1_adn) = allantools.adev(array(self.V1), rate=1./self.dat.fullCyc, data_type="freq", taus=mytaus)
-                        (C2_tau, C2_adev, C2_aerr, C2_adn) = allantools.adev(array(self.V2), rate=1./self.dat.fullCyc, data_type="freq", taus=mytaus)
-                        (aa_tau_time, aa_adev, aa_aerr, aa_adn) = allantools.adev(array(self.AA), rate=1./(self.dat.intTime/self.dat.timeBase), data_type="freq", taus=mytaus)
-                        (bb_tau_time, bb_adev, bb_aerr, bb_adn) = allantools.adev(array(self.BB), rate=1./(self.dat.intTime/self.dat.timeBase), data_type="freq", taus=mytaus)
-                        (bva_tau_time, bva_adev, bva_aerr, bva_adn) = allantools.adev(array(self.A), rate=1./self.dat.dt, data_type="freq", taus=mytaus)
-                        (bvb_tau_time, bvb_adev, bvb_aerr, bvb_adn) = allantools.adev(array(self.B), rate=1./self.dat.dt, data_type="freq", taus=mytaus)
-                    elif self.VarianceTypeComboBox.currentText() == 'Hadamard':
-                        (bvd_tau_time, bvd_adev, bvd_aerr, bvd_adn) = allantools.hdev(array(self.corr_bvdList), rate=1./self.dat.fullCyc, data_type="freq", taus=mytaus)  # Compute the overlapping ADEV
-                        (C1_tau, C1_adev, C1_aerr, C1_adn) = allantools.hdev(array(self.V1), rate=1./self.dat.fullCyc, data_type="freq", taus=mytaus)
-                        (C2_tau, C2_adev, C2_aerr, C2_adn) = allantools.hdev(array(self.V2), rate=1./self.dat.fullCyc, data_type="freq", taus=mytaus)
-                        (aa_tau_time, aa_adev, aa_aerr, aa_adn) = allantools.hdev(array(self.AA), rate=1./(self.dat.intTime/self.dat.timeBase), data_type="freq", taus=mytaus)
-                        (bb_tau_time, bb_adev, bb_aerr, bb_adn) = allantools.hdev(array(self.BB), rate=1./(self.dat.intTime/self.dat.timeBase), data_type="freq", taus=mytaus)
-                        (bva_tau_time, bva_adev, bva_aerr, bva_adn) = allantools.hdev(array(self.A), rate=1./self.dat.dt, data_type="freq", taus=mytaus)
-                        (bvb_tau_time, bvb_adev, bvb_aerr, bvb_adn) = allantools.hdev(array(self.B), rate=1./self.dat.dt, data_type="freq", taus=mytaus)
+                adev = self.adevData()
+                (bvd_tau_time, bvd_adev, bvd_aerr, bvd_adn) = adev['bvd']
+                (C1_tau, C1_adev, C1_aerr, C1_adn) = adev['C1']
+                (C2_tau, C2_adev, C2_aerr, C2_adn) = adev['C2']
+                (aa_tau_time, aa_adev, aa_aerr, aa_adn) = adev['aa']
+                (bb_tau_time, bb_adev, bb_aerr, bb_adn) = adev['bb']
+                (bva_tau_time, bva_adev, bva_aerr, bva_adn) = adev['bva']
+                (bvb_tau_time, bvb_adev, bvb_aerr, bvb_adn) = adev['bvb']
+                bvd_noise = self.noiseLabel(bvd_tau_time, adev['noise_bvd'])
             except Exception as e:
                 logger.warning('In class: ' + self.__class__.__name__ + ' In function: ' + inspect.stack()[0][3] + ' Error: ' + str(e))
                 bvd_tau_time, bvd_adev, bvd_aerr, bvd_adn,\
@@ -2071,7 +2559,11 @@ class Ui_mainWindow(object):
                 bb_tau_time, bb_adev, bb_aerr, bb_adn, \
                 bva_tau_time, bva_adev, bva_aerr, bva_adn, \
                 bvb_tau_time, bvb_adev, bvb_aerr, bvb_adn  = ([] for _ in range(28))
+                bvd_noise = ''
+                self.adev = {}
+                bvd_only = False
                 pass
+            self.adevNew.clear()
             rttau = []
             # bvd_tau_time = []
             # for i in bvd_tau:
@@ -2085,9 +2577,16 @@ class Ui_mainWindow(object):
             for i in bvd_tau_time:
                 rttau.append(sqrt(self.h0)*sqrt(1/(2*i)))
 
-            if self.plottedAllan:
+            if bvd_only:
+                self.Allanax1_ref[0].set_data(array(bvd_tau_time), array(bvd_adev))
+                self.Allanax1_ref[0].set_label(bvd_noise)
+                self.Allanax11_ref[0].set_data(array(bvd_tau_time), array(rttau))
+                self.Allanax21_ref[0].set_data(array(C1_tau), array(C1_adev))
+                self.Allanax22_ref[0].set_data(array(C2_tau), array(C2_adev))
+            elif self.plottedAllan:
                 self.clearAllanPlot()
                 self.Allanax1_ref[0].set_data(array(bvd_tau_time), array(bvd_adev))
+                self.Allanax1_ref[0].set_label(bvd_noise)
                 self.Allanax11_ref[0].set_data(array(bvd_tau_time), array(rttau))
                 self.Allanax21_ref[0].set_data(array(C1_tau), array(C1_adev))
                 self.Allanax22_ref[0].set_data(array(C2_tau), array(C2_adev))
@@ -2096,7 +2595,7 @@ class Ui_mainWindow(object):
                 self.Allanax41_ref[0].set_data(array(bva_tau_time), array(bva_adev))
                 self.Allanax42_ref[0].set_data(array(bvb_tau_time), array(bvb_adev))
             else:
-                self.Allanax1_ref = self.Allanax1.plot(bvd_tau_time, bvd_adev, 'ko-', lw=1.25, ms=4, alpha = self.alpha) # ADev for BVD
+                self.Allanax1_ref = self.Allanax1.plot(bvd_tau_time, bvd_adev, 'ko-', lw=1.25, ms=4, alpha = self.alpha, label=bvd_noise) # ADev for BVD
                 self.Allanax11_ref = self.Allanax1.plot(bvd_tau_time,  rttau, 'r', lw = 2, alpha=self.alpha-0.1, label=r'$1/\sqrt{\tau}$') # white noise fit
                 self.Allanax21_ref = self.Allanax2.plot(C1_tau, C1_adev, 'go-', lw=1.25, ms=4, alpha = self.alpha, label=r'$C_{1}$') # ADev for C1
                 self.Allanax22_ref = self.Allanax2.plot(C2_tau, C2_adev, 'yo-', lw=1.25, ms=4, alpha=self.alpha, label=r'$C_{2}$') # ADev for C2
@@ -2106,46 +2605,11 @@ class Ui_mainWindow(object):
                 self.Allanax42_ref = self.Allanax4.plot(bvb_tau_time, bvb_adev, 'ro-', lw=1.25, ms=4, alpha=self.alpha, label=r'$\overline{I+}$') # ADev for bv average(b)
                 self.plottedAllan = True
 
-            with open(self.pathString + '_pyadev.txt', 'w') as adev_file:
-                # Create header string
-                adev_file.write('tau (s)' + '\t' + 'adev [BVD]' + '\t' + 'adev err [BVD]' + \
-                                '\n')
-            with open(self.pathString + '_pyadev.txt', 'a') as adev_file:
-                for i, j, k, in zip(bvd_tau_time, bvd_adev, bvd_aerr):
-                    adev_file.write(str(i) + '\t' + str(j) + '\t' + str(k) + '\n')
-                adev_file.write('\n')
-
-            with open(self.pathString + '_pyadev.txt', 'a') as adev_file:
-                adev_file.write('tau (s)' + '\t' + 'adev [BV <I->]' + '\t' + 'adev err [BV <I->]' + \
-                                '\n')
-            with open(self.pathString + '_pyadev.txt', 'a') as adev_file:
-                for i, j, k, in zip(bva_tau_time, bva_adev, bva_aerr):
-                    adev_file.write(str(i) + '\t' + str(j) + '\t' + str(k) + '\n')
-                adev_file.write('\n')
-
-            with open(self.pathString + '_pyadev.txt', 'a') as adev_file:
-                adev_file.write('tau (s)' + '\t' + 'adev [BV <I+>]' + '\t' + 'adev err [BV <I+>]' + \
-                                '\n')
-            with open(self.pathString + '_pyadev.txt', 'a') as adev_file:
-                for i, j, k, in zip(bvb_tau_time, bvb_adev, bvb_aerr):
-                    adev_file.write(str(i) + '\t' + str(j) + '\t' + str(k) + '\n')
-                adev_file.write('\n')
-
-            with open(self.pathString + '_pyadev.txt', 'a') as adev_file:
-                adev_file.write('tau (s)' + '\t' + 'adev [BV I-]' + '\t' + 'adev err [BV I-]' + \
-                                '\n')
-            with open(self.pathString + '_pyadev.txt', 'a') as adev_file:
-                for i, j, k, in zip(aa_tau_time, aa_adev, aa_aerr):
-                    adev_file.write(str(i) + '\t' + str(j) + '\t' + str(k) + '\n')
-                adev_file.write('\n')
-
-            with open(self.pathString + '_pyadev.txt', 'a') as adev_file:
-                adev_file.write('tau (s)' + '\t' + 'adev [BV I+]' + '\t' + 'adev err [BV I+]' + \
-                                '\n')
-            with open(self.pathString + '_pyadev.txt', 'a') as adev_file:
-                for i, j, k, in zip(bb_tau_time, bb_adev, bb_aerr):
-                    adev_file.write(str(i) + '\t' + str(j) + '\t' + str(k) + '\n')
-                adev_file.write('\n')
+            write_adev_file(self.pathString, {'bvd': (bvd_tau_time, bvd_adev, bvd_aerr), \
+                                              'bva': (bva_tau_time, bva_adev, bva_aerr), \
+                                              'bvb': (bvb_tau_time, bvb_adev, bvb_aerr), \
+                                              'aa': (aa_tau_time, aa_adev, aa_aerr), \
+                                              'bb': (bb_tau_time, bb_adev, bb_aerr)})
 
         self.Allanax1.legend(loc='upper right', frameon=True, shadow=True, ncols=1, columnspacing=0)
         self.Allanax1.relim()
@@ -2155,6 +2619,9 @@ class Ui_mainWindow(object):
         self.Allanax2.autoscale(tight=None, axis='both', enable=True)
         self.Allanax2.autoscale_view(tight=None, scalex=True, scaley=True)
         self.Allanax2.legend(loc='best', frameon=True, shadow=True, ncols=2, columnspacing=1)
+        if bvd_only:
+            self.AllanCanvas.draw_idle()
+            return
         self.Allanax3.relim()
         self.Allanax3.autoscale(tight=None, axis='both', enable=True)
         self.Allanax3.autoscale_view(tight=None, scalex=True, scaley=True)
@@ -2166,53 +2633,38 @@ class Ui_mainWindow(object):
         self.Allanfig.set_tight_layout(True)
         self.AllanCanvas.draw()
 
+    def specData(self) -> dict:
+        """Results of calc_spec with the settings of the Spec tab, calculated once until the BVD or the settings
+        change
+        """
+        if debug_mode:
+            logger.debug('In class: ' + self.__class__.__name__ + ' In function: ' + inspect.stack()[0][3])
+        if self.spec is None:
+            self.spec = calc_spec(self.dat, self.corr_bvdList, self.A, self.B, **self.specSettings())
+        return self.spec
+
     def plotSpec(self) -> None:
+        """Plots the spectra and autocorrelations and writes the _pypsd.txt file"""
         if debug_mode:
             logger.debug('In class: ' + self.__class__.__name__ + ' In function: ' + inspect.stack()[0][3])
         try:
-            samp_freq = 1./(self.dat.fullCyc)
-            # sig_freq = 1./(self.dat.fullCyc)
-            # print("BVD Sampling frequency: ", samp_freq)
-            # print("Measurement time: ", self.dat.measTime)
-            # print("BV Sampling frequency: ", self.dat.dt)
-            # Create the window function
-            freq_bvd, mypsd_bvd = signal.welch(array(self.corr_bvdList), fs=samp_freq, window='hann', \
-                                             nperseg=len(self.corr_bvdList), scaling='density', \
-                                             axis=-1, average='mean', return_onesided=True)
-            freqA, mypsdA = signal.welch(array(self.A), fs=self.dat.dt, window='hann', \
-                                             nperseg=len(self.A),  scaling='density', \
-                                             axis=-1, average='mean', return_onesided=True)
-            freqB, mypsdB = signal.welch(array(self.B), fs=self.dat.dt, window='hann', \
-                                             nperseg=len(self.B),  scaling='density', \
-                                             axis=-1, average='mean', return_onesided=True)
-            self.h0 = mean(mypsd_bvd[1:])
-            # print("Noise power BVD: ", mean(mypsd_bvd[1:]))
-            # print("Noise power BVA: ", mean(mypsdA[1:]))
-            # print("Noise power BVB: ", mean(mypsdB[1:]))
-
-            # Ali's custom PSD calculation...[works but slower than scipy welch]
-            # mywindow_mystat = mystat.hann(float(samp_freq), (len(self.bvdList)*float(samp_freq)))
-            # freq_bvd, mypsa_bvd = mystat.calc_fft(1./(float(samp_freq)), array(self.bvdList), array(mywindow_mystat))
-            lag_bvd, acf_bvd, pci_bvd, nci_bvd, cutoff_lag_bvd = mystat.autoCorrelation(array(self.corr_bvdList))
-            lag_bva, acf_bva, pci_bva, nci_bva, cutoff_lag_bva = mystat.autoCorrelation(array(self.A))
-            lag_bvb, acf_bvb, pci_bvb, nci_bvb, cutoff_lag_bvb = mystat.autoCorrelation(array(self.B))
-            try:
-                (pow_bvd, noise_bvd) = mystat.noise1D(array(self.corr_bvdList))
-                (pow_bva, noise_bva) = mystat.noise1D(array(self.A))
-                (pow_bvb, noise_bvb) = mystat.noise1D(array(self.B))
-            except Exception as e:
-                logger.warning('In class: ' + self.__class__.__name__ + ' In function: ' + inspect.stack()[0][3] + \
-                               ' Error: ' + str(e))
-                (pow_bvd, noise_bvd) = ('', '')
-                (pow_bva, noise_bva) = ('', '')
-                (pow_bvb, noise_bvb) = ('', '')
-                pass
+            spec = self.specData()
+            freq_bvd, mypsd_bvd, var_bvd = spec['psd_bvd']
+            freqA, mypsdA, varA = spec['psd_bva']
+            freqB, mypsdB, varB = spec['psd_bvb']
+            self.h0 = spec['h0']
+            lag_bvd, acf_bvd, pci_bvd, nci_bvd, cutoff_lag_bvd = spec['acf_bvd']
+            lag_bva, acf_bva, pci_bva, nci_bva, cutoff_lag_bva = spec['acf_bva']
+            lag_bvb, acf_bvb, pci_bvb, nci_bvb, cutoff_lag_bvb = spec['acf_bvb']
+            (pow_bvd, noise_bvd) = spec['noise_bvd']
+            (pow_bva, noise_bva) = spec['noise_bva']
+            (pow_bvb, noise_bvb) = spec['noise_bvb']
         except Exception as e:
             logger.warning('In class: ' + self.__class__.__name__ + ' In function: ' + inspect.stack()[0][3] + ' Error: ' + str(e))
-            freq_bvd, mypsd_bvd, freqA, mypsdA, freqB, mypsdB, \
+            freq_bvd, mypsd_bvd, var_bvd, freqA, mypsdA, varA, freqB, mypsdB, varB, \
             lag_bvd, acf_bvd, pci_bvd, nci_bvd, \
             lag_bva, acf_bva, pci_bva, nci_bva, \
-            lag_bvb, acf_bvb, pci_bvb, nci_bvb = ([] for _ in range(18))
+            lag_bvb, acf_bvb, pci_bvb, nci_bvb = ([] for _ in range(21))
             pass
         if self.plottedSpec:
             self.clearSpecPlot()
@@ -2270,27 +2722,87 @@ class Ui_mainWindow(object):
         self.Specfig.set_tight_layout(True)
         self.SpecCanvas.draw()
 
-        with open(self.pathString + '_pypsd.txt', 'w') as psd_file:
-            # Create header string
-            psd_file.write('f (Hz)' + '\t' + 'psd [BVD]' + '\n')
-        with open(self.pathString + '_pypsd.txt', 'a') as psd_file:
-            for i, j, in zip(freq_bvd, mypsd_bvd):
-                psd_file.write(str(i) + '\t' + str(j) + '\n')
-            psd_file.write('\n')
-
-        with open(self.pathString + '_pypsd.txt', 'a') as psd_file:
-            psd_file.write('f (Hz)' + '\t' + 'psd [BV I-]' + '\n')
-        with open(self.pathString + '_pypsd.txt', 'a') as psd_file:
-            for i, j, in zip(freqA, mypsdA):
-                psd_file.write(str(i) + '\t' + str(j) + '\n')
-            psd_file.write('\n')
-
-        with open(self.pathString + '_pypsd.txt', 'a') as psd_file:
-            psd_file.write('f (Hz)' + '\t' + 'psd [BV I+]' + '\n')
-        with open(self.pathString + '_pypsd.txt', 'a') as psd_file:
-            for i, j, in zip(freqB, mypsdB):
-                psd_file.write(str(i) + '\t' + str(j) + '\n')
-            psd_file.write('\n')
+        write_psd_file(self.pathString, {'psd_bvd': (freq_bvd, mypsd_bvd, var_bvd), 'psd_bva': (freqA, mypsdA, varA), \
+                                         'psd_bvb': (freqB, mypsdB, varB)})
+
+    def specSettings(self) -> dict:
+        """Segments, overlap and window of the Welch PSD (ccc_analysis.welch_psd) from the Spec tab"""
+        if debug_mode:
+            logger.debug('In class: ' + self.__class__.__name__ + ' In function: ' + inspect.stack()[0][3])
+        return {'segments': int(self.SegmentsComboBox.currentText()), \
+                'overlap': float(self.OverlapComboBox.currentText().split(' %')[0])/100, \
+                'window': self.WindowComboBox.currentText()}
+
+    def replotSpec(self) -> None:
+        if debug_mode:
+            logger.debug('In class: ' + self.__class__.__name__ + ' In function: ' + inspect.stack()[0][3])
+        self.cancelStats()
+        self.spec = None
+        self.invalidate(self.SpecTab)
+
+    def plotCoh(self) -> None:
+        """Plots the coherence and cross spectral density of C1 and C2 and of I- and I+ with the level that
+        uncorrelated noise exceeds 5 % of the time. The results of calc_coherence are kept for each setting
+        until another run is read.
+        """
+        if debug_mode:
+            logger.debug('In class: ' + self.__class__.__name__ + ' In function: ' + inspect.stack()[0][3])
+        settings = self.cohSettings()
+        try:
+            key = (settings['segments'], settings['window'])
+            if key not in self.coh:
+                self.coh[key] = calc_coherence(self.dat, self.V1, self.V2, self.A, self.B, **settings)
+            freq_C12, csd_C12, coh_C12, level_C12 = self.coh[key]['coh_C12']
+            freq_bv, csd_bv, coh_bv, level_bv = self.coh[key]['coh_bv']
+        except Exception as e:
+            logger.warning('In class: ' + self.__class__.__name__ + ' In function: ' + inspect.stack()[0][3] + ' Error: ' + str(e))
+            freq_C12, csd_C12, coh_C12, freq_bv, csd_bv, coh_bv = ([] for _ in range(6))
+            level_C12, level_bv = nan, nan
+            pass
+        # the mean is removed, the 0 frequency is not shown
+        freq_C12, csd_C12, coh_C12 = array(freq_C12[1:]), abs(array(csd_C12[1:])), array(coh_C12[1:])
+        freq_bv, csd_bv, coh_bv = array(freq_bv[1:]), abs(array(csd_bv[1:])), array(coh_bv[1:])
+        if self.plottedCoh:
+            self.clearCohPlot()
+            self.Cohax1_ref[0].set_data(freq_C12, coh_C12)
+            self.Cohax11_ref[0].set_data(freq_C12, level_C12*ones(len(freq_C12)))
+            self.Cohax2_ref[0].set_data(freq_bv, coh_bv)
+            self.Cohax21_ref[0].set_data(freq_bv, level_bv*ones(len(freq_bv)))
+            self.Cohax3_ref[0].set_data(freq_C12, csd_C12)
+            self.Cohax4_ref[0].set_data(freq_bv, csd_bv)
+        else:
+            self.Cohax1_ref = self.Cohax1.plot(freq_C12, coh_C12, 'ko-', lw=1.25, ms=2, alpha=self.alpha, label=r'$C_{1}$, $C_{2}$')
+            self.Cohax11_ref = self.Cohax1.plot(freq_C12, level_C12*ones(len(freq_C12)), 'r', lw=2, alpha=self.alpha-0.1, label='5 % level')
+            self.Cohax2_ref = self.Cohax2.plot(freq_bv, coh_bv, 'bo-', lw=1.25, ms=2, alpha=self.alpha, label=r'$I-$, $I+$')
+            self.Cohax21_ref = self.Cohax2.plot(freq_bv, level_bv*ones(len(freq_bv)), 'r', lw=2, alpha=self.alpha-0.1, label='5 % level')
+            self.Cohax3_ref = self.Cohax3.plot(freq_C12, csd_C12, 'ko-', lw=1.25, ms=2, alpha=self.alpha, label=r'$C_{1}$, $C_{2}$')
+            self.Cohax4_ref = self.Cohax4.plot(freq_bv, csd_bv, 'bo-', lw=1.25, ms=2, alpha=self.alpha, label=r'$I-$, $I+$')
+            self.plottedCoh = True
+        for ax in (self.Cohax1, self.Cohax2, self.Cohax3, self.Cohax4):
+            ax.relim()
+            ax.autoscale(tight=None, axis='both', enable=True)
+            ax.autoscale_view(tight=None, scalex=True, scaley=True)
+        self.Cohax1.set_ylim(0, 1.05)
+        self.Cohax2.set_ylim(0, 1.05)
+        for ax in (self.Cohax1, self.Cohax2, self.Cohax3, self.Cohax4):
+            ax.legend(loc='lower left', frameon=True, shadow=True, ncols=1, columnspacing=0)
+
+        self.le_coh_C12.setText(str("{:2.3f}".format(mean(coh_C12))) if len(coh_C12) else '')
+        self.le_coh_bv.setText(str("{:2.3f}".format(mean(coh_bv))) if len(coh_bv) else '')
+
+        self.Cohfig.set_tight_layout(True)
+        self.CohCanvas.draw()
+
+    def cohSettings(self) -> dict:
+        """Segments and window of the coherence (ccc_analysis.calc_coherence) from the Coherence tab"""
+        if debug_mode:
+            logger.debug('In class: ' + self.__class__.__name__ + ' In function: ' + inspect.stack()[0][3])
+        return {'segments': int(self.CohSegmentsComboBox.currentText()), 'window': self.CohWindowComboBox.currentText()}
+
+    def replotCoh(self) -> None:
+        if debug_mode:
+            logger.debug('In class: ' + self.__class__.__name__ + ' In function: ' + inspect.stack()[0][3])
+        self.invalidate(self.CohTab)
 
     def clearBVDPlot(self) -> None:
         if debug_mode:
@@ -2380,6 +2892,22 @@ class Ui_mainWindow(object):
                                ' Error: ' + str(e))
                 pass
 
+    def clearCohPlot(self) -> None:
+        if debug_mode:
+            logger.debug('In class: ' + self.__class__.__name__ + ' In function: ' + inspect.stack()[0][3])
+        if self.plottedCoh:
+            try:
+                self.Cohax1_ref[0].set_data([], [])
+                self.Cohax11_ref[0].set_data([], [])
+                self.Cohax2_ref[0].set_data([], [])
+                self.Cohax21_ref[0].set_data([], [])
+                self.Cohax3_ref[0].set_data([], [])
+                self.Cohax4_ref[0].set_data([], [])
+            except Exception as e:
+                logger.warning('In class: ' + self.__class__.__name__ + ' In function: ' + inspect.stack()[0][3] + \
+                               ' Error: ' + str(e))
+                pass
+
     def clearPlots(self) -> None:
         if debug_mode:
             logger.debug('In class: ' + self.__class__.__name__ + ' In function: ' + inspect.stack()[0][3])
@@ -2387,6 +2915,7 @@ class Ui_mainWindow(object):
         self.clearRawPlot()
         self.clearAllanPlot()
         self.clearSpecPlot()
+        self.clearCohPlot()
 
     def RButClicked(self) -> None:
         global red_style
@@ -2407,7 +2936,7 @@ class Ui_mainWindow(object):
             if self.validFile:
                 self.stdR(self.RButStatus)
                 # print("Standard is R1")
-        self.plotBVD()
+        self.invalidate(self.BVDTab)
 
     def SquidButClicked(self) -> None:
         global red_style
@@ -2446,125 +2975,108 @@ class Ui_mainWindow(object):
             3. Uses the BVD to compute resistance ratio and values
             4. Sets the results in the GUI
             5. Plots the results in the GUI
+        Steps 1 and 2 run in an analysisWorker on a QThread, dataLoaded does the rest on the GUI thread
+        when the worker is done. The plots of a tab, with the spectra and Allan deviations, are calculated
+        when the tab is shown (plotTab). A run that is still being analyzed is cancelled.
         """
         if debug_mode:
             logger.debug('In class: ' + self.__class__.__name__ + ' In function: ' + inspect.stack()[0][3])
-        getData_start = perf_counter()
+        self.getData_start = perf_counter()
+        self.cancelLoading()
         if self.txtFilePath.endswith('_bvd.txt') and os.path.exists(self.txtFilePath) and self.txtFilePath.split('_bvd.txt')[0][-1].isnumeric():
             self.txtFile = self.txtFilePath.split('/')[-1]
             self.pathString = self.txtFilePath.split('_bvd.txt')[0]
-            self.dat = magnicon_ccc(self.txtFilePath, dbdir, site)
-            
-            # getFile_end = perf_counter() - getData_start
-            # print("Time taken to read files: " +  str(getFile_end))
-            if len(self.dat.bvd) > 0:
-                self.validFile = True
-            else:
-                self.validFile = False
-            # get the standard temperature for the two resistors if they exist
-            try:
-                if self.le_path_temperature1.text() != '':
-                    env1_obj = env(self.le_path_temperature1.text(), self.dat.startDate, self.dat.endDate)
-                    (self.R1Temp, self.R1pres) = env1_obj.calc_average()
-                    self.R1TotPres = self.R1pres + self.R1OilPres
-                else:
-                    self.R1Temp = self.dat.R1stdTemp
-                    self.R1pres = 101325
-                if self.le_path_temperature2.text() != '':
-                    env2_obj = env(self.le_path_temperature2.text(), self.dat.startDate, self.dat.endDate)
-                    (self.R2Temp, self.R2pres) = env2_obj.calc_average()
-                    # print(self.R2Temp, self.R2pres)
-                    self.R2TotPres = self.R2pres + self.R2OilPres
-                else:
-                    self.R2Temp = self.dat.R2stdTemp
-                    self.R2pres = 101325
-            except Exception as e:
-                logger.warning('In class: ' + self.__class__.__name__ + ' In function: ' + inspect.stack()[0][3] + \
-                               ' Error: ' + str(e))
-                self.R1Temp = 25
-                self.R2Temp = 25
-                self.R1pres = 101325
-                self.R2pres = 101325
-                pass
-            # self.SampUsedLineEdit.setText(str(self.dat.samplesUsed))
-            self.IgnoredFirstLineEdit.setText(str(self.dat.ignored_first))
-            self.IgnoredLastLineEdit.setText(str(self.dat.ignored_last))
-            self.cleanUp()
-            # getResults_end = perf_counter() - getData_start
-            # print("Time taken to get Results: " + str(getResults_end))
-            if self.validFile:
-                # getBVD_start = perf_counter()
-                self.getBVD()
-                # print("Time taken to get BVD data: ", perf_counter() - getBVD_start)
-                # getBVD_end = perf_counter() - getData_start
-                # print("Time taken to get BVD: " +  str(getBVD_end))
-                self.results(self.dat, self.R1Temp, self.R2Temp, self.R1TotPres, self.R2TotPres)
-                self.setValidData()
-                self.plotRaw()
-                self.plotBVD()
-                self.plotStatMeasures()
-                # plotBVD_start = perf_counter()
-                # self.plot_bvd_thread = Thread(target = self.plotBVD, daemon=True)
-                # self.plot_bvd_thread.start()
-                # self.plot_bvd_thread.join() # wait for the thread to finish
-                # # self.plotBVD()
-                # # print("Time taken to plot BVD data: ", perf_counter() - plotBVD_start)
-                # # plotStat_start = perf_counter()
-                # self.stats_thread = Thread(target=self.plotStatMeasures, daemon=True)
-                # self.stats_thread.start()
-                # self.stats_thread.join() # wait for the thread to finish
-                if self.tabWidget.currentIndex() == 0:
-                    try:
-                        self.draw_thread = Thread(target = self.CCCDiagram, args=(round(self.dat.R1NomVal, 2), round(self.dat.R2NomVal, 2), \
-                                        self.dat.N1, self.dat.N2, format(self.dat.I1, ".1e"), \
-                                        format(self.dat.I2, ".1e"), format(self.dat.bvdMean, ".1e"), \
-                                        self.dat.NA, "10k*" + str(self.dat.dac12), "10k/" + str(self.dat.rangeShunt), format(self.dat.I1*self.k, ".1e"),), daemon=True)
-                        self.draw_thread.start()
-                        self.draw_thread.join()
-                        self.draw_flag = True
-                    except Exception as e:
-                        logger.debug('In class: ' + self.__class__.__name__ + ' In function: ' + inspect.stack()[0][3] + ' Error: ' + str(e))
-                        self.draw_flag == False
-                        if self.draw_thread is not None:
-                            self.draw_thread.join()
-                        pass
-                        
-                # print("Time taken to plot allan and spectrum: ", perf_counter() - plotStat_start)
-                # getPlot_end = perf_counter() - getData_start
-                # print("Time taken to plot all data in GUI: ", str(getPlot_end))
-                getData_end = perf_counter() - getData_start
-                # print("Time taken to get and analyze data: " +  str(getData_end))
-                self.statusbar.showMessage('Time taken to process and display data ' + str("{:2.2f}".format(getData_end)) + ' s', 5000)
-                if self.user_warn_msg != "":
-                    self.show_warning_dialog()
+            if self.AllanTypeComboBox.currentText() == '2^n (octave)':
+                mytaus = 'octave'
             else:
-                if self.stats_thread is not None:
-                    self.stats_thread.join()
-                if self.plot_bvd_thread is not None:
-                    self.plot_bvd_thread.join()
-                self.setInvalidData()
-                self.statusbar.showMessage('Invalid file selected...', 2000)
-                # self.clearPlots()
+                mytaus = 'all'
+            analysis = ccc_analysis(self.txtFilePath, dbdir, site, outliers=self.outliers, \
+                                    overlapping=self.is_overlapping(self.OverlappingComboBox.currentText()), \
+                                    variance=self.VarianceTypeComboBox.currentText(), mytaus=mytaus, \
+                                    temp1_path=self.le_path_temperature1.text(), \
+                                    temp2_path=self.le_path_temperature2.text(), cache_dir=cachedir, \
+                                    statistics=False, debug_mode=debug_mode)
+            thread = QThread()
+            worker = analysisWorker(analysis)
+            worker.moveToThread(thread)
+            thread.started.connect(worker.run)
+            worker.progress.connect(self.statusbar.showMessage)
+            worker.finished.connect(self.dataLoaded)
+            worker.finished.connect(thread.quit)
+            thread.finished.connect(lambda: self.loaders.remove((thread, worker)))
+            self.loaders.append((thread, worker))
+            thread.start()
         else:
             # self.clearPlots()
             self.setInvalidData()
             self.statusbar.showMessage('Invalid file! Filename should end in _bvd.txt', 5000)
 
-    def plotStatMeasures(self,) -> None:
-        # TODO: this needs to be in a QThread in a future release...
+    def cancelLoading(self) -> None:
+        """Cancels the runs that are still being analyzed, their results are not shown"""
+        if debug_mode:
+            logger.debug('In class: ' + self.__class__.__name__ + ' In function: ' + inspect.stack()[0][3])
+        for (thread, worker) in self.loaders:
+            worker.cancelled = True
+
+    def dataLoaded(self, worker: analysisWorker) -> None:
+        """Sets and plots the results of an analysisWorker on the GUI thread"""
         if debug_mode:
             logger.debug('In class: ' + self.__class__.__name__ + ' In function: ' + inspect.stack()[0][3])
-        self.plotSpec()
-        self.plotAdev()
+        if worker.cancelled:
+            return
+        analysis = worker.analysis
+        if worker.error != '':
+            self.setInvalidData()
+            self.statusbar.showMessage('Error reading ' + self.txtFile + ': ' + worker.error, 5000)
+            return
+        self.dat = analysis.dat
+        self.validFile = analysis.validFile
+        if self.validFile:
+            # the standard temperature for the two resistors if they exist
+            self.R1Temp = analysis.R1Temp
+            self.R1pres = analysis.R1pres
+            if analysis.temp1_path != '':
+                self.R1TotPres = self.R1pres + self.R1OilPres
+            self.R2Temp = analysis.R2Temp
+            self.R2pres = analysis.R2pres
+            if analysis.temp2_path != '':
+                self.R2TotPres = self.R2pres + self.R2OilPres
+        # self.SampUsedLineEdit.setText(str(self.dat.samplesUsed))
+        self.IgnoredFirstLineEdit.setText(str(self.dat.ignored_first))
+        self.IgnoredLastLineEdit.setText(str(self.dat.ignored_last))
+        self.cleanUp()
+        if self.validFile:
+            self.getBVD(analysis)
+            self.results(self.dat, self.R1Temp, self.R2Temp, self.R1TotPres, self.R2TotPres)
+            self.setValidData()
+            self.overlapping = analysis.overlapping
+            # only the shown tab is drawn, the others when they are shown
+            self.invalidate()
+            getData_end = perf_counter() - self.getData_start
+            # print("Time taken to get and analyze data: " +  str(getData_end))
+            self.statusbar.showMessage('Time taken to process and display data ' + str("{:2.2f}".format(getData_end)) + ' s', 5000)
+            if self.user_warn_msg != "":
+                self.show_warning_dialog()
+        else:
+            self.setInvalidData()
+            self.statusbar.showMessage('Invalid file selected...', 2000)
+            # self.clearPlots()
 
     def plotAdev(self,) -> None:
         if debug_mode:
             logger.debug('In class: ' + self.__class__.__name__ + ' In function: ' + inspect.stack()[0][3])
         self.overlapping = self.is_overlapping(self.OverlappingComboBox.currentText())
-        self.plotAllan()
+        self.cancelStats()
+        self.adev = {}
+        self.invalidate(self.AllanTab)
 
-    def getBVD(self,):
+    def getBVD(self, analysis: ccc_analysis=None, update: bool=False):
         """Calculates the BVD from the raw text file only.
+        Parameters
+        ----------
+        analysis : ccc_analysis object that already calculated the BVD with the ignored samples of the run,
+            None to calculate them
+        update : True to add the samples appended to a followed run to the BVD of bvd_stat_obj (followRun)
         Returns
         -------
         None.
@@ -2573,9 +3085,18 @@ class Ui_mainWindow(object):
             logger.debug('In class: ' + self.__class__.__name__ + ' In function: ' + inspect.stack()[0][3])
         try:
             self.removed = []
-            self.bvd_stat_obj = bvd_stat(self.txtFilePath, int(self.IgnoredFirstLineEdit.text()), \
-                                         int(self.IgnoredLastLineEdit.text()), self.dat, debug_mode)
-            self.bvdList, self.V1, self.V2, self.A, self.B, self.stdA, self.stdB, self.AA, self.BB, self.stdbvdList, self.AA_used, self.BB_used = self.bvd_stat_obj.send_bvd_stats()
+            if update:
+                self.bvd_stat_obj.update()
+                self.bvdList, self.V1, self.V2, self.A, self.B, self.stdA, self.stdB, self.AA, self.BB, self.stdbvdList, self.AA_used, self.BB_used = self.bvd_stat_obj.send_bvd_stats()
+            elif analysis is None:
+                self.bvd_stat_obj = bvd_stat(self.txtFilePath, int(self.IgnoredFirstLineEdit.text()), \
+                                             int(self.IgnoredLastLineEdit.text()), self.dat, debug_mode)
+                self.bvdList, self.V1, self.V2, self.A, self.B, self.stdA, self.stdB, self.AA, self.BB, self.stdbvdList, self.AA_used, self.BB_used = self.bvd_stat_obj.send_bvd_stats()
+            else:
+                self.bvd_stat_obj = analysis.bvd_stat_obj
+                self.bvdList, self.V1, self.V2, self.A, self.B, self.stdA, self.stdB, self.AA, self.BB, self.stdbvdList, self.AA_used, self.BB_used = \
+                    analysis.bvdList, analysis.V1, analysis.V2, analysis.A, analysis.B, analysis.stdA, analysis.stdB, \
+                    analysis.AA, analysis.BB, analysis.stdbvdList, analysis.AA_used, analysis.BB_used
             if self.outliers:
                 BVDmean = mean(self.bvdList)
                 BVDstd  = std(self.bvdList, ddof=1)
@@ -2625,183 +3146,27 @@ class Ui_mainWindow(object):
     def results(self, mag, T1: float, T2: float, P1: float, P2: float) -> None:
         if debug_mode:
             logger.debug('In class: ' + self.__class__.__name__ + ' In function: ' + inspect.stack()[0][3])
-        if mag.deltaNApN1 == '':
-            self.k = 0
-            # (mag.N1*2048*mag.rangeShunt)
-        else:
-            self.k     = mag.deltaNApN1/mag.NA # in turns
-        # correction factor for R1 and R2 due to temperature and pressure
-        R1corr     = (mag.R1alpha*(T1-mag.R1stdTemp) + mag.R1beta*(T1-mag.R1stdTemp)**2) + (mag.R1pcr*(P1-101325))/1000
-        R2corr     = (mag.R2alpha*(T2-mag.R2stdTemp) + mag.R2beta*(T2-mag.R2stdTemp)**2) + (mag.R2pcr*(P2-101325))/1000
-        # print('R1 and R2 Corr: ', R1corr, R2corr)
-        self.R2STPPred = mag.R2Pred
-        if not self.changedR1STPBool:
-            self.R1PPM = R1corr + mag.R1Pred
-            self.R1STPPred = mag.R1Pred
+        if self.changedR1STPBool:
+            R1STP = float(self.R1STP)
         else:
-            self.R1PPM = R1corr + float(self.R1STP)
-            self.R1STPPred = float(self.R1STP)
-        if not self.changedR2STPBool:
-            self.R2PPM = R2corr + mag.R2Pred
-            self.R2STPPred = mag.R2Pred
+            R1STP = None
+        if self.changedR2STPBool:
+            R2STP = float(self.R2STP)
         else:
-            self.R2PPM = R2corr + float(self.R2STP)
-            self.R2STPPred = float(self.R2STP)
-        self.R1    = (self.R1PPM/1000000 + 1) * mag.R1NomVal
-        self.R2    = (self.R2PPM/1000000 + 1) * mag.R2NomVal
-
-        self.ratioMeanList      = []
-        self.ratioMeanStdList   = []
-        self.R1List             = []
-        self.R2List             = []
-        ratioMeanC1             = []
-        ratioMeanC2             = []
-        self.C1R1List           = []
-        self.C1R2List           = []
-        self.C2R1List           = []
-        self.C2R2List           = []
+            R2STP = None
         if self.changedDeltaI2R2Ct != 0:
             myDeltaI2R2 = float(self.le_deltaI2R2.text())
         else:
-            myDeltaI2R2 = float(mag.deltaI2R2)
-        try:
-            compensation = mag.N1/mag.N2 * (1 + (self.k*mag.NA/mag.N1))
-        except ZeroDivisionError:
-            compensation = 0
-            pass
-        for v1, v2, bvd, stdbvd in zip(self.V1, self.V2, self.corr_bvdList, self.stdbvdList):
-            # This calculation is done using the bridge voltages i.e the raw text file
-            try:
-                self.ratioMeanList.append(compensation*(1 + (bvd/myDeltaI2R2)))
-                self.ratioMeanStdList.append(compensation*stdbvd/myDeltaI2R2)
-                ratioMeanC1.append(compensation*(1 + v1/myDeltaI2R2))
-                ratioMeanC2.append(compensation*(1 + v2/myDeltaI2R2))
-            except ZeroDivisionError:
-                self.ratioMeanList.append(0)
-                self.ratioMeanStdList.append(0)
-                ratioMeanC1.append(0)
-                ratioMeanC2.append(0)
-                pass
-        for rm, rmC1, rmC2 in zip(self.ratioMeanList, ratioMeanC1, ratioMeanC2):
-            try:
-                self.R1List.append(float(((((self.R1*(1./rm))/mag.R2NomVal) - 1) * 10**6) - R2corr)) # this is actually R2List
-                self.C1R1List.append((self.R1/rmC1 - mag.R2NomVal)/mag.R2NomVal * 10**6 - R2corr)
-                self.C2R1List.append((self.R1/rmC2 - mag.R2NomVal)/mag.R2NomVal * 10**6 - R2corr)
-            except ZeroDivisionError:
-                self.R1List.append(0)
-                self.C1R1List.append(0)
-                self.C2R1List.append(0)
-                pass
-            try:
-                self.R2List.append(float(((((self.R2*rm)/mag.R1NomVal) - 1) * 10**6) - R1corr)) # this is actually R1List
-                self.C1R2List.append((self.R2*rmC1 - mag.R1NomVal)/mag.R1NomVal * 10**6 - R1corr)
-                self.C2R2List.append((self.R2*rmC2 - mag.R1NomVal)/mag.R1NomVal * 10**6 - R1corr)
-            except ZeroDivisionError:
-                self.R2List.append(0)
-                self.C1R2List.append(0)
-                self.C2R2List.append(0)
-        # print(self.R1List, mean(self.R1List), len(self.R1List))
-        if self.ratioMeanList != []:
-            # self.ratioMean = compensation*(1 + (self.bvd_mean/myDeltaI2R2)) # calculated from raw bridge voltages
-            self.ratioMean = mean(self.ratioMeanList)
-            self.ratioStdMean = std(self.ratioMeanList, ddof=1)/sqrt(len(self.ratioMeanList))
-            self.meanR1     = mean(self.R1List) # this is mean of R2
-            # self.meanR1     = float(((((self.R1/mean(self.ratioMeanList))/mag.R2NomVal) - 1) * 10**6) - R2corr)
-            self.stdR1ppm   = std(self.R1List, ddof=1) # in ppm
-            self.C1R1       = mean(self.C1R1List)
-            # self.C1R1       = float(((((self.R1/mean(ratioMeanC1))/mag.R2NomVal) - 1) * 10**6) - R2corr)
-            self.C2R1       = mean(self.C2R1List)
-            # self.C2R1       = float(((((self.R1/mean(ratioMeanC2))/mag.R2NomVal) - 1) * 10**6) - R2corr)
-            self.stdC1R1    = std(self.C1R1List, ddof=1)
-            self.stdC2R1    = std(self.C2R1List, ddof=1)
-            self.stdMeanR1  = self.stdR1ppm/sqrt(len(self.R1List))
-            self.meanR2     = mean(self.R2List) # this is mean of r1
-            # self.meanR2     = float(((((self.R2*mean(self.ratioMeanList))/mag.R1NomVal) - 1) * 10**6) - R1corr)
-            self.stdR2ppm   = std(self.R2List, ddof=1)
-            self.C1R2       = mean(self.C1R2List)
-            # self.C1R2       = float(((((self.R2*mean(ratioMeanC1))/mag.R1NomVal) - 1) * 10**6) - R1corr)
-            self.C2R2       = mean(self.C2R2List)
-            # self.C2R2       = float(((((self.R2*mean(ratioMeanC2))/mag.R1NomVal) - 1) * 10**6) - R1corr)
-            self.stdC1R2    = std(self.C1R2List, ddof=1)
-            self.stdC2R2    = std(self.C2R2List, ddof=1)
-            self.stdMeanR2  = self.stdR2ppm/sqrt(len(self.R2List))
-        else:
-            self.ratioMean      = nan
-            self.ratioStdMean   = nan
-            self.meanR1         = nan
-            self.meanR2         = nan
-            self.stdR1ppm       = nan
-            self.stdR2ppm       = nan
-            self.C1R1           = nan
-            self.C1R2           = nan
-            self.C2R1           = nan
-            self.C2R2           = nan
-            self.stdC1R1        = nan
-            self.stdC1R2        = nan
-            self.stdC2R1        = nan
-            self.stdC2R2        = nan
-            self.stdMeanR1      = nan
-            self.stdMeanR2      = nan
-
-        if self.corr_bvdList != []:
-            self.N         = len(self.corr_bvdList)
-            self.bvd_mean  = mean(self.corr_bvdList)
-            self.bvd_std   = std(self.corr_bvdList, ddof=1)
-            self.bvd_stdMean   = self.bvd_std/sqrt(len(self.corr_bvdList))
-        else:
-            self.bvd_mean = nan
-            self.bvd_std  = nan
-            self.bvd_stdMean  = nan
-        if self.bvdList_chk != []:
-            self.bvd_mean_chk       = mean(self.bvdList_chk)
-            self.bvd_std_chk        = std(self.bvdList_chk, ddof=1)
-            self.bvd_stdmean_chk    = self.bvd_std_chk/sqrt(len(self.bvdList_chk))
+            myDeltaI2R2 = None
+        # the calculation is shared with the headless batch analysis
+        if self.res is None:
+            self.res = ccc_results(mag, self.V1, self.V2, self.corr_bvdList, self.stdbvdList, self.bvdList_chk, \
+                                   T1, T2, P1, P2, R1STP, R2STP, myDeltaI2R2, debug_mode)
         else:
-            self.bvd_mean_chk       = nan
-            self.bvd_std_chk        = nan
-            self.bvd_stdmean_chk    = nan
-
-        self.ratioMeanChkList = []
-        self.R1MeanChkList    = []
-        self.R2MeanChkList    = []
-        if myDeltaI2R2 != 0 and self.bvdList_chk != []:
-            for i, j in enumerate(self.bvdList_chk):
-                self.ratioMeanChkList.append(compensation*(1 + (j/myDeltaI2R2)))
-            self.ratioMeanChk   = mean(self.ratioMeanChkList) # calculated from bvd.txt file
-            self.stdppm     = std(self.ratioMeanChkList, ddof=1)/mean(self.ratioMeanChkList)
-            self.stdMeanPPM = self.stdppm/sqrt(len(self.ratioMeanChkList))
-            # print (self.ratioMeanChkList)
-        if mag.R2NomVal != 0 and mag.R1NomVal != 0:
-            for i, j in enumerate(self.ratioMeanChkList):
-                # print(j, self.R1, mag.R2NomVal, R2corr)
-                self.R1MeanChkList.append((((self.R1/j) - mag.R2NomVal)/mag.R2NomVal) * 10**6 - R2corr) # this is actually R2
-                self.R2MeanChkList.append(((self.R2*j - mag.R1NomVal)/mag.R1NomVal) * 10**6 - R1corr) # this is actually R1
-            self.R1MeanChk    = mean(self.R1MeanChkList) # this is R2
-            self.stdR1Chk     = std(self.R1MeanChkList, ddof=1) # this is R2
-            self.stdMeanR1Chk = self.stdR1Chk/sqrt(len(self.R1MeanChkList)) # this is R2
-            self.R2MeanChkOhm = (self.R1MeanChk/1000000 + 1) * mag.R2NomVal
-            self.R2MeanChk    = mean(self.R2MeanChkList)
-            self.stdR2Chk     = std(self.R2MeanChkList, ddof=1)
-            self.stdMeanR2Chk = self.stdR2Chk/sqrt(len(self.R2MeanChkList))
-            self.R1MeanChkOhm = (self.R2MeanChk/1000000 + 1) * mag.R1NomVal
-        else:
-            self.ratioMeanChk   = nan
-            self.stdppm         = nan
-            self.stdMeanPPM     = nan
-            self.R1MeanChk      = nan
-            self.stdR1Chk       = nan
-            self.stdMeanR1Chk   = nan
-            self.R2MeanChk      = nan
-            self.stdR2Chk       = nan
-            self.stdMeanR2Chk   = nan
-            self.R1CorVal       = nan
-            self.R2CorVal       = nan
-            self.R1MeanChkOhm   = nan
-            self.R2MeanChkOhm   = nan
-            # self.remTime      = mag.measTime - (self.N*mag.fullCyc)
-            # self.remTimeStamp = mag.sec2ts(self.remTime)
-        self.R1CorVal = ((self.R1STPPred/1000000 + 1) * mag.R1NomVal)
-        self.R2CorVal = ((self.R2STPPred/1000000 + 1) * mag.R2NomVal)
+            # same BVDs with new settings, the deleted BVDs stay deleted
+            self.res.results(mag, T1, T2, P1, P2, R1STP, R2STP, myDeltaI2R2)
+        for name in ccc_results.attributes:
+            setattr(self, name, getattr(self.res, name))
         # print('k: ', self.k)
         # print('Ratio Check: ', self.ratioMean,self.ratioMeanChk)
         # print('BVD Check: ', self.bvd_mean, self.bvd_mean_chk, ((self.bvd_mean - self.bvd_mean_chk)))
@@ -2892,7 +3257,7 @@ class Ui_mainWindow(object):
         # self.MDSSButton.setStyleSheet(red_style)
         self.MDSSButton.setEnabled(True)
 
-        if not (self.deletePressed or self.restorePressed):
+        if not (self.deletePressed or self.restorePressed or self.runGrew):
             self.plotCountCombo.clear()
             for i in range(len(self.corr_bvdList)):
                 self.plotCountCombo.addItem(f'ct {len(self.corr_bvdList) - i - 1}')
@@ -2900,6 +3265,8 @@ class Ui_mainWindow(object):
             self.deletePressed = False
         if self.restorePressed:
             self.restorePressed = False
+        if self.runGrew:
+            self.runGrew = False
 
         if len(self.corr_bvdList) > 625:
             self.bins = int(sqrt(len(self.corr_bvdList)))
@@ -2983,10 +3350,7 @@ class Ui_mainWindow(object):
 
         self.deletedIndex = []
         self.deletedCount = []
-        self.deletedBVD   = []
         self.bvdCount     = []
-        self.deletedR1    = []
-        self.deletedR2    = []
         self.plotCountCombo.clear()
 
     def stdR(self, R: str) -> None:
@@ -3058,7 +3422,7 @@ class Ui_mainWindow(object):
                 self.getBVD()
                 self.results(self.dat, self.R1Temp, self.R2Temp, self.R1TotPres, self.R2TotPres)
                 self.setValidData()
-                self.plotBVD()
+                self.invalidate(self.BVDTab)
         except Exception as e:
             logger.warning('In class: ' + self.__class__.__name__ + ' In function: ' + inspect.stack()[0][3] + \
                            ' Error: ' + str(e))
@@ -3077,7 +3441,7 @@ class Ui_mainWindow(object):
                 self.getBVD()
                 self.results(self.dat, self.R1Temp, self.R2Temp, self.R1TotPres, self.R2TotPres)
                 self.setValidData()
-                self.plotBVD()
+                self.invalidate(self.BVDTab)
         except Exception as e:
             logger.warning('In class: ' + self.__class__.__name__ + ' In function: ' + inspect.stack()[0][3] + \
                            ' Error: ' + str(e))
@@ -3127,7 +3491,7 @@ class Ui_mainWindow(object):
                 self.getBVD()
                 self.results(self.dat, self.R1Temp, self.R2Temp, self.R1TotPres, self.R2TotPres)
                 self.setValidData()
-                self.plotBVD()
+                self.invalidate(self.BVDTab)
         except Exception as e:
             logger.warning('In class: ' + self.__class__.__name__ + ' In function: ' + inspect.stack()[0][3] + \
                            ' Error: ' + str(e))
@@ -3144,7 +3508,7 @@ class Ui_mainWindow(object):
                 self.getBVD()
                 self.results(self.dat, self.R1Temp, self.R2Temp, self.R1TotPres, self.R2TotPres)
                 self.setValidData()
-                self.plotBVD()
+                self.invalidate(self.BVDTab)
         except Exception as e:
             logger.warning('In class: ' + self.__class__.__name__ + ' In function: ' + inspect.stack()[0][3] + \
                            ' Error: ' + str(e))
@@ -3161,7 +3525,6 @@ class Ui_mainWindow(object):
             self.validFile = False
             self.chb_outlier.setCheckState(Qt.CheckState.Unchecked)
             self.outliers=False
-            self.draw_flag = False
             self.user_warn_msg = ""
             self.getData()
         else:
@@ -3245,49 +3608,20 @@ class Ui_mainWindow(object):
                       meas=float(self.MeasLineEdit.text()), delay=float(self.DelayLineEdit.text()), \
                       R1PredictionSTP=float(self.R1STPLineEdit.text()), R2PredictionSTP=float(self.R2STPLineEdit.text()), \
                       comments = str(self.dat.comments))
-        with open(self.pathString + '_pyCCCRAW.mea', 'w') as mea_file:
-            if self.RButStatus == 'R1':
-                unk = 'R2'
-            else:
-                unk = 'R1'
-            mea_file.write('# Standard: ' +  str(self.RButStatus) + '\n' + '# Unknown: ' + str(unk) + '\n' + \
-                           '# Start Time: ' + str(self.dat.startDate) + '\n' + '# End Time: ' + str(self.dat.endDate) + '\n' + \
-                           '# R1 Serial: ' + str(self.dat.R1SN) + '\n' + '# R1 PPM: ' + str(self.R1PPM) + '\n' + \
-                           '# R1 Value: ' + str(self.R1) + '\n' + '# R2 Serial: ' + str(self.dat.R2SN) + '\n' + \
-                           '# R2 PPM: ' + str(self.R2PPM) + '\n' + '# R2 Value: ' + str(self.R2) + '\n' + \
-                           '# R1 Current: ' + str(self.dat.I1) + '\n' + '# R2 Current: ' + str(self.dat.I2) + '\n' + \
-                           '# N1: ' + str(self.dat.N1) + '\n' + '# N2: ' + str(self.dat.N2) + '\n' + \
-                           '# Meas/Stats: ' + str(self.SHCLineEdit.text() + '/' + str(int(self.dat.SHC) - (int(self.IgnoredFirstLineEdit.text()) + int(self.IgnoredLastLineEdit.text())))) + '\n' + '# Full Cycle Time: ' + str(self.FullCycLineEdit.text()) + '\n' + \
-                           '# Ramp Time: ' + str(self.RampLineEdit.text()) + '\n' + '# Measurement Time: ' + str(self.MeasLineEdit.text()) + '\n' + \
-                           '# Delay: ' + str(self.DelayLineEdit.text()) + '\n' + \
-                           '# Comment: ' + str(self.CommentsTextBrowser.toPlainText()) + '\n' + \
-                           '# BVD [V]' + '\t' + 'Ratio' + '\t' + 'StdrtN[BVD]' + '\t' + 'StdrtN[Ratio]' + '\n\n')
-
-        with open(self.pathString + '_pyBV.mea', 'w') as mea_file:
-             if self.RButStatus == 'R1':
-                 unk = 'R2'
-             else:
-                 unk = 'R1'
-             mea_file.write('# Standard: ' +  str(self.RButStatus) + '\n' + '# Unknown: ' + str(unk) + '\n' + \
-                            '# Start Time: ' + str(self.dat.startDate) + '\n' + '# End Time: ' + str(self.dat.endDate) + '\n' + \
-                            '# R1 Serial: ' + str(self.dat.R1SN) + '\n' + '# R1 PPM: ' + str(self.R1PPM) + '\n' + \
-                            '# R1 Value: ' + str(self.R1) + '\n' + '# R2 Serial: ' + str(self.dat.R2SN) + '\n' + \
-                            '# R2 PPM: ' + str(self.R2PPM) + '\n' + '# R2 Value: ' + str(self.R2) + '\n' + \
-                            '# R1 Current: ' + str(self.dat.I1) + '\n' + '# R2 Current: ' + str(self.dat.I2) + '\n' + \
-                            '# N1: ' + str(self.dat.N1) + '\n' + '# N2: ' + str(self.dat.N2) + '\n' + \
-                            '# Meas/Stats: ' + str(self.SHCLineEdit.text() + '/' + str(int(self.dat.SHC) - (int(self.IgnoredFirstLineEdit.text()) + int(self.IgnoredLastLineEdit.text())))) + '\n' + '# Full Cycle Time: ' + str(self.FullCycLineEdit.text()) + '\n' + \
-                            '# Ramp Time: ' + str(self.RampLineEdit.text()) + '\n' + '# Measurement Time: ' + str(self.MeasLineEdit.text()) + '\n' + \
-                            '# Delay: ' + str(self.DelayLineEdit.text()) + '\n' + \
-                            '# Comment: ' + str(self.CommentsTextBrowser.toPlainText()) + '\n' + \
-                            '# V(I-) [V]' + '\t' + 'V(I+) [V]' + '\n\n')
-
-        with open(self.pathString + '_pyCCCRAW.mea', 'a') as mea_file:
-            for i, j, k, l in zip(self.corr_bvdList, self.ratioMeanList, self.stdbvdList, self.ratioMeanStdList):
-                mea_file.write(str(i) + '\t' + str(j) + '\t' + str(k) + '\t' + str(l) + '\n')
-
-        with open(self.pathString + '_pyBV.mea', 'a') as mea_file:
-            for i, j in zip(self.AA, self.BB):
-                mea_file.write(str(i) + '\t' + str(j) + '\n')
+        write_mea_files(pathString=self.pathString, dat_obj=self.dat, RStatus=self.RButStatus, R1PPM=self.R1PPM, \
+                        R1=self.R1, R2PPM=self.R2PPM, R2=self.R2, \
+                        samplesUsed=int(self.dat.SHC) - (int(self.IgnoredFirstLineEdit.text()) + int(self.IgnoredLastLineEdit.text())), \
+                        meas=self.MeasLineEdit.text(), delay=self.DelayLineEdit.text(), \
+                        comments=self.CommentsTextBrowser.toPlainText(), corr_bvdList=self.corr_bvdList, \
+                        ratioMeanList=self.ratioMeanList, stdbvdList=self.stdbvdList, \
+                        ratioMeanStdList=self.ratioMeanStdList, AA=self.AA, BB=self.BB)
+        try:
+            # the spectra and deviations of the tabs that were not shown yet
+            write_psd_file(self.pathString, self.specData())
+            write_adev_file(self.pathString, self.adevData())
+        except Exception as e:
+            logger.warning('In class: ' + self.__class__.__name__ + ' In function: ' + inspect.stack()[0][3] + ' Error: ' + str(e))
+            pass
 
         self.saveStatus = False
         self.MDSSButton.setStyleSheet(red_style)
@@ -3298,18 +3632,18 @@ class Ui_mainWindow(object):
     def cleanUp(self) -> None:
         if debug_mode:
             logger.debug('In class: ' + self.__class__.__name__ + ' In function: ' + inspect.stack()[0][3])
-        self.deletedV1      = []
-        self.deletedV2      = []
         self.deletedCount   = []
-        self.deletedBVD     = []
-        self.deletedBVDChk  = []
 
         self.bvdList        = []
         self.corr_bvdList   = []
         self.stdbvdList     = []
         self.bvdCount       = []
-        self.deletedR1      = []
-        self.deletedR2      = []
+        self.res            = None
+        self.cancelStats()
+        self.adev           = {}
+        self.spec           = None
+        self.coh            = {}
+        self.stale          = set(self.tabPlots())
 
         self.bvdList_chk        = []
 
@@ -3331,24 +3665,13 @@ class Ui_mainWindow(object):
             self.deletedCount.append(int(self.plotCountCombo.currentText().replace('ct ', '')))
             if int(curIndex) >= 0:
                 self.plotCountCombo.removeItem(int(self.plotCountCombo.count() - curIndex - 1))
-            self.deletedBVD.append(self.corr_bvdList[curIndex])
-            self.deletedBVDChk.append(self.bvdList_chk[curIndex])
-            self.deletedV1.append(self.V1[curIndex])
-            self.deletedV2.append(self.V2[curIndex])
-            self.deletedR1.append(self.R1List[curIndex])
-            self.deletedR2.append(self.R2List[curIndex])
-            self.V1.pop(curIndex)
-            self.V2.pop(curIndex)
-            self.corr_bvdList.pop(curIndex)
-            self.bvdList_chk.pop(curIndex)
             self.bvdCount.pop(curIndex)
-            self.R1List.pop(curIndex)
-            self.R2List.pop(curIndex)
-            self.results(self.dat, self.R1Temp, self.R2Temp, self.R1TotPres, self.R2TotPres)
+            # masks the BVD in all per BVD lists and updates the statistics from running sums
+            self.res.delete(curIndex)
+            for name in ccc_results.attributes:
+                setattr(self, name, getattr(self.res, name))
             self.setValidData()
-            self.plotBVD()
-            self.plotAllan()
-            
+            self.deletedChanged()
 
     def restoreDeleted(self) -> None:
         """Restore last deleted data point
@@ -3366,23 +3689,26 @@ class Ui_mainWindow(object):
         if self.deletedCount != []:
             print(self.deletedIndex)
             self.plotCountCombo.insertItem(int(self.N - self.deletedIndex[-1]), f'ct {int(self.deletedIndex[-1])}')
-            self.V1.insert(self.deletedIndex[-1], self.deletedV1[-1])
-            self.V2.insert(self.deletedIndex[-1], self.deletedV2[-1])
             self.bvdCount.insert(self.deletedIndex[-1], self.deletedCount[-1])
-            self.corr_bvdList.insert(self.deletedIndex[-1], self.deletedBVD[-1])
-            self.bvdList_chk.insert(self.deletedIndex[-1], self.deletedBVDChk[-1])
-            self.R1List.insert(self.deletedIndex[-1], self.deletedR1[-1])
-            self.R2List.insert(self.deletedIndex[-1], self.deletedR2[-1])
             self.deletedIndex.pop(-1)
             self.deletedCount.pop(-1)
-            self.deletedBVD.pop(-1)
-            self.deletedBVDChk.pop(-1)
-            self.deletedR1.pop(-1)
-            self.deletedR2.pop(-1)
-            self.results(self.dat, self.R1Temp, self.R2Temp, self.R1TotPres, self.R2TotPres)
+            self.res.restore()
+            for name in ccc_results.attributes:
+                setattr(self, name, getattr(self.res, name))
             self.setValidData()
-            self.plotBVD()
-            self.plotStatMeasures()
+            self.deletedChanged()
+
+    def deletedChanged(self) -> None:
+        """Invalidates the plots of the BVD after a delete or restore, the deviations of the raw and averaged
+        bridge voltages are kept
+        """
+        if debug_mode:
+            logger.debug('In class: ' + self.__class__.__name__ + ' In function: ' + inspect.stack()[0][3])
+        self.cancelStats()
+        self.spec = None
+        for key in ('bvd', 'C1', 'C2'):
+            self.adev.pop(key, None)
+        self.invalidate(self.BVDTab, self.SpecTab, self.AllanTab)
 
     def replotAll(self) -> None:
         """Replot all the data
@@ -3409,6 +3735,8 @@ def dir_path(save_path):
     return save_path
 
 if __name__ == "__main__":
+    # the batch analysis processes start this program again when frozen by pyinstaller
+    freeze_support()
     parser = ArgumentParser(prog = 'Magnicon-Offline-Analyzer',
                             description='Configure Magnicon-Offline-Analyzer',
                             epilog='A utility to interact with the analysis software for Magnicon CCC systems', add_help=True)
@@ -3417,11 +3745,15 @@ if __name__ == "__main__":
     parser.add_argument('-d', '--debug', help='Debugging mode', action='store_true')
     parser.add_argument('-s', '--site', help='Site where this program is used', default="", type=str)
     parser.add_argument('-c', '--specific_gravity', help='Specific gravity of oil for oil type resistors', default=0.8465, type=float)
+    parser.add_argument('-k', '--cache_path', help='Specify cache directory of parsed runs and circuit diagrams, "" to disable', default="C:" + os.sep + "_datacache_", type=str)
+    parser.add_argument('-b', '--batch', help='Analyze every run under this directory without the GUI and exit', default="", type=str)
+    batch_parser(parser)
     args, unk = parser.parse_known_args()
     if unk:
         logger.debug("Warning: Ignoring unknown arguments: {:}".format(unk))
         pass
     dbdir = args.db_path
+    cachedir = args.cache_path
     logdir = args.log_path
     debug_mode = args.debug
     site = args.site
@@ -3432,6 +3764,9 @@ if __name__ == "__main__":
     fmt = logging.Formatter('%(asctime)s : %(levelname)s : %(name)s : %(message)s')
     file_handler.setFormatter(fmt)
     logger.addHandler(file_handler)
+    if args.batch != "":
+        run_batch(args.batch, **batch_kwargs(args, dbdir, site, c, cachedir, debug_mode))
+        sys.exit()
     # Handle high resolution displays:
     if hasattr(QtCore.Qt, 'AA_EnableHighDpiScaling'):
         QApplication.setAttribute(QtCore.Qt.AA_EnableHighDpiScaling, True)
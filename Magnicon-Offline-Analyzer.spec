@@ -21,7 +21,7 @@ a = Analysis(
     datas=[('.\\bvd_stats.py', '.'), ('.\\create_mag_ccc_datafile.py', '.'), \
            ('.\\magnicon_ccc.py', '.'),  ('.\\ResDataBase.py', '.'),  ('.\\mystat.py', '.'), ('.\\icons', 'icons'), 
            ('..\\Lib\\site-packages\\allantools\\allantools_info.json', 'allantools'), \
-           ('.\\env.py', '.'), ('.\\data\\ccc_diagram_default.png', 'data'), ('.\\data\\ResDataBase.dat', 'data'), \
+           ('.\\env.py', '.'), ('.\\ccc_analysis.py', '.'), ('.\\batch_analysis.py', '.'), ('.\\run_catalog.py', '.'), ('.\\resistor_history.py', '.'), ('.\\data\\ccc_diagram_default.png', 'data'), ('.\\data\\ResDataBase.dat', 'data'), \
            ],
     hiddenimports = ['pyi_splash', 'allantools', 'lcapy'],
     hookspath=[f'{PACKAGE_SITE}/pyupdater/hooks'],
@@ -1,58 +1,109 @@
+import os
+from threading import Lock
 from datetime import timedelta, datetime as dt
 from dateutil.relativedelta import relativedelta
 from pytz import utc
+from numpy import array, asarray, full, nan, float64, int64, unique, where
 
 class ResData():
+    # columns of the database, one entry per resistor in the order of the .dat file
+    columns = ('CalDate', 'CorrCalDate', 'NomVal', 'CalVal', 'Alpha', 'Beta', 'PCR', 'Drift', 'StdTemp')
+    # databases parsed by this process, keyed by directory, see load
+    _loaded = {}
+    _lock = Lock()
+
     def __init__(self, bp):
+        self.datFile = f'{bp}\ResDataBase.dat'
+        # file signature (modification time, size) when it was parsed, None if it could not be read
+        self.signature = None
+        # Empty arrays to store data from ResDataBase.dat
+        self.ResDict = {}
+        # row of each SN in the columns
+        self.index = {}
+        self.SN = []
+        for name in self.columns:
+            setattr(self, name, array([], dtype=float64))
         try:
-            self.datFile = f'{bp}\ResDataBase.dat'
-            # Empty arrays to store data from ResDataBase.dat
-            self.ResDict = {}
+            self.signature = self.file_signature(self.datFile)
             # Open .dat file for reading and close it when done
             with open (self.datFile, "r") as f:
-                # Parse each line of the .dat file and append the date into the data arrays
-                for line in f.readlines():
-                    # Stores the Cal Val and converts LabView based timestamp (1,1,1904) to Unix-based timestamp (1,1,1970) making sure everything is in UTC
-                    if line.startswith('CalDate'):
-                        # Creates a temporary variable to store the current Cal Val
-                        CalDate = float(line.split('=')[-1].rstrip(' \n'))
-                        # Subtract 66 years to get to Unix based date objects
-                        UnixDateObj = dt.fromtimestamp(CalDate, tz=utc) - relativedelta(years=66)
-                        # Convert datetime into corrected Unix-based timestamp
-                        CorrCalDate = (UnixDateObj - dt(1970,1,1,0,0,tzinfo=utc)) / timedelta(seconds=1)
-                    elif line.startswith('SN'):
-                        temp = line.split('=')[-1].rstrip(' "\n')
-                        SN   = temp.lstrip(' "')
-                        self.ResDict[SN] = {}
-                        self.ResDict[SN]['CalDate'] = CalDate
-                        self.ResDict[SN]['CorrCalDate'] = CorrCalDate
-                    elif line.startswith('NomVal'):
-                        self.ResDict[SN]['NomVal'] = float(line.split('=')[-1].rstrip(' \n'))
-                    elif line.startswith('CalVal'):
-                        self.ResDict[SN]['CalVal'] = float(line.split('=')[-1].rstrip(' \n'))
-                    elif line.startswith('Alpha'):
-                        self.ResDict[SN]['Alpha'] = float(line.split('=')[-1].rstrip(' \n'))
-                    elif line.startswith('Beta'):
-                        self.ResDict[SN]['Beta'] = float(line.split('=')[-1].rstrip(' \n'))
-                    elif line.startswith('PCR'):
-                        self.ResDict[SN]['PCR'] = float(line.split('=')[-1].rstrip(' \n'))
-                    elif line.startswith('Drift'):
-                        self.ResDict[SN]['Drift'] = float(line.split('=')[-1].rstrip(' \n'))
-                    elif line.startswith('StdTemp'):
-                        self.ResDict[SN]['StdTemp'] = float(line.split('=')[-1].rstrip(' \n'))
+                records = self.parse(f.read())
+            self.SN = [i['SN'] for i in records]
+            for name in self.columns:
+                if name != 'CorrCalDate':
+                    setattr(self, name, array([i.get(name, nan) for i in records], dtype=float64))
+            self.CorrCalDate = self.corrCalDates(self.CalDate)
+            for row, SN in enumerate(self.SN):
+                self.index[SN] = row
+                self.ResDict[SN] = {name: float(getattr(self, name)[row]) for name in self.columns \
+                                    if name in records[row] or name == 'CorrCalDate'}
         except Exception as e:
             print(e)
+            self.signature = None
             pass
+
+    @classmethod
+    def load(cls, bp):
+        """Returns the database of the directory bp, it is parsed once per process and again only when the
+        modification time or size of the .dat file changed, so analyzing many runs reads it once. The returned
+        object is shared and must not be modified.
+        """
+        datFile = f'{bp}\ResDataBase.dat'
+        with cls._lock:
+            R = cls._loaded.get(datFile)
+            try:
+                signature = cls.file_signature(datFile)
+            except OSError:
+                signature = None
+            if R is None or R.signature is None or R.signature != signature:
+                R = cls(bp)
+                cls._loaded[datFile] = R
+            return R
+
+    @staticmethod
+    def file_signature(path: str) -> tuple:
+        st = os.stat(path)
+        return (st.st_mtime_ns, st.st_size)
+
+    @staticmethod
+    def parse(text: str) -> list:
+        """Parses the [Resistor] sections of ResDataBase.dat, returns a dict of the values for each SN in
+        the order of the file. A section without CalDate keeps the CalDate of the section before it.
+        """
+        records = []
+        CalDate = None
+        for line in text.splitlines():
+            if line.startswith('CalDate'):
+                CalDate = float(line.split('=')[-1].rstrip(' \n'))
+            elif line.startswith('SN'):
+                temp = line.split('=')[-1].rstrip(' "\n')
+                records.append({'SN': temp.lstrip(' "'), 'CalDate': CalDate})
+            elif records and line.startswith(('NomVal', 'CalVal', 'Alpha', 'Beta', 'PCR', 'Drift', 'StdTemp')):
+                name, value = line.split('=', 1)
+                records[-1][name.strip()] = float(value.rstrip(' \n'))
+        return records
+
+    @staticmethod
+    def corrCalDates(CalDate):
+        """Converts the LabView based timestamps (1,1,1904) CalDate to Unix-based timestamps (1,1,1970) in UTC,
+        each distinct date is converted once
+        """
+        dates, inverse = unique(CalDate, return_inverse=True)
+        corr = []
+        for CalDate in dates:
+            # Subtract 66 years to get to Unix based date objects
+            UnixDateObj = dt.fromtimestamp(CalDate, tz=utc) - relativedelta(years=66)
+            # Convert datetime into corrected Unix-based timestamp
+            corr.append((UnixDateObj - dt(1970,1,1,0,0,tzinfo=utc)) / timedelta(seconds=1))
+        return array(corr, dtype=float64)[inverse].reshape(-1)
+
     # Returns the predicted resistor value from the input SN and datetime in mm/dd/yyyy format
     def predictedValueDate(self, mySN: str, myDate: str) -> float:
         # Converts the input datetime into a timestamp
         temp = dt.strptime(myDate, "%m/%d/%Y")
         myTimeStamp = dt.timestamp(dt(temp.year, temp.month, temp.day, tzinfo=utc))
-        # Return the predicted value if input SN is found within the database
-        if mySN in self.ResDict:
-            return (self.ResDict[mySN]['Drift']*((myTimeStamp - self.ResDict[mySN]['CorrCalDate'])/(365.25*24*60*60)) + self.ResDict[mySN]['CalVal'])
-        # Return None if the input SN is not found within the database
-        return None
+        return self.predictedValueUnix(mySN, myTimeStamp)
+
     # Returns the predicted resistor value from the input SN and Unix timestamp
     def predictedValueUnix(self, mySN: str, myUnixTime: float) -> float:
         # Return the predicted value if input SN is found within the database
@@ -61,5 +112,17 @@ class ResData():
         # Return None if the input SN is not found within the database
         return None
 
+    # Returns the predicted resistor values for arrays of SN and Unix timestamps, nan for an unknown SN
+    def predictedValuesUnix(self, mySN, myUnixTime):
+        if isinstance(mySN, str):
+            mySN = [mySN]
+        rows = array([self.index.get(i, -1) for i in mySN], dtype=int64)
+        found = rows >= 0
+        rows = where(found, rows, 0)
+        pred = full(len(rows), nan)
+        if len(self.SN):
+            pred = self.Drift[rows]*((asarray(myUnixTime, dtype=float64).reshape(-1) - self.CorrCalDate[rows])/(365.25*24*60*60)) + self.CalVal[rows]
+        return where(found, pred, nan)
+
 if __name__ == '__main__':
     print ("I am main")
\ No newline at end of file
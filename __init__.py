@@ -45,4 +45,22 @@ __ChangeLog__   =       """
                         021425:     FIX: Fix gui style to be compatible with windows 11, fix issue with R2NomVal for RK/3
                         061325:     ENH: Add warning displays, readback to display if CN is off, fix delete and restore point method for BVD, seperate BV and BVD
                                          tabs, Update ResDataBase.dat, move removed outliers checkbox to bvd tab, upgrade to version 2.4
+                        101826:     ENH: Faster reading of the raw data and BVD calculation, add headless batch analysis of whole directory
+                                         trees (batch_analysis.py, -b option), move the ratio, allan deviation and spectrum calculations
+                                         to ccc_analysis.py, cache parsed runs and memory map their raw data, faster
+                                         deleting and restoring of BVDs, read and analyze runs on a QThread,
+                                         calculate the Allan deviations on a thread pool with
+                                         the vectorized Allan and Hadamard deviations of mystat,
+                                         fft auto-correlation, vectorized noise identification also at every tau of the BVD Allan
+                                         deviation, segmented Welch PSD with cached windows,
+                                         vectorized window and PSD routines of spectral.py, coherence tab of C1, C2
+                                         and I-, I+, resistor database parsed once per process into columns,
+                                         indexed and cached environment logs averaged over every day of a run,
+                                         cached circuit diagrams drawn on a QThread, plots of a tab calculated when it
+                                         is shown, follow mode that adds the samples of a run that is still being
+                                         measured, streaming BVD engine of chunks of samples (bvd_stream),
+                                         bulk _bvd.txt table reader and summary read from the end of the file,
+                                         SQLite run catalog of an archive for the batch analysis (run_catalog.py),
+                                         weighted drift fits of the resistor history of the catalog compared with
+                                         the resistor database (resistor_history.py)
                         """
\ No newline at end of file
@@ -0,0 +1,200 @@
+import sys, os
+import logging, inspect
+from time import perf_counter
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import freeze_support
+from math import nan
+
+# custom imports
+from ccc_analysis import ccc_analysis
+from run_catalog import run_catalog
+
+logger = logging.getLogger(__name__)
+
+def find_runs(folder: str) -> list:
+    """Finds every Magnicon run (a _bvd.txt file whose name ends in a number before _bvd.txt, the same
+    check as the GUI) under folder and its sub folders
+    Returns
+    -------
+    sorted list of _bvd.txt paths
+    """
+    runs = []
+    for root, dirs, files in os.walk(folder):
+        for file in files:
+            if file.endswith('_bvd.txt') and file.split('_bvd.txt')[0][-1:].isnumeric():
+                runs.append(os.path.join(root, file))
+    return sorted(runs)
+
+def analyze_run(text: str, **kwargs) -> tuple:
+    """Analyzes one run and writes its output files
+    Returns
+    -------
+    (text, status, seconds) where status is 'ok', 'no data' or the error message
+    """
+    start = perf_counter()
+    try:
+        run = ccc_analysis(text, **kwargs)
+        if run.run():
+            run.save()
+            status = 'ok'
+        else:
+            status = 'no data'
+    except Exception as e:
+        logger.warning('In function: ' + inspect.stack()[0][3] + ' File: ' + text + ' Error: ' + repr(e))
+        status = repr(e)
+    return (text, status, perf_counter() - start)
+
+def find_catalog_runs(catalog: str, folder: str, scan: bool=False, resistor: str=None, since: str=None, \
+                      until: str=None) -> list:
+    """Runs under folder from the run catalog file instead of walking the directory tree, of the resistor
+    and started from since up to until if they are given. The catalog is updated with the new and changed
+    runs under folder first if scan is True.
+    Returns
+    -------
+    list of _bvd.txt paths sorted by start time
+    """
+    runs = run_catalog(catalog)
+    try:
+        if scan:
+            runs.scan(folder)
+        return [row['bvdFile'] for row in runs.find(resistor, since, until, folder)]
+    finally:
+        runs.close()
+
+def run_batch(folder: str, jobs=None, catalog: str='', scan: bool=False, resistor: str=None, since: str=None, \
+              until: str=None, **kwargs) -> list:
+    """Analyzes every run under folder on a pool of jobs processes (one per core if None), the keyword
+    arguments are passed to ccc_analysis. A failing run is reported and does not stop the others. With a
+    catalog the runs are listed by find_catalog_runs.
+    Returns
+    -------
+    list of (text, status, seconds) in the order of find_runs or find_catalog_runs
+    """
+    start = perf_counter()
+    if catalog != '':
+        runs = find_catalog_runs(catalog, folder, scan, resistor, since, until)
+    else:
+        runs = find_runs(folder)
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+    jobs = max(1, min(jobs, len(runs)))
+    print(f'Found {len(runs)} runs in {folder}, analyzing on {jobs} processes')
+    if jobs > 1:
+        # the cores are already busy with other runs
+        kwargs.setdefault('processes', 1)
+    summary = [None]*len(runs)
+    if jobs == 1:
+        for ct, text in enumerate(runs):
+            summary[ct] = analyze_run(text, **kwargs)
+            print_progress(ct + 1, len(runs), summary[ct])
+    else:
+        def finished(ct: int, result, error) -> None:
+            if error is not None:
+                # the worker process itself died, e.g. out of memory
+                logger.warning('In function: run_batch File: ' + runs[ct] + ' Error: ' + repr(error))
+                result = (runs[ct], repr(error), nan)
+            summary[ct] = result
+            print_progress(len(runs) - summary.count(None), len(runs), result)
+        run_pool(analyze_run, runs, jobs, finished, **kwargs)
+    ok = [i for i in summary if i[1] == 'ok']
+    failed = [i for i in summary if i[1] not in ('ok', 'no data')]
+    print(f'Analyzed {len(ok)} of {len(runs)} runs, {len(runs) - len(ok) - len(failed)} without data, ' + \
+          f'{len(failed)} failed in {perf_counter() - start:.1f} s')
+    for i in failed:
+        print(f'Failed: {i[0]}: {i[1]}')
+    return summary
+
+def run_pool(function, items: list, jobs: int, finished, **kwargs) -> None:
+    """Calls function(item, **kwargs) for every item on a pool of jobs processes and finished(index, result,
+    error) as each one is done, error is the exception of an item that failed and result is then None. At
+    most jobs items are submitted at a time, so a worker process that dies (e.g. out of memory) and breaks
+    the pool only breaks the items that were running: each of them is run again alone in a new pool, the one
+    that breaks it again is reported with BrokenProcessPool, and the other items continue on a new pool.
+    """
+    pending = list(range(len(items)))[::-1]
+    while pending:
+        broken = []
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            running = {}
+            while running or (pending and not broken):
+                while pending and not broken and len(running) < jobs:
+                    ct = pending.pop()
+                    running[executor.submit(function, items[ct], **kwargs)] = ct
+                done, not_done = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    ct = running.pop(future)
+                    try:
+                        finished(ct, future.result(), None)
+                    except BrokenProcessPool:
+                        broken.append(ct)
+                    except Exception as e:
+                        finished(ct, None, e)
+        for ct in broken:
+            with ProcessPoolExecutor(max_workers=1) as executor:
+                future = executor.submit(function, items[ct], **kwargs)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    finished(ct, None, e)
+                    continue
+            finished(ct, result, None)
+
+def print_progress(done: int, total: int, result: tuple) -> None:
+    print(f'[{done}/{total}] {os.path.basename(result[0])}: {result[1]} ({result[2]:.2f} s)')
+
+def batch_parser(parser: ArgumentParser) -> ArgumentParser:
+    """Adds the analysis settings of the batch mode to parser"""
+    parser.add_argument('--standard', help='Standard resistor (default: R1)', default='R1', choices=['R1', 'R2'])
+    parser.add_argument('--current', help='Feedback current (default: I2)', default='I2', choices=['I1', 'I2'])
+    parser.add_argument('--polarity', help='SQUID feedback polarity (default: NEG)', default='NEG', choices=['NEG', 'POS'])
+    parser.add_argument('--system', help='Magnicon electronics (default: CCC2014-01)', default='CCC2014-01', type=str)
+    parser.add_argument('--probe', help='CCC probe (default: Magnicon1)', default='Magnicon1', type=str)
+    parser.add_argument('--outliers', help='Remove BVD outside of 3 standard deviations', action='store_true')
+    parser.add_argument('--overlapping', help='Overlapping Allan deviation', action='store_true')
+    parser.add_argument('--variance', help='Allan or Hadamard deviation (default: Allan)', default='Allan', choices=['Allan', 'Hadamard'])
+    parser.add_argument('--taus', help='Allan deviation taus (default: all)', default='all', choices=['all', 'octave'])
+    parser.add_argument('--segments', help='Number of Welch PSD segments (default: 1)', default=1, type=int)
+    parser.add_argument('--overlap', help='Overlap of the Welch PSD segments (default: 0.5)', default=0.5, type=float)
+    parser.add_argument('--window', help='Window of the Welch PSD (default: hann)', default='hann', choices=['hann', 'rect', 'welch'])
+    parser.add_argument('-t1', '--temperature1', help='Environment log directory of R1', default='', type=str)
+    parser.add_argument('-t2', '--temperature2', help='Environment log directory of R2', default='', type=str)
+    parser.add_argument('--oil_depth1', help='Oil depth of R1 in mm (default: 0)', default=0, type=float)
+    parser.add_argument('--oil_depth2', help='Oil depth of R2 in mm (default: 0)', default=0, type=float)
+    parser.add_argument('-o', '--output', help='MDSS file directory (default: directory of each run)', default=None, type=str)
+    parser.add_argument('-j', '--jobs', help='Number of runs analyzed in parallel (default: number of cores)', default=None, type=int)
+    parser.add_argument('--catalog', help='Run catalog file (see run_catalog.py) to list the runs from instead of the directory', default='', type=str)
+    parser.add_argument('--scan', help='Index the new and changed runs of the directory in the catalog first', action='store_true')
+    parser.add_argument('-r', '--resistor', help='Only the runs of this resistor serial number (with --catalog)', default=None, type=str)
+    parser.add_argument('--since', help='Only the runs started from this date, YYYY[-MM[-DD]] (with --catalog)', default=None, type=str)
+    parser.add_argument('--until', help='Only the runs started before this date, YYYY[-MM[-DD]] (with --catalog)', default=None, type=str)
+    return parser
+
+def batch_kwargs(args, dbdir: str, site: str, c: float, cache_dir: str, debug_mode: bool) -> dict:
+    """run_batch keyword arguments from the parsed batch settings"""
+    return dict(dbdir=dbdir, site=site, RStatus=args.standard, I=args.current, polarity=args.polarity, \
+                system=args.system, probe=args.probe, outliers=args.outliers, overlapping=args.overlapping, \
+                variance=args.variance, mytaus=args.taus, segments=args.segments, overlap=args.overlap, \
+                window=args.window, temp1_path=args.temperature1, \
+                temp2_path=args.temperature2, R1OilDepth=args.oil_depth1, R2OilDepth=args.oil_depth2, c=c, \
+                savepath=args.output, jobs=args.jobs, catalog=args.catalog, scan=args.scan, \
+                resistor=args.resistor, since=args.since, until=args.until, cache_dir=cache_dir, debug_mode=debug_mode)
+
+if __name__ == '__main__':
+    freeze_support()
+    parser = ArgumentParser(prog = 'batch_analysis',
+                            description='Analyze every Magnicon CCC run in a directory tree without the GUI',
+                            epilog='Writes the _pyMDSS.txt, _pyadev.txt, _pypsd.txt and .mea files of each run', add_help=True)
+    parser.add_argument('folder', help='Directory with *_CCC day folders', type=str)
+    parser.add_argument('-db', '--db_path', help='Specify resistor database directory', default="", type=str)
+    parser.add_argument('-d', '--debug', help='Debugging mode', action='store_true')
+    parser.add_argument('-s', '--site', help='Site where this program is used', default="", type=str)
+    parser.add_argument('-c', '--specific_gravity', help='Specific gravity of oil for oil type resistors', default=0.8465, type=float)
+    parser.add_argument('-k', '--cache_path', help='Specify cache directory of parsed runs (default: no cache)', default="", type=str)
+    batch_parser(parser)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.DEBUG if args.debug else logging.WARNING)
+    summary = run_batch(args.folder, **batch_kwargs(args, args.db_path, args.site, args.specific_gravity, \
+                                                         args.cache_path, args.debug))
+    sys.exit(0 if all(i[1] in ('ok', 'no data') for i in summary) else 1)
@@ -1,6 +1,7 @@
 import logging, inspect
-from magnicon_ccc import magnicon_ccc
-from numpy import mean, std, array_split, sqrt
+from magnicon_ccc import magnicon_ccc, growing_array
+from numpy import mean, std, array_split, sqrt, argmax, isin, column_stack, concatenate, float64, \
+                  float_power, empty
 from threading import Thread
 from time import perf_counter
 
@@ -46,7 +47,8 @@ class bvd_stat:
         self.ignored_last = int(ignored_last)
         self.samples_used = self.mag.SHC - (self.ignored_first + self.ignored_last)
         # self.process_thread = Thread(target = self._process_thread, daemon=True)
-        self.process_thread = Thread(target = self._process_thread_new, daemon=True)
+        # self.process_thread = Thread(target = self._process_thread_new, daemon=True)
+        self.process_thread = Thread(target = self._process_thread_vec, daemon=True)
         self.process_thread.start()
         self.process_thread.join()
 
@@ -237,6 +239,134 @@ class bvd_stat:
         # print('BVD', self.bvdList)
         # print("Time taken to execute new thread: ", perf_counter() - start_thread)
 
+    def _process_thread_vec(self,):
+        """
+        Array version of _process_thread_new with the same outputs. The samples after the first rampdown are
+        not copied: a run that alternates SHC samples of phases 4/2 (I-) with SHC samples of phases 3/1 (I+)
+        is reshaped to (n_cycles, 2, SHC) views of the raw data, only the irregular end of the run is
+        separated with boolean masks. The ignored samples are removed by column slicing, so the means and
+        standard deviations of both halves of every half cycle are taken with one call along axis 1. A
+        trailing incomplete half cycle is handled exactly like _process_thread_new does. The per phase lists
+        (zero, top, bottom, ramping_up, ramping_down) of the loop versions are not filled. The run is processed
+        by update from an empty state.
+        Returns
+        -------
+        None.
+        """
+        self.clear_bvd_stats()
+        if self.debug_mode:
+            self.logger.debug('In class: ' + self.__class__.__name__ + ' In function: ' + inspect.stack()[0][3])
+        # samples pushed to the stream, the lists of the half cycles that are complete followed by those of the
+        # incomplete last half cycles and the length of their complete part, the samples used
+        self.state = {'size': 0, 'stream': bvd_stream(self.mag.SHC, self.ignored_first, self.ignored_last), \
+                      'lists': {name: [] for name in bvd_stream.names + ('AA_used', 'BB_used')}, \
+                      'complete': {name: 0 for name in bvd_stream.names + ('AA_used', 'BB_used')}, \
+                      'samples': {'AA': growing_array(), 'BB': growing_array()}}
+        self.update()
+
+    def update(self,) -> None:
+        """
+        Processes the samples appended to the raw data since _process_thread_vec or the last update, while the
+        run is followed (magnicon_ccc.append_raw), and sets the same outputs as _process_thread_vec of the whole
+        run. The new samples are pushed to a bvd_stream, the half cycles they complete are appended to the kept
+        lists and only the values of the incomplete last half cycles are replaced, so an update takes time in
+        proportion to the new samples. The lists are extended in place.
+        Returns
+        -------
+        None.
+        """
+        if self.debug_mode:
+            self.logger.debug('In class: ' + self.__class__.__name__ + ' In function: ' + inspect.stack()[0][3])
+        state = self.state
+        size = state['size']
+        if len(self.mag.phase) < size:
+            # the run was read again
+            return self._process_thread_vec()
+        state['size'] = len(self.mag.phase)
+        stream = state['stream']
+        new = stream.push(self.mag.rawData[size:], self.mag.phase[size:])
+        last = stream.finish()
+        lists, complete = state['lists'], state['complete']
+        for name, values in lists.items():
+            del values[complete[name]:]
+            if name in ('AA_used', 'BB_used'):
+                values.extend(new[name])
+                complete[name] = len(values)
+                values.extend(last[name])
+            else:
+                values.extend(new[name].tolist())
+                complete[name] = len(values)
+                values.extend(last[name].tolist())
+        self.A, self.stdA, self.B, self.stdB = lists['A'], lists['stdA'], lists['B'], lists['stdB']
+        self.V1, self.stdV1, self.V2, self.stdV2 = lists['V1'], lists['stdV1'], lists['V2'], lists['stdV2']
+        self.bvdList, self.stdbvdList = lists['bvd'], lists['stdbvd']
+        self.AA_used, self.BB_used = lists['AA_used'], lists['BB_used'] # blue, red
+        # one float64 copy of the samples used instead of a list of floats
+        for name, samples in state['samples'].items():
+            samples.extend(new[name])
+            setattr(self, name, samples.values(last[name]))
+
+    @staticmethod
+    def _split_half_cycles(phase, data, SHC: int) -> tuple:
+        """Separates the samples from the first rampdown on into the I- (phases 0, 2, 4) and I+ (phases 0, 1, 3)
+        half cycles. Returns ((blocks, rest), (blocks, rest)) for I- and I+, where blocks is a list of
+        (n, SHC) arrays of complete half cycles and rest holds the incomplete last half cycle. The blocks
+        of the regular part of the run are views into data.
+        """
+        n = len(data)//(2*SHC)
+        cycles = phase[:2*SHC*n].reshape(n, 2, SHC)
+        if ((cycles[:, 0] == 2) | (cycles[:, 0] == 4)).all() and ((cycles[:, 1] == 1) | (cycles[:, 1] == 3)).all():
+            cycles = data[:2*SHC*n].reshape(n, 2, SHC)
+            bottom, top = [cycles[:, 0]], [cycles[:, 1]]
+            phase, data = phase[2*SHC*n:], data[2*SHC*n:]
+        else:
+            bottom, top = [], []
+        halves = []
+        for blocks, mask in ((bottom, isin(phase, (0, 2, 4))), (top, isin(phase, (0, 1, 3)))):
+            rest = data[mask]
+            n_full = len(rest)//SHC
+            if n_full:
+                blocks.append(rest[:n_full*SHC].reshape(n_full, SHC))
+            halves.append((blocks, rest[n_full*SHC:]))
+        return tuple(halves)
+
+    @staticmethod
+    def _half_cycle_stats(blocks: list, partial, SHC: int, ignored_first: int, ignored_last: int) -> tuple:
+        """Returns (used half cycles, samples used, half means, half standard errors) of the complete half
+        cycles in blocks and the incomplete half cycle partial. The used half cycles are views into blocks,
+        the means and standard errors are ordered first half, second half per half cycle. ignored_last is the
+        index of the last sample used + 1.
+        """
+        # _process_thread_new always yields a trailing (possibly empty) incomplete half cycle
+        used = [i for block in blocks for i in block] + [partial]
+        min_len = ignored_first + SHC - ignored_last
+        if ignored_last == SHC:
+            cols = slice(ignored_first, None)
+        else:
+            cols = slice(ignored_first, ignored_last)
+        means, stds, samples = [empty(0)], [empty(0)], [empty(0)]
+        for full in blocks:
+            if SHC > min_len:
+                block = full[:, cols]
+            else:
+                block = full[:0, cols]
+            # array_split puts the extra sample of an odd length into the first half
+            half = (block.shape[1] + 1)//2
+            means.append(column_stack((mean(block[:, :half], axis=1), mean(block[:, half:], axis=1))).ravel())
+            stds.append(column_stack((std(block[:, :half], axis=1, ddof=1)/sqrt(half), \
+                                      std(block[:, half:], axis=1, ddof=1)/sqrt(block.shape[1] - half))).ravel())
+            samples.append(block.ravel())
+        if len(partial) > min_len:
+            last = partial[cols]
+            last_means, last_stds = [], []
+            for i in array_split(last, 2):
+                last_means.append(mean(i))
+                last_stds.append(std(i, ddof=1)/sqrt(len(i)))
+            means.append(last_means)
+            stds.append(last_stds)
+            samples.append(last)
+        return used, concatenate(samples), concatenate(means).astype(float64), concatenate(stds).astype(float64)
+
     def send_bvd_stats(self):
         if self.debug_mode:
             self.logger.debug('In class: ' + self.__class__.__name__ + ' In function: ' + inspect.stack()[0][3])
@@ -269,8 +399,109 @@ class bvd_stat:
         self.top            = []
         self.ramping_up     = []
         self.ramping_down   = []
-        
-        
+
+class bvd_stream:
+    """
+    Streaming BVD engine. The samples of a run are pushed in chunks of any size and the half cycle means and BVDs
+    are returned as soon as their half cycles are complete. Only the samples of the incomplete half cycle of each
+    side and the half means that the next BVDs need are kept, so the memory does not grow with the length of the
+    run. The records of all pushes followed by finish are the lists of bvd_stat._process_thread_vec, bvd_stat.update
+    pushes the samples of a run to a stream.
+    """
+    # records returned by push and finish
+    names = ('A', 'stdA', 'B', 'stdB', 'V1', 'stdV1', 'V2', 'stdV2', 'bvd', 'stdbvd')
+
+    def __init__(self, SHC: int, ignored_first: int, ignored_last: int) -> None:
+        self.SHC = int(SHC)
+        self.ignored_first = int(ignored_first)
+        self.ignored_last = self.SHC - int(ignored_last)
+        self.started = False
+        # I- and I+ samples of the incomplete half cycle
+        self.rest = [empty(0), empty(0)]
+        # I- (A) and I+ (B) half means and standard errors from the index offset on
+        self.means = [empty(0), empty(0)]
+        self.stds = [empty(0), empty(0)]
+        self.offset = [0, 0]
+        # V1, V2 and BVDs returned
+        self.counts = [0, 0, 0]
+
+    def push(self, values, phases) -> dict:
+        """Adds the samples values with their phases, the samples before the first rampdown are skipped
+        Returns
+        -------
+        dict of arrays keyed by names of the half means and BVDs completed by the samples, of the samples used
+        (AA, BB) and of the lists of complete half cycles (AA_used, BB_used)
+        """
+        if not self.started:
+            first = int(argmax(phases == 4)) if len(phases) else 0
+            if len(phases) == 0 or phases[first] != 4:
+                return self.records([([], empty(0), empty(0), empty(0))]*2, True)
+            # start at the first cycle ramping down...
+            self.started = True
+            values, phases = values[first:], phases[first:]
+        if all(len(rest) == 0 for rest in self.rest):
+            # the samples start with a half cycle of both sides, the regular part is not copied
+            halves = bvd_stat._split_half_cycles(phases, values, self.SHC)
+        else:
+            halves = []
+            for rest, selected in zip(self.rest, ((0, 2, 4), (0, 1, 3))):
+                rest = concatenate((rest, values[isin(phases, selected)]))
+                n_full = len(rest)//self.SHC
+                halves.append(([rest[:n_full*self.SHC].reshape(n_full, self.SHC)] if n_full else [], rest[n_full*self.SHC:]))
+        stats = []
+        for side, (blocks, rest) in enumerate(halves):
+            used, samples, means, stds = bvd_stat._half_cycle_stats(blocks, rest[:0], self.SHC, self.ignored_first, \
+                                                                    self.ignored_last)
+            # the incomplete half cycle is added by finish
+            stats.append((used[:-1], samples, means, stds))
+            self.rest[side] = rest
+        return self.records(stats, True)
+
+    def finish(self) -> dict:
+        """Records that the incomplete half cycles at the end of the run add, like _process_thread_vec does.
+        The state does not change, more samples can be pushed.
+        """
+        stats = [bvd_stat._half_cycle_stats([], rest, self.SHC, self.ignored_first, self.ignored_last) for rest in self.rest]
+        return self.records(stats, False)
+
+    def records(self, stats: list, commit: bool) -> dict:
+        """Returns the records of the half cycles stats (used half cycles, samples used, half means, half standard
+        errors) of both sides and of the BVDs that they complete, the BVDs are kept if commit
+        """
+        new_means = [i[2] for i in stats]
+        new_stds = [i[3] for i in stats]
+        means = [concatenate((i, j)) for i, j in zip(self.means, new_means)]
+        stds = [concatenate((i, j)) for i, j in zip(self.stds, new_stds)]
+        nA, nB = (i + len(j) for i, j in zip(self.offset, means))
+        def pair(k0: int, k1: int, a: int, b: int) -> tuple:
+            # differences of the B half means 2k + b and the A half means 2k + a for k from k0 to k1
+            A = means[0][2*k0 + a - self.offset[0]:2*k1 + a - self.offset[0]:2]
+            stdA = stds[0][2*k0 + a - self.offset[0]:2*k1 + a - self.offset[0]:2]
+            B = means[1][2*k0 + b - self.offset[1]:2*k1 + b - self.offset[1]:2]
+            stdB = stds[1][2*k0 + b - self.offset[1]:2*k1 + b - self.offset[1]:2]
+            return B - A, sqrt(float_power(stdA, 2) + float_power(stdB, 2))
+        # C1 pairs the second halves of I- and I+ half cycle k, C2 the first half of I- half cycle k + 1 and I+ k
+        n1 = min(nA//2, nB//2)
+        n2 = min(max(nA - 1, 0)//2, (nB + 1)//2)
+        n = min(n1, n2)
+        c1, c2, c = self.counts
+        V1, stdV1 = pair(c1, n1, 1, 1)
+        V2, stdV2 = pair(c2, n2, 2, 0)
+        bvd1, stdbvd1 = pair(c, n, 1, 1)
+        bvd2, stdbvd2 = pair(c, n, 2, 0)
+        records = dict(zip(self.names, (new_means[0], new_stds[0], new_means[1], new_stds[1], V1, stdV1, V2, stdV2, \
+                                        (bvd1 + bvd2)/2., sqrt(float_power(stdbvd1, 2) + float_power(stdbvd2, 2))/2)))
+        records.update(AA=stats[0][1], BB=stats[1][1], AA_used=stats[0][0], BB_used=stats[1][0])
+        if commit:
+            self.counts = [n1, n2, n]
+            # the next BVD starts at A half mean 2n + 1 and B half mean 2n
+            for side, keep in enumerate((2*n + 1, 2*n)):
+                drop = max(0, min(keep, self.offset[side] + len(means[side])) - self.offset[side])
+                self.means[side] = means[side][drop:]
+                self.stds[side] = stds[side][drop:]
+                self.offset[side] += drop
+        return records
+
 if __name__ == '__main__':
     debug = False
     if debug:
@@ -0,0 +1,770 @@
+import logging, inspect, os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+from numpy import sqrt, std, mean, nan, array, ones, flatnonzero, float64, fft, arange, concatenate
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy import signal
+
+# custom imports
+from magnicon_ccc import magnicon_ccc
+from bvd_stats import bvd_stat
+from create_mag_ccc_datafile import writeDataFile, write_adev_file, write_psd_file, write_mea_files
+import mystat
+import spectral
+from env import env
+
+logger = logging.getLogger(__name__)
+g = 9.81 # local acceleration due to gravity
+
+# Class that calculates the resistance ratio and resistor values from the bridge voltages
+class ccc_results:
+    # per BVD lists, the first five are the inputs and the others are calculated from them
+    point_lists = ('V1', 'V2', 'corr_bvdList', 'stdbvdList', 'bvdList_chk', 'ratioMeanList', 'ratioMeanStdList', \
+                   'R1List', 'R2List', 'C1R1List', 'C1R2List', 'C2R1List', 'C2R2List', 'ratioMeanChkList', \
+                   'R1MeanChkList', 'R2MeanChkList')
+    # per BVD lists with running sums for the statistics after a delete or restore
+    summed_lists = ('ratioMeanList', 'R1List', 'R2List', 'C1R1List', 'C1R2List', 'C2R1List', 'C2R2List', \
+                    'corr_bvdList', 'bvdList_chk', 'ratioMeanChkList', 'R1MeanChkList', 'R2MeanChkList')
+    # attributes copied back into the GUI after a calculation
+    attributes = ('k', 'R1PPM', 'R2PPM', 'R1STPPred', 'R2STPPred', 'R1', 'R2', 'ratioMeanList', 'ratioMeanStdList', \
+                  'R1List', 'R2List', 'C1R1List', 'C1R2List', 'C2R1List', 'C2R2List', 'ratioMean', 'ratioStdMean', \
+                  'meanR1', 'stdR1ppm', 'C1R1', 'C2R1', 'stdC1R1', 'stdC2R1', 'stdMeanR1', 'meanR2', 'stdR2ppm', \
+                  'C1R2', 'C2R2', 'stdC1R2', 'stdC2R2', 'stdMeanR2', 'N', 'bvd_mean', 'bvd_std', 'bvd_stdMean', \
+                  'bvd_mean_chk', 'bvd_std_chk', 'bvd_stdmean_chk', 'ratioMeanChkList', 'R1MeanChkList', \
+                  'R2MeanChkList', 'ratioMeanChk', 'stdppm', 'stdMeanPPM', 'R1MeanChk', 'stdR1Chk', 'stdMeanR1Chk', \
+                  'R2MeanChkOhm', 'R2MeanChk', 'stdR2Chk', 'stdMeanR2Chk', 'R1MeanChkOhm', 'R1CorVal', 'R2CorVal', \
+                  'V1', 'V2', 'corr_bvdList', 'stdbvdList', 'bvdList_chk')
+
+    def __init__(self, mag, V1: list, V2: list, corr_bvdList: list, stdbvdList: list, bvdList_chk: list, \
+                 T1: float, T2: float, P1: float, P2: float, R1STP=None, R2STP=None, deltaI2R2=None, \
+                 debug_mode: bool=False) -> None:
+        """
+        Parameters
+        ----------
+        mag : magnicon_ccc object of the run
+        V1, V2, corr_bvdList, stdbvdList : bridge voltages from the raw text file (bvd_stat)
+        bvdList_chk : bridge voltage differences from the _bvd.txt file
+        T1, T2, P1, P2 : temperatures and total pressures of R1 and R2
+        R1STP, R2STP : user predictions at STP in ppm, None to use the resistor database
+        deltaI2R2 : user deltaI2R2, None to use the value of the run
+        """
+        self.debug_mode = debug_mode
+        if self.debug_mode:
+            logger.debug('In class: ' + self.__class__.__name__ + ' In function: ' + inspect.stack()[0][3])
+        # all BVDs of the run, the per BVD lists of the GUI are the values not masked by delete
+        self.points = {'V1': V1, 'V2': V2, 'corr_bvdList': corr_bvdList, 'stdbvdList': stdbvdList, \
+                       'bvdList_chk': bvdList_chk}
+        for name in self.point_lists[:5]:
+            self.points[name] = array(self.points[name], dtype=float64)
+        self.masks = {}
+        self.deleted = []
+        self.results(mag, T1, T2, P1, P2, R1STP, R2STP, deltaI2R2)
+
+    def results(self, mag, T1: float, T2: float, P1: float, P2: float, R1STP, R2STP, deltaI2R2) -> None:
+        """Calculates the per BVD lists of all BVDs and the statistics of the BVDs that are not deleted"""
+        if self.debug_mode:
+            logger.debug('In class: ' + self.__class__.__name__ + ' In function: ' + inspect.stack()[0][3])
+        if mag.deltaNApN1 == '':
+            self.k = 0
+            # (mag.N1*2048*mag.rangeShunt)
+        else:
+            self.k     = mag.deltaNApN1/mag.NA # in turns
+        # correction factor for R1 and R2 due to temperature and pressure
+        R1corr     = (mag.R1alpha*(T1-mag.R1stdTemp) + mag.R1beta*(T1-mag.R1stdTemp)**2) + (mag.R1pcr*(P1-101325))/1000
+        R2corr     = (mag.R2alpha*(T2-mag.R2stdTemp) + mag.R2beta*(T2-mag.R2stdTemp)**2) + (mag.R2pcr*(P2-101325))/1000
+        # print('R1 and R2 Corr: ', R1corr, R2corr)
+        self.R1corr = R1corr
+        self.R2corr = R2corr
+        self.R2STPPred = mag.R2Pred
+        if R1STP is None:
+            self.R1PPM = R1corr + mag.R1Pred
+            self.R1STPPred = mag.R1Pred
+        else:
+            self.R1PPM = R1corr + float(R1STP)
+            self.R1STPPred = float(R1STP)
+        if R2STP is None:
+            self.R2PPM = R2corr + mag.R2Pred
+            self.R2STPPred = mag.R2Pred
+        else:
+            self.R2PPM = R2corr + float(R2STP)
+            self.R2STPPred = float(R2STP)
+        self.R1    = (self.R1PPM/1000000 + 1) * mag.R1NomVal
+        self.R2    = (self.R2PPM/1000000 + 1) * mag.R2NomVal
+        self.R1NomVal = mag.R1NomVal
+        self.R2NomVal = mag.R2NomVal
+
+        if deltaI2R2 is not None:
+            myDeltaI2R2 = float(deltaI2R2)
+        else:
+            myDeltaI2R2 = float(mag.deltaI2R2)
+        try:
+            compensation = mag.N1/mag.N2 * (1 + (self.k*mag.NA/mag.N1))
+        except ZeroDivisionError:
+            compensation = 0
+            pass
+        self.myDeltaI2R2 = myDeltaI2R2
+        self.compensation = compensation
+        V1, V2, corr_bvdList, stdbvdList, bvdList_chk = (self.points[i].tolist() for i in self.point_lists[:5])
+        values = {**self.bvd_values(V1, V2, corr_bvdList, stdbvdList), **self.chk_values(bvdList_chk)}
+        for name, value in values.items():
+            setattr(self, name, value)
+        for name in self.point_lists:
+            if name in self.point_lists[5:]:
+                self.points[name] = array(getattr(self, name), dtype=float64)
+            if name not in self.masks:
+                self.masks[name] = ones(len(self.points[name]), dtype=bool)
+        self.apply_masks()
+        self.statistics(running=False)
+        self.R1CorVal = ((self.R1STPPred/1000000 + 1) * mag.R1NomVal)
+        self.R2CorVal = ((self.R2STPPred/1000000 + 1) * mag.R2NomVal)
+
+    def bvd_values(self, V1: list, V2: list, corr_bvdList: list, stdbvdList: list) -> dict:
+        """Per BVD ratios and resistances of the bridge voltages from the raw text file"""
+        values = {name: [] for name in ('ratioMeanList', 'ratioMeanStdList', 'R1List', 'R2List', 'C1R1List', \
+                                        'C1R2List', 'C2R1List', 'C2R2List')}
+        ratioMeanC1             = []
+        ratioMeanC2             = []
+        compensation, myDeltaI2R2 = self.compensation, self.myDeltaI2R2
+        R1corr, R2corr = self.R1corr, self.R2corr
+        # python floats so a zero deltaI2R2 raises ZeroDivisionError
+        for v1, v2, bvd, stdbvd in zip(V1, V2, corr_bvdList, stdbvdList):
+            # This calculation is done using the bridge voltages i.e the raw text file
+            try:
+                values['ratioMeanList'].append(compensation*(1 + (bvd/myDeltaI2R2)))
+                values['ratioMeanStdList'].append(compensation*stdbvd/myDeltaI2R2)
+                ratioMeanC1.append(compensation*(1 + v1/myDeltaI2R2))
+                ratioMeanC2.append(compensation*(1 + v2/myDeltaI2R2))
+            except ZeroDivisionError:
+                values['ratioMeanList'].append(0)
+                values['ratioMeanStdList'].append(0)
+                ratioMeanC1.append(0)
+                ratioMeanC2.append(0)
+                pass
+        for rm, rmC1, rmC2 in zip(values['ratioMeanList'], ratioMeanC1, ratioMeanC2):
+            try:
+                values['R1List'].append(float(((((self.R1*(1./rm))/self.R2NomVal) - 1) * 10**6) - R2corr)) # this is actually R2List
+                values['C1R1List'].append((self.R1/rmC1 - self.R2NomVal)/self.R2NomVal * 10**6 - R2corr)
+                values['C2R1List'].append((self.R1/rmC2 - self.R2NomVal)/self.R2NomVal * 10**6 - R2corr)
+            except ZeroDivisionError:
+                values['R1List'].append(0)
+                values['C1R1List'].append(0)
+                values['C2R1List'].append(0)
+                pass
+            try:
+                values['R2List'].append(float(((((self.R2*rm)/self.R1NomVal) - 1) * 10**6) - R1corr)) # this is actually R1List
+                values['C1R2List'].append((self.R2*rmC1 - self.R1NomVal)/self.R1NomVal * 10**6 - R1corr)
+                values['C2R2List'].append((self.R2*rmC2 - self.R1NomVal)/self.R1NomVal * 10**6 - R1corr)
+            except ZeroDivisionError:
+                values['R2List'].append(0)
+                values['C1R2List'].append(0)
+                values['C2R2List'].append(0)
+        return values
+
+    def chk_values(self, bvdList_chk: list) -> dict:
+        """Per BVD ratios and resistances of the bridge voltage differences from the _bvd.txt file"""
+        values = {'ratioMeanChkList': [], 'R1MeanChkList': [], 'R2MeanChkList': []}
+        if self.myDeltaI2R2 != 0 and bvdList_chk != []:
+            for i, j in enumerate(bvdList_chk):
+                values['ratioMeanChkList'].append(self.compensation*(1 + (j/self.myDeltaI2R2)))
+        if self.R2NomVal != 0 and self.R1NomVal != 0:
+            for i, j in enumerate(values['ratioMeanChkList']):
+                values['R1MeanChkList'].append((((self.R1/j) - self.R2NomVal)/self.R2NomVal) * 10**6 - self.R2corr) # this is actually R2
+                values['R2MeanChkList'].append(((self.R2*j - self.R1NomVal)/self.R1NomVal) * 10**6 - self.R1corr) # this is actually R1
+        return values
+
+    def extend(self, V1: list, V2: list, corr_bvdList: list, stdbvdList: list, bvdList_chk: list) -> None:
+        """Replaces the inputs by those of a run that grew while it is followed. The per BVD values are
+        calculated from the first BVD that changed on (the last BVD of the raw text file changes until its
+        half cycles are complete), the running sums are updated with the values that changed. Deleted BVDs
+        stay deleted, new BVDs are used.
+        """
+        if self.debug_mode:
+            logger.debug('In class: ' + self.__class__.__name__ + ' In function: ' + inspect.stack()[0][3])
+        def first_change(old, new) -> int:
+            n = min(len(old), len(new))
+            changed = flatnonzero(old[:n] != new[:n])
+            return int(changed[0]) if len(changed) else n
+        inputs = {'V1': V1, 'V2': V2, 'corr_bvdList': corr_bvdList, 'stdbvdList': stdbvdList, 'bvdList_chk': bvdList_chk}
+        inputs = {name: array(value, dtype=float64) for name, value in inputs.items()}
+        first = min(first_change(self.points[name], inputs[name]) for name in self.point_lists[:4])
+        first_chk = first_change(self.points['bvdList_chk'], inputs['bvdList_chk'])
+        values = {**self.bvd_values(*(inputs[name][first:].tolist() for name in self.point_lists[:4])), \
+                  **self.chk_values(inputs['bvdList_chk'][first_chk:].tolist())}
+        for name in self.point_lists:
+            start = first_chk if name in ('bvdList_chk', 'ratioMeanChkList', 'R1MeanChkList', 'R2MeanChkList') else first
+            new = inputs[name][start:] if name in inputs else array(values[name], dtype=float64)
+            old, mask = self.points[name], self.masks[name]
+            used = len(flatnonzero(mask[:start]))
+            self.points[name] = concatenate((old[:start], new))
+            self.masks[name] = ones(len(self.points[name]), dtype=bool)
+            n_kept = min(len(old), len(self.points[name]))
+            self.masks[name][:n_kept] = mask[:n_kept]
+            new = new[self.masks[name][start:]]
+            if name in self.sums:
+                sums = self.sums[name]
+                removed = old[start:][mask[start:]] - sums[0]
+                sums[1] -= removed.sum()
+                sums[2] -= (removed*removed).sum()
+                sums[3] -= len(removed)
+                if sums[3] == 0:
+                    # the sums start again around the first new value
+                    sums[:] = [new[0] if len(new) else 0., 0., 0., 0]
+                added = new - sums[0]
+                sums[1] += added.sum()
+                sums[2] += (added*added).sum()
+                sums[3] += len(added)
+            values_used = getattr(self, name)
+            del values_used[used:]
+            values_used.extend(new.tolist())
+        self.statistics(running=True)
+
+    def apply_masks(self) -> None:
+        """Sets the per BVD lists to the values that are not deleted and starts their running sums, the sums
+        are taken around the first value so the variance does not cancel for values like ratios near 1
+        """
+        self.sums = {}
+        for name in self.point_lists:
+            values = self.points[name][self.masks[name]]
+            setattr(self, name, values.tolist())
+            if name in self.summed_lists:
+                shift = values[0] if len(values) else 0.
+                values = values - shift
+                self.sums[name] = [shift, values.sum(), (values*values).sum(), len(values)]
+
+    def delete(self, index: int) -> None:
+        """Deletes the BVD at position index of the per BVD lists, only the running sums of the deleted
+        values are updated
+        """
+        if self.debug_mode:
+            logger.debug('In class: ' + self.__class__.__name__ + ' In function: ' + inspect.stack()[0][3])
+        deleted = {}
+        for name in self.point_lists:
+            used = flatnonzero(self.masks[name])
+            if index < len(used):
+                deleted[name] = used[index]
+        self.deleted.append(deleted)
+        self.toggle(deleted, False)
+
+    def restore(self) -> None:
+        """Restores the last deleted BVD"""
+        if self.debug_mode:
+            logger.debug('In class: ' + self.__class__.__name__ + ' In function: ' + inspect.stack()[0][3])
+        if self.deleted != []:
+            self.toggle(self.deleted.pop(-1), True)
+
+    def toggle(self, indices: dict, used: bool) -> None:
+        sign = 1 if used else -1
+        for name, i in indices.items():
+            self.masks[name][i] = used
+            setattr(self, name, self.points[name][self.masks[name]].tolist())
+            if name in self.sums:
+                value = self.points[name][i] - self.sums[name][0]
+                self.sums[name][1] += sign*value
+                self.sums[name][2] += sign*value*value
+                self.sums[name][3] += sign
+        self.statistics(running=True)
+
+    def moments(self, name: str, running: bool) -> tuple:
+        """(mean, standard deviation, n) of a per BVD list, from its running sums if running"""
+        if not running:
+            values = getattr(self, name)
+            return mean(values), std(values, ddof=1), len(values)
+        shift, s1, s2, n = self.sums[name]
+        if n == 0:
+            return nan, nan, 0
+        elif n == 1:
+            return shift + s1, nan, 1
+        return shift + s1/n, sqrt(max(s2 - s1*s1/n, 0.)/(n - 1)), n
+
+    def statistics(self, running: bool) -> None:
+        """Means and standard deviations of the per BVD lists"""
+        if self.ratioMeanList != []:
+            self.ratioMean, ratioStd, n = self.moments('ratioMeanList', running)
+            self.ratioStdMean = ratioStd/sqrt(n)
+            self.meanR1, self.stdR1ppm, n = self.moments('R1List', running) # this is mean of R2, std in ppm
+            self.C1R1, self.stdC1R1, _ = self.moments('C1R1List', running)
+            self.C2R1, self.stdC2R1, _ = self.moments('C2R1List', running)
+            self.stdMeanR1  = self.stdR1ppm/sqrt(n)
+            self.meanR2, self.stdR2ppm, n = self.moments('R2List', running) # this is mean of r1
+            self.C1R2, self.stdC1R2, _ = self.moments('C1R2List', running)
+            self.C2R2, self.stdC2R2, _ = self.moments('C2R2List', running)
+            self.stdMeanR2  = self.stdR2ppm/sqrt(n)
+        else:
+            self.ratioMean      = nan
+            self.ratioStdMean   = nan
+            self.meanR1         = nan
+            self.meanR2         = nan
+            self.stdR1ppm       = nan
+            self.stdR2ppm       = nan
+            self.C1R1           = nan
+            self.C1R2           = nan
+            self.C2R1           = nan
+            self.C2R2           = nan
+            self.stdC1R1        = nan
+            self.stdC1R2        = nan
+            self.stdC2R1        = nan
+            self.stdC2R2        = nan
+            self.stdMeanR1      = nan
+            self.stdMeanR2      = nan
+
+        self.N = len(self.corr_bvdList)
+        if self.corr_bvdList != []:
+            self.bvd_mean, self.bvd_std, n = self.moments('corr_bvdList', running)
+            self.bvd_stdMean   = self.bvd_std/sqrt(n)
+        else:
+            self.bvd_mean = nan
+            self.bvd_std  = nan
+            self.bvd_stdMean  = nan
+        if self.bvdList_chk != []:
+            self.bvd_mean_chk, self.bvd_std_chk, n = self.moments('bvdList_chk', running)
+            self.bvd_stdmean_chk    = self.bvd_std_chk/sqrt(n)
+        else:
+            self.bvd_mean_chk       = nan
+            self.bvd_std_chk        = nan
+            self.bvd_stdmean_chk    = nan
+
+        self.ratioMeanChk     = nan
+        self.stdppm           = nan
+        self.stdMeanPPM       = nan
+        if self.ratioMeanChkList != []:
+            self.ratioMeanChk, stdChk, n = self.moments('ratioMeanChkList', running) # calculated from bvd.txt file
+            self.stdppm     = stdChk/self.ratioMeanChk
+            self.stdMeanPPM = self.stdppm/sqrt(n)
+        if self.R2NomVal != 0 and self.R1NomVal != 0:
+            self.R1MeanChk, self.stdR1Chk, n = self.moments('R1MeanChkList', running) # this is R2
+            self.stdMeanR1Chk = self.stdR1Chk/sqrt(n) # this is R2
+            self.R2MeanChkOhm = (self.R1MeanChk/1000000 + 1) * self.R2NomVal
+            self.R2MeanChk, self.stdR2Chk, n = self.moments('R2MeanChkList', running)
+            self.stdMeanR2Chk = self.stdR2Chk/sqrt(n)
+            self.R1MeanChkOhm = (self.R2MeanChk/1000000 + 1) * self.R1NomVal
+        else:
+            self.ratioMeanChk   = nan
+            self.stdppm         = nan
+            self.stdMeanPPM     = nan
+            self.R1MeanChk      = nan
+            self.stdR1Chk       = nan
+            self.stdMeanR1Chk   = nan
+            self.R2MeanChk      = nan
+            self.stdR2Chk       = nan
+            self.stdMeanR2Chk   = nan
+            self.R1MeanChkOhm   = nan
+            self.R2MeanChkOhm   = nan
+
+# pool of processes of the raw BV deviations (calc_allan) with its number of processes, kept for the next
+# calculations so that the processes start once
+allan_pool = (0, None)
+
+def get_allan_pool(processes: int) -> ProcessPoolExecutor:
+    """The pool of processes of calc_allan, created on first use and again when the number of processes changes,
+    0 shuts it down
+    """
+    global allan_pool
+    if allan_pool[0] != processes:
+        if allan_pool[1] is not None:
+            allan_pool[1].shutdown(wait=False, cancel_futures=True)
+        allan_pool = (processes, ProcessPoolExecutor(max_workers=processes) if processes else None)
+    return allan_pool[1]
+
+def calc_allan(mag, corr_bvdList: list, V1: list, V2: list, AA: list, BB: list, A: list, B: list, \
+               overlapping: bool, variance: str, mytaus: str, \
+               keys: tuple=('bvd', 'C1', 'C2', 'aa', 'bb', 'bva', 'bvb'), processes: int=None, progress=None) -> dict:
+    """Allan or Hadamard deviations (mystat.deviation) of the BVD, C1, C2, raw BV (I-, I+) and averaged BV
+    (<I->, <I+>) data. The raw BV series have one value per sample and take nearly all of the time, they are
+    calculated on a pool of processes (mystat.deviation holds the GIL for most of its loop over the taus, so
+    threads do not run them at the same time) while the calling thread calculates the other series.
+    Parameters
+    ----------
+    overlapping : overlapping estimator if True
+    variance : 'Allan' or 'Hadamard'
+    mytaus : 'all' or 'octave'
+    keys : deviations to calculate
+    processes : number of cores used (default: all of them), 1 calculates the series in turn in this process
+    progress : optional function called with the number of finished series, the deviations that did not start
+        yet are skipped when it returns False (a raw BV deviation that already runs in the pool is not stopped)
+    Returns
+    -------
+    dict keyed 'bvd', 'C1', 'C2', 'aa', 'bb', 'bva', 'bvb' (those in keys and finished) in the order of keys of
+    (tau (s), dev, dev err, n) tuples, and 'noise_bvd', 'noise_C1', ... of the dominant power law noise alpha
+    (mystat.noise_types) at every tau
+    """
+    if progress is None:
+        progress = lambda done: True
+    # sampling rates of the BVD (full cycle), raw BV (one sample) and averaged BV (half of a half cycle)
+    bvd_rate = 1./mag.fullCyc
+    bv_rate = 1./(mag.intTime/mag.timeBase)
+    bv_avg_rate = 1./mag.dt
+    data = {'bvd': (corr_bvdList, bvd_rate), 'C1': (V1, bvd_rate), 'C2': (V2, bvd_rate), 'aa': (AA, bv_rate), \
+            'bb': (BB, bv_rate), 'bva': (A, bv_avg_rate), 'bvb': (B, bv_avg_rate)}
+    if processes is None:
+        processes = os.cpu_count() or 1
+    pooled = [key for key in ('aa', 'bb') if key in keys] if processes > 1 else []
+    futures = {}
+    if pooled:
+        executor = get_allan_pool(min(processes, len(pooled)))
+        futures = {executor.submit(mystat.deviation, *data[key], overlapping, variance, mytaus, True): key \
+                   for key in pooled}
+    adev = {}
+    try:
+        stopped = False
+        for key in keys:
+            if key not in pooled:
+                adev[key] = mystat.deviation(*data[key], overlapping, variance, mytaus, noise=True)
+                if not progress(len(adev)):
+                    stopped = True
+                    break
+        if not stopped:
+            for future in as_completed(futures):
+                adev[futures[future]] = future.result()
+                if not progress(len(adev)):
+                    break
+    except BrokenProcessPool:
+        # a process of the pool died, the next calculation starts a new pool
+        get_allan_pool(0)
+        raise
+    finally:
+        # on an error or a stop the deviations that did not start yet are dropped
+        for future in futures:
+            future.cancel()
+    res = {key: adev[key][:4] for key in keys if key in adev}
+    res.update({'noise_' + key: adev[key][4] for key in keys if key in adev})
+    return res
+
+# PSD windows and their spectral window types (0 rect, 1 welch, 2 hann)
+windows = {'hann': 2, 'rect': 0, 'welch': 1}
+
+@lru_cache(maxsize=32)
+def welch_window(nperseg: int, window: str) -> tuple:
+    """Window of a PSD segment and its normalization (spectral.norm_win), cached per length so redrawing the
+    spectra does not rebuild them. The hann window is the periodic one of scipy.signal.welch.
+    """
+    if window == 'hann':
+        win = signal.get_window('hann', nperseg)
+    elif window == 'rect':
+        win = ones(nperseg)
+    elif window == 'welch':
+        win = spectral.f_welch(arange(nperseg), nperseg)
+    else:
+        raise ValueError('unknown window: ' + str(window))
+    win.setflags(write=False)
+    return win, spectral.norm_win(win)
+
+@lru_cache(maxsize=32)
+def welch_rel_var(N: int, nperseg: int, step: int, window: str) -> float:
+    """Variance of the PSD relative to its square (spectral.psd_rel_var_NLD) for nperseg long segments of N
+    samples that start every step samples
+    """
+    K = spectral.get_number_of_segments(N, nperseg, step)
+    if K == 1:
+        return 1.0
+    try:
+        return spectral.psd_rel_var_NLD(N, nperseg, step, windows[window])
+    except ZeroDivisionError:
+        # the hann window of spectral is 0 for segments of 1 or 2 samples, taken as independent
+        return 1.0/K
+
+def welch_psd(data: list, fs: float, segments: int=1, overlap: float=0.5, window: str='hann') -> tuple:
+    """One sided power spectral density with Welch's method, the data is split in segments of len(data)//segments
+    samples that overlap by a fraction overlap, the mean of each segment is removed before the window is applied.
+    One segment gives the periodogram of scipy.signal.welch with nperseg=len(data).
+    Returns
+    -------
+    (freq, psd, var) with the variance var of the psd in each frequency bin
+    """
+    data = array(data, dtype=float64)
+    N = len(data)
+    nperseg = max(1, N//segments)
+    step = max(1, nperseg - int(round(overlap*nperseg)))
+    win, wss = welch_window(nperseg, window)
+    # views of the segments, no copies
+    segs = sliding_window_view(data, nperseg)[::step]
+    spec = fft.rfft((segs - segs.mean(axis=1, keepdims=True))*win, axis=1)
+    psd = (spec.real**2 + spec.imag**2).mean(axis=0)/(fs*nperseg*wss)
+    # one sided, the 0 and the Nyquist frequency only once
+    if nperseg % 2 == 0:
+        psd[1:-1] *= 2
+    else:
+        psd[1:] *= 2
+    return fft.rfftfreq(nperseg, 1./fs), psd, psd**2*welch_rel_var(N, nperseg, step, window)
+
+def calc_spec(mag, corr_bvdList: list, A: list, B: list, segments: int=1, overlap: float=0.5, \
+              window: str='hann') -> dict:
+    """Power spectral densities, autocorrelation and dominant power law noise of the BVD and
+    averaged BV (<I->, <I+>) data
+    Parameters
+    ----------
+    segments, overlap, window : settings of the Welch PSD (welch_psd)
+    Returns
+    -------
+    dict with the (freq, psd, psd var) tuples 'psd_bvd', 'psd_bva', 'psd_bvb', the white noise level 'h0',
+    the (lag, acf, pci, nci, cutoff_lag) tuples 'acf_bvd', 'acf_bva', 'acf_bvb' and the (power, noise)
+    tuples 'noise_bvd', 'noise_bva', 'noise_bvb'
+    """
+    spec = {}
+    samp_freq = 1./(mag.fullCyc)
+    spec['psd_bvd'] = welch_psd(corr_bvdList, samp_freq, segments, overlap, window)
+    spec['psd_bva'] = welch_psd(A, mag.dt, segments, overlap, window)
+    spec['psd_bvb'] = welch_psd(B, mag.dt, segments, overlap, window)
+    spec['h0'] = mean(spec['psd_bvd'][1][1:])
+    spec['acf_bvd'] = mystat.autoCorrelation(array(corr_bvdList))
+    spec['acf_bva'] = mystat.autoCorrelation(array(A))
+    spec['acf_bvb'] = mystat.autoCorrelation(array(B))
+    try:
+        spec['noise_bvd'] = mystat.noise1D(array(corr_bvdList))
+        spec['noise_bva'] = mystat.noise1D(array(A))
+        spec['noise_bvb'] = mystat.noise1D(array(B))
+    except Exception as e:
+        logger.warning('In function: ' + inspect.stack()[0][3] + ' Error: ' + str(e))
+        spec['noise_bvd'] = ('', '')
+        spec['noise_bva'] = ('', '')
+        spec['noise_bvb'] = ('', '')
+        pass
+    return spec
+
+def coherence_level(segments: int, p: float=0.05) -> float:
+    """Coherence that uncorrelated series exceed with probability p when averaged over the given number of
+    independent segments, 1 for one segment
+    """
+    if segments < 2:
+        return 1.0
+    return 1.0 - p**(1.0/(segments - 1))
+
+def calc_coherence(mag, V1: list, V2: list, A: list, B: list, segments: int=8, window: str='hann') -> dict:
+    """Cross spectral density and coherence (spectral.mycsdcoherence) between the C1 and C2 voltages (V1, V2)
+    and between the averaged I- and I+ bridge voltages (A, B). The pairs are cut to the same length and
+    split in segments that overlap by half, fewer segments are used for short runs.
+    Parameters
+    ----------
+    segments : number of segments
+    window : 'hann' or 'rect'
+    Returns
+    -------
+    dict with the (freq, csd, coh, level) tuples 'coh_C12' and 'coh_bv', level is the coherence_level of
+    the segments
+    """
+    coh = {}
+    # one C1 and C2 per full cycle, two I- and I+ half cycles per full cycle
+    for key, x, y, dt in (('coh_C12', V1, V2, mag.fullCyc), ('coh_bv', A, B, mag.fullCyc/2.)):
+        n = min(len(x), len(y))
+        nr = max(1, min(segments, n//2 - 1))
+        try:
+            csd, cohxy, freq = spectral.mycsdcoherence(array(x[:n], dtype=float64), array(y[:n], dtype=float64), \
+                                                       dt, windows[window], nr)
+            coh[key] = (freq, csd, cohxy, coherence_level(nr))
+        except Exception as e:
+            # too few points for a spectrum
+            logger.warning('In function: ' + inspect.stack()[0][3] + ' Error: ' + str(e))
+            coh[key] = ([], [], [], nan)
+            pass
+    return coh
+
+# Class that runs the analysis of one run without the GUI
+class ccc_analysis:
+    def __init__(self, text: str, dbdir: str='', site: str='', RStatus: str='R1', I: str='I2', polarity: str='NEG', \
+                 system: str='CCC2014-01', probe: str='Magnicon1', outliers: bool=False, overlapping: bool=False, \
+                 variance: str='Allan', mytaus: str='all', temp1_path: str='', temp2_path: str='', \
+                 R1OilDepth: float=0, R2OilDepth: float=0, c: float=0.8465, ignored_first=None, ignored_last=None, \
+                 savepath=None, cache_dir: str='', processes: int=None, segments: int=1, overlap: float=0.5, \
+                 window: str='hann', statistics: bool=True, debug_mode: bool=False) -> None:
+        """
+        Parameters
+        ----------
+        text : path of the _bvd.txt file of the run
+        dbdir, site : resistor database directory and site, as for the GUI
+        RStatus, I, polarity, system, probe : standard resistor, feedback current, SQUID feedback polarity,
+            electronics and probe written to the MDSS file (GUI defaults)
+        outliers : remove BVD outside of 3 standard deviations
+        overlapping, variance, mytaus : settings of the Allan deviations
+        temp1_path, temp2_path : environment log folders of R1 and R2, '' to use the standard temperature
+        R1OilDepth, R2OilDepth, c : oil depths of the resistors and specific gravity of the oil
+        ignored_first, ignored_last : ignored samples per half cycle, None to use the values of the run
+        savepath : folder of the MDSS file, None for the folder of the run
+        cache_dir : cache directory of the parsed files, '' to always parse them
+        processes : number of cores used by the Allan deviations (calc_allan), None for all of them
+        segments, overlap, window : settings of the Welch PSD (welch_psd)
+        statistics : calculate the spectra and Allan deviations in run, False leaves spec and adev None for
+            the caller to calculate when they are needed (the GUI does when their tab is shown)
+        """
+        self.debug_mode = debug_mode
+        if self.debug_mode:
+            logger.debug('In class: ' + self.__class__.__name__ + ' In function: ' + inspect.stack()[0][3])
+        self.txtFilePath = text
+        self.pathString = text.split('_bvd.txt')[0]
+        self.txtFile = os.path.basename(text)
+        self.dbdir = dbdir
+        self.cache_dir = cache_dir
+        self.processes = processes
+        self.site = site
+        self.RStatus = RStatus
+        self.I = I
+        self.polarity = polarity
+        self.system = system
+        self.probe = probe
+        self.outliers = outliers
+        self.overlapping = overlapping
+        self.variance = variance
+        self.mytaus = mytaus
+        self.segments = segments
+        self.overlap = overlap
+        self.window = window
+        self.statistics = statistics
+        self.spec = None
+        self.adev = None
+        self.temp1_path = temp1_path
+        self.temp2_path = temp2_path
+        self.R1OilPres = c*g*R1OilDepth
+        self.R2OilPres = c*g*R2OilDepth
+        self.ignored_first = ignored_first
+        self.ignored_last = ignored_last
+        if savepath is None:
+            self.savepath = os.path.dirname(os.path.abspath(text))
+        else:
+            self.savepath = savepath
+        self.validFile = False
+
+    def run(self, progress=None) -> bool:
+        """Reads the run, calculates the BVD, ratio, Allan deviations and spectra
+        Parameters
+        ----------
+        progress : optional function called with a status message before every step, the run stops when it
+            returns False
+        Returns
+        -------
+        True if the run has data and was not stopped by progress
+        """
+        if self.debug_mode:
+            logger.debug('In class: ' + self.__class__.__name__ + ' In function: ' + inspect.stack()[0][3])
+        if progress is None:
+            progress = lambda message: True
+        if not progress('Reading ' + self.txtFile):
+            return False
+        self.dat = magnicon_ccc(self.txtFilePath, self.dbdir, self.site, self.cache_dir)
+        self.validFile = len(self.dat.bvd) > 0
+        if not self.validFile:
+            return False
+        if self.ignored_first is None:
+            self.ignored_first = self.dat.ignored_first
+        if self.ignored_last is None:
+            self.ignored_last = self.dat.ignored_last
+        if not progress('Calculating BVD'):
+            return False
+        self.getEnv()
+        self.getBVD()
+        self.res = ccc_results(self.dat, self.V1, self.V2, self.corr_bvdList, self.stdbvdList, self.bvdList_chk, \
+                               self.R1Temp, self.R2Temp, self.R1TotPres, self.R2TotPres, debug_mode=self.debug_mode)
+        if not self.statistics:
+            return True
+        if not progress('Calculating spectra'):
+            return False
+        self.spec = calc_spec(self.dat, self.corr_bvdList, self.A, self.B, self.segments, self.overlap, self.window)
+        keys = ('bvd', 'C1', 'C2', 'aa', 'bb', 'bva', 'bvb')
+        if not progress(f'Calculating {self.variance} deviations 0/{len(keys)}'):
+            return False
+        try:
+            self.adev = calc_allan(self.dat, self.corr_bvdList, self.V1, self.V2, self.AA, self.BB, self.A, self.B, \
+                                   self.overlapping, self.variance, self.mytaus, keys, self.processes, \
+                                   lambda done: progress(f'Calculating {self.variance} deviations {done}/{len(keys)}'))
+            if any(key not in self.adev for key in keys):
+                return False
+        except Exception as e:
+            # too few BVD for a deviation, the _pyadev.txt file only gets the headers like in the GUI
+            logger.warning('In class: ' + self.__class__.__name__ + ' In function: ' + inspect.stack()[0][3] + \
+                           ' Error: ' + repr(e))
+            self.adev = {key: ([], [], [], []) for key in keys}
+            pass
+        return True
+
+    def getEnv(self) -> None:
+        """Average temperature and pressure of the resistors during the run, R1EnvStats and R2EnvStats also
+        have their standard deviations and the number of samples
+        """
+        if self.debug_mode:
+            logger.debug('In class: ' + self.__class__.__name__ + ' In function: ' + inspect.stack()[0][3])
+        # (T_mean, T_std, P_mean, P_std, n) of the environment logs for the uncertainty budget
+        self.R1EnvStats = (nan, nan, nan, nan, 0)
+        self.R2EnvStats = (nan, nan, nan, nan, 0)
+        try:
+            if self.temp1_path != '':
+                self.R1EnvStats = env(self.temp1_path, self.dat.startDate, self.dat.endDate).calc_statistics()
+                (self.R1Temp, self.R1pres) = (self.R1EnvStats[0], self.R1EnvStats[2])
+            else:
+                self.R1Temp = self.dat.R1stdTemp
+                self.R1pres = 101325
+            if self.temp2_path != '':
+                self.R2EnvStats = env(self.temp2_path, self.dat.startDate, self.dat.endDate).calc_statistics()
+                (self.R2Temp, self.R2pres) = (self.R2EnvStats[0], self.R2EnvStats[2])
+            else:
+                self.R2Temp = self.dat.R2stdTemp
+                self.R2pres = 101325
+        except Exception as e:
+            logger.warning('In class: ' + self.__class__.__name__ + ' In function: ' + inspect.stack()[0][3] + \
+                           ' Error: ' + str(e))
+            self.R1Temp = 25
+            self.R2Temp = 25
+            self.R1pres = 101325
+            self.R2pres = 101325
+            pass
+        self.R1TotPres = self.R1pres + self.R1OilPres
+        self.R2TotPres = self.R2pres + self.R2OilPres
+
+    def getBVD(self) -> None:
+        """Calculates the BVD from the raw text file and removes outliers like Ui_mainWindow.getBVD"""
+        if self.debug_mode:
+            logger.debug('In class: ' + self.__class__.__name__ + ' In function: ' + inspect.stack()[0][3])
+        self.bvd_stat_obj = bvd_stat(self.txtFilePath, int(self.ignored_first), int(self.ignored_last), self.dat, \
+                                     self.debug_mode)
+        self.bvdList, self.V1, self.V2, self.A, self.B, self.stdA, self.stdB, self.AA, self.BB, self.stdbvdList, \
+            self.AA_used, self.BB_used = self.bvd_stat_obj.send_bvd_stats()
+        self.bvd_stat_obj.clear_bvd_stats()
+        self.corr_bvdList = []
+        self.bvdList_chk = []
+        if self.outliers and self.bvdList != []:
+            BVDmean = mean(self.bvdList)
+            BVDstd  = std(self.bvdList, ddof=1)
+            upper   =  3*BVDstd + BVDmean
+            lower   = -3*BVDstd + BVDmean
+            for i in self.bvdList:
+                if i < upper and i > lower:
+                    self.corr_bvdList.append(i)
+        else:
+            self.corr_bvdList = self.bvdList
+        if self.dat.bvd != []:
+            if self.outliers:
+                bvd_mean_chk = mean(self.dat.bvd)
+                bvd_std_chk  = std(self.dat.bvd, ddof=1)
+                for i in self.dat.bvd:
+                    if i > -3*bvd_std_chk + bvd_mean_chk and i < 3*bvd_std_chk + bvd_mean_chk:
+                        self.bvdList_chk.append(i)
+            else:
+                self.bvdList_chk = self.dat.bvd
+
+    def save(self) -> None:
+        """Writes the _pyMDSS.txt, _pyCCCRAW.mea, _pyBV.mea, _pyadev.txt and _pypsd.txt files of the run"""
+        if self.debug_mode:
+            logger.debug('In class: ' + self.__class__.__name__ + ' In function: ' + inspect.stack()[0][3])
+        res = self.res
+        samplesUsed = int(self.dat.SHC) - (int(self.ignored_first) + int(self.ignored_last))
+        # same rounding as the GUI line edits the values are read back from
+        meas = "{:2.2f}".format(self.dat.meas)
+        delay = "{:2.2f}".format(self.dat.delay)
+        comments = self.dat.comments + ', Ratio: ' + str(res.ratioMean) + ' +/- ' + str(res.ratioStdMean)
+        writeDataFile(savepath=self.savepath, text=self.txtFile, dat_obj=self.dat, \
+                      bvd_stat_obj=self.bvd_stat_obj, RStatus=self.RStatus, \
+                      R1Temp=self.R1Temp, R2Temp=self.R2Temp, R1Pres=self.R1TotPres, \
+                      R2Pres=self.R2TotPres, I=self.I, \
+                      polarity=self.polarity, system=self.system, \
+                      probe=self.probe, meanR1=res.meanR1, meanR2=res.meanR2, \
+                      stdR1ppm=res.stdR1ppm, stdR2ppm=res.stdR2ppm, R1MeanChkOhm=res.R1MeanChkOhm, \
+                      R2MeanChkOhm=res.R2MeanChkOhm, C1R1=res.C1R1, C2R1=res.C2R1, \
+                      stdC1R1=res.stdC1R1, stdC2R1=res.stdC2R1, C1R2=res.C1R2, \
+                      C2R2=res.C2R2, stdC1R2=res.stdC1R2, stdC2R2=res.stdC2R2,\
+                      R1PPM=res.R1PPM, R2PPM=res.R2PPM, bvd_mean=res.bvd_mean, \
+                      N=res.N, samplesUsed=samplesUsed, meas=float(meas), delay=float(delay), \
+                      R1PredictionSTP=float("{:2.7f}".format(res.R1STPPred)), \
+                      R2PredictionSTP=float("{:2.7f}".format(res.R2STPPred)), comments=comments)
+        write_mea_files(pathString=self.pathString, dat_obj=self.dat, RStatus=self.RStatus, R1PPM=res.R1PPM, \
+                        R1=res.R1, R2PPM=res.R2PPM, R2=res.R2, samplesUsed=samplesUsed, meas=meas, delay=delay, \
+                        comments=comments, corr_bvdList=self.corr_bvdList, ratioMeanList=res.ratioMeanList, \
+                        stdbvdList=self.stdbvdList, ratioMeanStdList=res.ratioMeanStdList, AA=self.AA, BB=self.BB)
+        write_adev_file(self.pathString, self.adev)
+        write_psd_file(self.pathString, self.spec)
@@ -108,5 +108,53 @@ class writeDataFile():
                 f.write(f'|{dat_obj.R1ID}')
             f.write('|Magnicon CCC Process|StandRes')
 
+def write_mea_files(pathString: str, dat_obj: magnicon_ccc, RStatus: str, R1PPM: float, R1: float, R2PPM: float, \
+                    R2: float, samplesUsed: int, meas: str, delay: str, comments: str, corr_bvdList: list, \
+                    ratioMeanList: list, stdbvdList: list, ratioMeanStdList: list, AA: list, BB: list) -> None:
+    """Writes the _pyCCCRAW.mea (BVD and ratio) and _pyBV.mea (raw bridge voltages) files next to the run"""
+    if RStatus == 'R1':
+        unk = 'R2'
+    else:
+        unk = 'R1'
+    header = '# Standard: ' +  str(RStatus) + '\n' + '# Unknown: ' + str(unk) + '\n' + \
+             '# Start Time: ' + str(dat_obj.startDate) + '\n' + '# End Time: ' + str(dat_obj.endDate) + '\n' + \
+             '# R1 Serial: ' + str(dat_obj.R1SN) + '\n' + '# R1 PPM: ' + str(R1PPM) + '\n' + \
+             '# R1 Value: ' + str(R1) + '\n' + '# R2 Serial: ' + str(dat_obj.R2SN) + '\n' + \
+             '# R2 PPM: ' + str(R2PPM) + '\n' + '# R2 Value: ' + str(R2) + '\n' + \
+             '# R1 Current: ' + str(dat_obj.I1) + '\n' + '# R2 Current: ' + str(dat_obj.I2) + '\n' + \
+             '# N1: ' + str(dat_obj.N1) + '\n' + '# N2: ' + str(dat_obj.N2) + '\n' + \
+             '# Meas/Stats: ' + str(dat_obj.SHC) + '/' + str(samplesUsed) + '\n' + '# Full Cycle Time: ' + str(dat_obj.fullCyc) + '\n' + \
+             '# Ramp Time: ' + str(dat_obj.rampTime) + '\n' + '# Measurement Time: ' + str(meas) + '\n' + \
+             '# Delay: ' + str(delay) + '\n' + \
+             '# Comment: ' + str(comments) + '\n'
+    with open(pathString + '_pyCCCRAW.mea', 'w') as mea_file:
+        mea_file.write(header + '# BVD [V]' + '\t' + 'Ratio' + '\t' + 'StdrtN[BVD]' + '\t' + 'StdrtN[Ratio]' + '\n\n')
+        for i, j, k, l in zip(corr_bvdList, ratioMeanList, stdbvdList, ratioMeanStdList):
+            mea_file.write(str(i) + '\t' + str(j) + '\t' + str(k) + '\t' + str(l) + '\n')
+    with open(pathString + '_pyBV.mea', 'w') as mea_file:
+        mea_file.write(header + '# V(I-) [V]' + '\t' + 'V(I+) [V]' + '\n\n')
+        for i, j in zip(AA, BB):
+            mea_file.write(str(i) + '\t' + str(j) + '\n')
+
+def write_adev_file(pathString: str, adev: dict) -> None:
+    """Writes the _pyadev.txt file from the (tau, dev, dev err, n) tuples of ccc_analysis.calc_allan"""
+    with open(pathString + '_pyadev.txt', 'w') as adev_file:
+        for key, label in (('bvd', 'BVD'), ('bva', 'BV <I->'), ('bvb', 'BV <I+>'), ('aa', 'BV I-'), ('bb', 'BV I+')):
+            # Create header string
+            adev_file.write('tau (s)' + '\t' + 'adev [' + label + ']' + '\t' + 'adev err [' + label + ']' + '\n')
+            for i, j, k, in zip(adev[key][0], adev[key][1], adev[key][2]):
+                adev_file.write(str(i) + '\t' + str(j) + '\t' + str(k) + '\n')
+            adev_file.write('\n')
+
+def write_psd_file(pathString: str, spec: dict) -> None:
+    """Writes the _pypsd.txt file from the (freq, psd, psd var) tuples of ccc_analysis.calc_spec"""
+    with open(pathString + '_pypsd.txt', 'w') as psd_file:
+        for key, label in (('psd_bvd', 'BVD'), ('psd_bva', 'BV I-'), ('psd_bvb', 'BV I+')):
+            # Create header string
+            psd_file.write('f (Hz)' + '\t' + 'psd [' + label + ']' + '\t' + 'psd var [' + label + ']' + '\n')
+            for i, j, k in zip(spec[key][0], spec[key][1], spec[key][2]):
+                psd_file.write(str(i) + '\t' + str(j) + '\t' + str(k) + '\n')
+            psd_file.write('\n')
+
 if __name__ == '__main__':
     print("I am main")
\ No newline at end of file
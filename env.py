@@ -1,7 +1,9 @@
-from numpy import asarray, float64, nan
-from pandas import read_csv, to_datetime, concat
-from os import sep, scandir
-from datetime import datetime
+from collections import OrderedDict
+from threading import Lock
+from numpy import asarray, float64, nan, inf, isnan, where, cumsum, concatenate, argsort, searchsorted, nanmin, nanmax, sqrt
+from pandas import read_csv
+from os import sep, scandir, stat
+from datetime import datetime, timedelta
 
 EPOCH = 2082844800
 class env:
@@ -28,78 +30,201 @@ class env:
         # z = (datetime(1970, 1, 1, 0, 0, 0, tzinfo=timezone.utc) - datetime(1904, 1, 1, 0, 0, 0, tzinfo=timezone.utc)).total_seconds()
         self.start_timestamp = x # referenced to posix timestamp
         self.end_timestamp = y # referenced to posix timestamp
-        self.mydata = []
 
-    def _read_helper(self, filename, ):
-        """Helper function for get_data()
+    def dates(self):
+        """Dates ('YYYYMMDD') of the log files from the start to the end date"""
+        return [(self.start_date + timedelta(days=i)).strftime('%Y%m%d') \
+                for i in range((self.end_date - self.start_date).days + 1)]
 
-        Parameters
-        ----------
-        filename : str
-            name of csv file to read
+    def calc_statistics(self):
+        """ Calculates the mean and standard deviation of the sample
+            temperature and pressure data within the specified interval
+            from the log files of every day from the start to the end date
         Returns
         -------
-        mydata : list
-            data in the csv file
+        (T_mean, T_std, P_mean, P_std, n) : n samples in the interval, nan if there is no data
         """
         try:
-            mydata = []
-            mydata.append(read_csv(filename, sep='\t', dtype={0:"float64", 1:"float64", 2:"float64"},\
-                                   on_bad_lines='skip', na_filter=True, index_col=False, memory_map=True, \
-                                   engine='c', names=['TS','T','P'], lineterminator='\n'))
-            return mydata
-        except Exception as e:
-            print('Error in file: ', filename)
-            print(e)
-
-    def _get_data(self):
-        try:
-            for filename in scandir(self.filepath):
-                self.filename = filename.name
-                # print(self.filename)
-                # print ((filename.name.split('_')[-1]).split('.')[0], self.start_date_fin, self.end_date_fin)
-                if filename.name != '' and ((filename.name.split('_')[-1]).split('.')[0] == self.start_date_fin \
-                   or (filename.name.split('_')[-1]).split('.')[0] == self.end_date_fin):
-                    self.mydata.append(self._read_helper(self.filepath + sep + filename.name))  
-            for i in self.mydata:
-                self.df = concat(i,ignore_index = True )
-            self.df['TS'] = self.df['TS'] - EPOCH # labview timestamp to posix timestamp
-            self.df.insert(0, "Date", to_datetime(self.df['TS'], utc=True, unit='s'))
-            self.df['Date'] = self.df['Date'].dt.tz_convert('America/New_York')
-            # to convert to eastern time use below
-            self.df.set_index('Date', inplace=True)
-            # print(self.df)
+            return env_store.load(self.filepath).statistics(self.start_timestamp, self.end_timestamp, self.dates())
         except Exception as e:
             print(e)
+            return(nan, nan, nan, nan, 0)
             pass
-    
+
     def calc_average(self):
         """ Calculates the mean of the sample temperature data
             within the specified interval
         Returns
         -------
-        None.
+        (T_mean, P_mean) : mean temperature and pressure, nan if there is no data
         """
-        self._get_data()
-        new_df = None
-        try:
-            # print(self.start_timestamp, self.df['TS'])
-            new_df = self.df[(self.df['TS'] >= self.start_timestamp) & (self.df['TS'] <= self.end_timestamp)]
-            # print(new_df.head(3), new_df.tail(3))
-            new_df.astype({'TS': 'float64'}).dtypes
-            # print(new_df_tempCtrl.describe())
-            # sampleT_mean = new_df_tempCtrl['Sample temp'].mean(skipna=True, numeric_only=True)
-            T_mean = round(asarray(new_df['T'], dtype=float64).mean(), 6)
-            P_mean = round(asarray(new_df['P'], dtype=float64).mean(), 6)
-            return(T_mean, P_mean*1e3)
-        except Exception as e:
-            print(e)
-            return(nan, nan)
-            pass
+        (T_mean, T_std, P_mean, P_std, n) = self.calc_statistics()
+        return(T_mean, P_mean)
+
+def combine_moments(a, b):
+    """Combines the (count, mean, sum of squared deviations) of two sets of samples"""
+    (na, ma, Ma), (nb, mb, Mb) = a, b
+    if na == 0:
+        return b
+    if nb == 0:
+        return a
+    n = na + nb
+    d = mb - ma
+    return (n, ma + d*nb/n, Ma + Mb + d*d*na*nb/n)
+
+class env_store:
+    """Environment logs of one directory. The day files (name_YYYYMMDD.txt) are indexed by date once and
+    again only when the directory changes. The files of the first and last day of an interval are parsed
+    and kept in memory until more than max_days were read, the days in between only need their totals
+    which are read in chunks of chunk_rows lines. A file is read again when its modification time or size
+    changed, the log of the current day grows. The store of a directory is shared by all runs of the
+    process, see load.
+    """
+    max_days = 8
+    chunk_rows = 100000
+    _stores = {}
+    _lock = Lock()
+
+    def __init__(self, filepath):
+        self.filepath = filepath
+        self.dir_signature = None
+        self.files = {} # date 'YYYYMMDD' -> names of its files
+        self.days = OrderedDict() # name -> (signature, TS, prefix sums of T and P), oldest first
+        self.totals = {} # name -> (signature, first and last TS, moments of T and P)
+        self.lock = Lock()
+
+    @classmethod
+    def load(cls, filepath):
+        with cls._lock:
+            if filepath not in cls._stores:
+                cls._stores[filepath] = cls(filepath)
+            return cls._stores[filepath]
+
+    @staticmethod
+    def file_signature(path):
+        st = stat(path)
+        return (st.st_mtime_ns, st.st_size)
+
+    @staticmethod
+    def read(path, **kwargs):
+        return read_csv(path, sep='\t', dtype={0:"float64", 1:"float64", 2:"float64"},\
+                        on_bad_lines='skip', na_filter=True, index_col=False, memory_map=True, \
+                        engine='c', names=['TS','T','P'], lineterminator='\n', **kwargs)
+
+    def index(self):
+        """Indexes the files of the directory by the date at the end of their name"""
+        signature = self.file_signature(self.filepath)
+        if signature != self.dir_signature:
+            files = {}
+            for filename in scandir(self.filepath):
+                if filename.name != '':
+                    files.setdefault((filename.name.split('_')[-1]).split('.')[0], []).append(filename.name)
+            self.files = files
+            self.dir_signature = signature
+        return self.files
+
+    def day(self, name):
+        """Returns the sorted posix timestamps of the file name and for the temperatures and pressures the
+        prefix sums of the nan samples and of the deviations and squared deviations of the others from the
+        first one, parses the file if it is not in memory or changed
+        """
+        path = self.filepath + sep + name
+        signature = self.file_signature(path)
+        if name in self.days and self.days[name][0] == signature:
+            self.days.move_to_end(name)
+            return self.days[name][1:]
+        df = self.read(path)
+        TS = asarray(df['TS'], dtype=float64) - EPOCH # labview timestamp to posix timestamp
+        order = argsort(TS, kind='stable')
+        data = [TS[order]]
+        for col in ('T', 'P'):
+            x = asarray(df[col], dtype=float64)[order]
+            bad = isnan(x)
+            # deviations from a sample keep the sums of squares accurate
+            ref = x[~bad][0] if (~bad).any() else 0.
+            y = where(bad, 0., x - ref)
+            data.append((ref, concatenate(([0], cumsum(bad))), concatenate(([0.], cumsum(y))), \
+                         concatenate(([0.], cumsum(y*y)))))
+        self.days[name] = (signature, *data)
+        while len(self.days) > self.max_days:
+            self.days.popitem(last=False)
+        return tuple(data)
+
+    def day_totals(self, name):
+        """Returns the first and last posix timestamp of the file name and the (nan samples, count, mean, sum
+        of squared deviations) of the other temperatures and pressures, the file is read in chunks
+        """
+        path = self.filepath + sep + name
+        signature = self.file_signature(path)
+        if name in self.totals and self.totals[name][0] == signature:
+            return self.totals[name][1:]
+        first, last = inf, -inf
+        moments = {'T': [0, (0, 0., 0.)], 'P': [0, (0, 0., 0.)]}
+        for chunk in self.read(path, chunksize=self.chunk_rows):
+            TS = asarray(chunk['TS'], dtype=float64) - EPOCH
+            if (~isnan(TS)).any():
+                first, last = min(first, nanmin(TS)), max(last, nanmax(TS))
+            for col in ('T', 'P'):
+                x = asarray(chunk[col], dtype=float64)
+                bad = isnan(x)
+                x = x[~bad]
+                moments[col][0] += int(bad.sum())
+                if len(x):
+                    m = x.mean()
+                    moments[col][1] = combine_moments(moments[col][1], (len(x), m, float(((x - m)**2).sum())))
+        totals = (first, last, (moments['T'][0], *moments['T'][1]), (moments['P'][0], *moments['P'][1]))
+        self.totals[name] = (signature, *totals)
+        return totals
+
+    def statistics(self, start_timestamp, end_timestamp, dates):
+        """Mean and standard deviation of the temperature and pressure (in Pa) of the samples from
+        start_timestamp to end_timestamp (posix) in the files of the dates ('YYYYMMDD') and the number of
+        samples. The means are nan if there are no samples or one is nan, the standard deviations also if
+        there is only one. The first and last day are searched for the interval and summed with their
+        prefix sums, the totals of the days in between are used if all their samples are in the interval.
+        """
+        n = 0
+        moments = {'T': [0, (0, 0., 0.)], 'P': [0, (0, 0., 0.)]}
+        with self.lock:
+            files = self.index()
+            for k, date in enumerate(dates):
+                for name in files.get(date, []):
+                    try:
+                        if 0 < k < len(dates) - 1:
+                            first, last, T, P = self.day_totals(name)
+                            if first >= start_timestamp and last <= end_timestamp:
+                                n += max(T[0] + T[1], P[0] + P[1])
+                                for col, (bad, count, mean, M2) in (('T', T), ('P', P)):
+                                    moments[col][0] += bad
+                                    moments[col][1] = combine_moments(moments[col][1], (count, mean, M2))
+                                continue
+                        TS, T, P = self.day(name)
+                    except Exception as e:
+                        print('Error in file: ', name)
+                        print(e)
+                        continue
+                    i = searchsorted(TS, start_timestamp, 'left')
+                    j = searchsorted(TS, end_timestamp, 'right')
+                    if j > i:
+                        n += j - i
+                        for col, (ref, bad, s, ss) in (('T', T), ('P', P)):
+                            moments[col][0] += bad[j] - bad[i]
+                            count = (j - i) - (bad[j] - bad[i])
+                            if count:
+                                d = s[j] - s[i]
+                                moments[col][1] = combine_moments(moments[col][1], \
+                                                                  (count, ref + d/count, max(ss[j] - ss[i] - d*d/count, 0.)))
+        res = []
+        for col, scale in (('T', 1), ('P', 1e3)):
+            bad, (count, mean, M2) = moments[col]
+            if bad or count == 0:
+                res += [nan, nan]
+            else:
+                res += [round(mean, 6)*scale, sqrt(M2/(count - 1))*scale if count > 1 else nan]
+        return(*res, int(n))
 
 if __name__ == "__main__":
     debug = False
     if debug == True:
         obj = env(r'C:\Environment\Room-E014', '4/5/2024 06:14:18 PM', '4/5/2024 06:20:18 PM')
-        obj.get_data()
         obj.calc_average()
\ No newline at end of file
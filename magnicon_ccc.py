@@ -2,8 +2,14 @@ import logging
 logger = logging.getLogger(__name__)
 from time import mktime
 from datetime import datetime, timedelta
-import sys, os, inspect
-from numpy import std, floor, nan
+import sys, os, inspect, json
+from io import BytesIO
+from hashlib import sha1
+from tempfile import mkdtemp
+from shutil import rmtree
+from numpy import std, floor, nan, inf, array, float64, int8, save, load, empty
+from pandas import read_csv
+from pandas.errors import EmptyDataError
 import win32file
 
 # Put ResDataBase.py in branch to use on non-NIST computers
@@ -23,10 +29,11 @@ else:
         running_mode = 'Interactive'
 # Class for parsing CCC files
 class magnicon_ccc:
-    def __init__(self, text: str, dbdir: str, site: str) -> None:
+    def __init__(self, text: str, dbdir: str, site: str, cache_dir: str='', header_only: bool=False) -> None:
         self.dbdir = dbdir
         self.site = site
         self.text = text
+        self.cache_dir = cache_dir
         # Reads in file and checks that it is a .txt file
         if '_bvd.txt' in self.text:
             # If the file is a .txt file, it will parse it along with the bvd and cfg files after it
@@ -35,34 +42,47 @@ class magnicon_ccc:
             self.bvdFile = self.text
             self.cfgFile = self.text.rstrip('_bvd.txt') + '_cccdrive.cfg'
             # print (self.rawFile, self.bvdFile, self.cfgFile)
-            self.load_raw()
-            # print("Raw loaded...")
-            self.load_bvd()
-            # print("BVD loaded...")
-            self.load_cfg()
-            # print("Config loaded...")
+            if header_only:
+                # only the header of the raw data file and the config file, to index runs without their samples
+                self.load_raw(samples=False)
+                self.load_cfg()
+                return
+            # the parsed files are reused from the cache unless one of them changed
+            if not self.load_cache():
+                self.load_raw()
+                # print("Raw loaded...")
+                self.load_bvd()
+                # print("BVD loaded...")
+                self.load_cfg()
+                # print("Config loaded...")
+                self.save_cache()
             self.calculations()
             # print("Calculations done...")
         else:
             self.validFile = False
 
     # Parses the raw data (first .txt file)
-    def load_raw(self) -> None:
+    def load_raw(self, samples: bool=True) -> None:
         if not self.validFile:
             return
         self.comments = ''
-        collectData   = False
-        self.rawData  = []
-        self.phase    = []
-        self.error    = []
+        self.rawData  = array([], dtype=float64)
+        self.phase    = array([], dtype=int8)
+        self.error    = array([], dtype=int8)
         try:
-            with open (self.rawFile, "r") as file:
-                for line in file.readlines():
+            # the header is parsed line by line up to the data(V) column titles, the rest of the file
+            # is handed to a single bulk numeric read
+            with open (self.rawFile, "rb") as file:
+                while True:
+                    line = file.readline()
+                    if not line:
+                        break
+                    line = line.decode('latin-1')
                     if line.startswith('R1 Info'):
-                        self.R1SN = line.split(':')[-1].rstrip(' \n')
+                        self.R1SN = line.split(':')[-1].rstrip(' \r\n')
                         self.R1SN = self.R1SN.lstrip(' \t')
                     elif line.startswith('R2 Info'):
-                        self.R2SN = line.split(':')[-1].rstrip(' \n')
+                        self.R2SN = line.split(':')[-1].rstrip(' \r\n')
                         self.R2SN = self.R2SN.lstrip(' \t')
                     elif line.startswith('number of samples per half cycle'):
                         self.SHC = int(line.split(':')[-1].rstrip(' \n'))
@@ -71,7 +91,7 @@ class magnicon_ccc:
                     elif line.startswith('ignored last samples'):
                         self.ignored_last = int(line.split(':')[-1].rstrip(' \n'))
                     elif line.startswith('remarks'):
-                        self.comments = line.split(':')[-1].rstrip(' \n')
+                        self.comments = line.split(':')[-1].rstrip(' \r\n')
                         self.comments = self.comments.lstrip(' \t')
                     elif line.startswith('stop date'):
                         if 'x' in line:
@@ -89,12 +109,19 @@ class magnicon_ccc:
                             t1       = [int(line.split('.')[0].lstrip('stop time: \t')), int(line.split('.')[1]), int(line.split('.')[2].rstrip(' \n'))]
                     elif line.startswith('start time'):
                         t2 = [int(line.split('.')[0].lstrip('start time: \t')), int(line.split('.')[1]), int(line.split('.')[2].rstrip(' \n'))]
-                    elif collectData:
-                        self.rawData.append(float(line.split('\t')[0]))
-                        self.phase.append(int(line.split('\t')[1]))
-                        self.error.append(int(line.split('\t')[2]))
                     elif line.startswith('data(V)'):
-                        collectData = True
+                        # byte offset of the first sample line and of the end of the last sample line read
+                        self.dataOffset = self.dataEnd = file.tell()
+                        self.dataTitles = line
+                        if not samples:
+                            pass
+                        elif stopDate:
+                            self.rawData, self.phase, self.error = self.read_data_block(file)
+                            self.dataEnd = file.seek(0, os.SEEK_END)
+                        else:
+                            # the run is still being written, a partly written last line is left to append_raw
+                            self.rawData, self.phase, self.error = self.read_complete_lines(file)
+                        break
                     elif line.startswith('time base (Hz)'):
                         self.timeBase = line.split(':')[-1].rstrip(' \n')
                         self.timeBase = int(self.timeBase.lstrip(' \t'))
@@ -129,16 +156,80 @@ class magnicon_ccc:
             self.timeStamp = mktime(self.DT.timetuple())
         # This does not average
         # self.timeStamp = mktime(datetime(d2[0], d2[1], d2[2], t2[0], t2[1], t2[2]).timetuple())
+
+    @staticmethod
+    def read_data_block(file) -> tuple:
+        """Reads the tab separated data(V), phase, error sample lines from the current position of
+        the binary file handle in one pass of the pandas C parser
+        Returns
+        -------
+        (rawData, phase, error) as float64, int8 and int8 arrays
+        """
+        try:
+            df = read_csv(file, sep='\t', header=None, usecols=[0, 1, 2], names=['data', 'phase', 'error'], \
+                          dtype=float64, engine='c', on_bad_lines='skip').dropna()
+        except EmptyDataError:
+            return array([], dtype=float64), array([], dtype=int8), array([], dtype=int8)
+        return df['data'].to_numpy(dtype=float64), df['phase'].to_numpy(dtype=int8), df['error'].to_numpy(dtype=int8)
+
+    def read_complete_lines(self, file) -> tuple:
+        """Reads the sample lines from the byte offset dataEnd up to the last complete line of the binary file
+        handle and moves dataEnd after it
+        Returns
+        -------
+        (rawData, phase, error) as float64, int8 and int8 arrays
+        """
+        file.seek(self.dataEnd)
+        block = file.read()
+        end = block.rfind(b'\n') + 1
+        self.dataEnd += end
+        return self.read_data_block(BytesIO(block[:end]))
+
+    def append_raw(self) -> int:
+        """Parses the sample lines that were appended to the raw data file since it was read, while the
+        Magnicon software is still writing the run. Only the bytes after dataEnd are read. The samples are
+        appended to growing arrays and rawData, phase and error are set to views of them.
+        Returns
+        -------
+        number of new samples, -1 if the run stopped or the header changed and the file has to be read again
+        """
+        if not self.validFile:
+            return 0
+        titles = self.dataTitles.encode('latin-1')
+        with open (self.rawFile, "rb") as file:
+            header = file.read(self.dataOffset)
+            if not header.endswith(titles):
+                return -1
+            # the stop date, time and environment values are written over placeholders of the same length
+            # (xxxx-xx-xx, xx.x) when the run stops, so the stop date line itself is checked
+            if self.endDate == 'xx/xx/xx xx:xx:xx' and \
+               any(line.startswith(b'stop date') and b'x' not in line for line in header.splitlines()):
+                return -1
+            new = self.read_complete_lines(file)
+        if len(new[0]) == 0:
+            return 0
+        if not hasattr(self, 'samples'):
+            self.samples = [growing_array(getattr(self, key)) for key in self.mapped_arrays]
+        for key, samples, values in zip(self.mapped_arrays, self.samples, new):
+            samples.extend(values)
+            setattr(self, key, samples.values())
+        return len(new[0])
+
     # Parses the bvd.txt file
     def load_bvd(self) -> None:
         self.relHum = self.comTemp = self.cnTemp = self.nvTemp = self.deltaNApN1 = self.deltaI2R2 = ''
         if not self.validFile:
             return
         try:
-            with open (self.bvdFile, "r") as file:
-                start    = False
+            # the header is parsed line by line up to the #points column titles, the BVD table is handed to a
+            # single bulk numeric read and the summary is taken from the last line
+            with open (self.bvdFile, "rb") as file:
                 self.bvd = []
-                for line in file.readlines():
+                while True:
+                    line = file.readline()
+                    if not line:
+                        break
+                    line = line.decode('latin-1')
                     if line.startswith('com rel. hum'):
                         try:
                             self.relHum = float(line.split(':')[-1].rstrip(' \n'))
@@ -168,25 +259,75 @@ class magnicon_ccc:
                     elif line.startswith('delta (I2*R2)'):
                         self.deltaI2R2 = float(line.split(':')[-1].rstrip(' \n'))
                     elif line.startswith('#points'):
-                        start = True
-                    if start and line.split()[0].isnumeric():
-                        self.bvd.append(float(line.split()[1]))
-                array = line.split()
-                if array[0].isnumeric():
-                    self.bvdMean = float(array[2])
-                    self.stddrt = float(array[3])
-                else:
-                    self.bvd = []
-                    self.bvdMean = 0
-                    self.stddrt = 0
-                if len(self.bvd) > 0:
-                    self.bvdStd = std(self.bvd, ddof=1)
-                else:
-                    self.bvdStd = 0
+                        self.bvd = self.read_bvd_table(file)
+                        break
+            summary = self.bvd_summary(self.bvdFile)
+            if summary is not None:
+                self.bvdMean = summary[2]
+                self.stddrt = summary[3]
+            else:
+                self.bvd = []
+                self.bvdMean = 0
+                self.stddrt = 0
+            if len(self.bvd) > 0:
+                self.bvdStd = std(self.bvd, ddof=1)
+            else:
+                self.bvdStd = 0
         except Exception as e:
             print("In function: " +  inspect.stack()[0][3] + " Exception: " + str(e))
             pass
 
+    @staticmethod
+    def read_bvd_table(file) -> list:
+        """Reads the bvd(V) column of the #points table of a _bvd.txt file from the current position of the
+        binary file handle in one pass of the pandas C parser, only the lines that start with a point number.
+        A table with the NaN or Inf of the Magnicon software is read again as text.
+        Returns
+        -------
+        list of BVDs
+        """
+        start = file.tell()
+        try:
+            df = read_csv(file, sep='\t', header=None, usecols=[0, 1], names=['point', 'bvd'], dtype=float64, \
+                          engine='c', on_bad_lines='skip')
+            return df['bvd'][df['point'].notna()].tolist()
+        except EmptyDataError:
+            return []
+        except ValueError:
+            file.seek(start)
+        df = read_csv(file, sep='\t', header=None, usecols=[0, 1], names=['point', 'bvd'], dtype=str, \
+                      engine='c', on_bad_lines='skip')
+        return [magnicon_float(i) for i in df['bvd'][df['point'].str.isnumeric().fillna(False).astype(bool)]]
+
+    @staticmethod
+    def bvd_summary(bvdFile: str, size: int=4096) -> tuple:
+        """Last row of the #points table of a _bvd.txt file, read from the end of the file without parsing the
+        others: the number of BVDs, the last BVD, the mean of the BVDs and the standard deviation of the mean
+        computed by the Magnicon software. The NaN and Inf of the software are read as nan and inf.
+        Returns
+        -------
+        (points, bvd, bvdmean, stddrt), None if the file has no BVD
+        """
+        with open (bvdFile, "rb") as file:
+            end = file.seek(0, os.SEEK_END)
+            start = end
+            while start > 0:
+                # a larger block is read until it holds a complete line
+                start = max(0, end - size)
+                file.seek(start)
+                lines = file.read(end - start).decode('latin-1').split('\n')
+                # the first line can be cut unless the block starts at the beginning of the file
+                lines = [i for i in (lines if start == 0 else lines[1:]) if i.strip() != '']
+                for line in reversed(lines):
+                    array = line.split()
+                    if not array[0].isnumeric():
+                        return None
+                    # a last line that is still being written is skipped
+                    if len(array) >= 4:
+                        return (int(array[0]), *(magnicon_float(i) for i in array[1:4]))
+                size *= 2
+        return None
+
     # Parses the .cfg file
     def load_cfg(self) -> None:
         if not self.validFile:
@@ -289,6 +430,120 @@ class magnicon_ccc:
             self.dac12 = self.lower8 + self.upper4
                 
 
+    # attributes that are not parsed from the files and so are not cached
+    not_cached = ('dbdir', 'site', 'text', 'cache_dir', 'validFile', 'rawFile', 'bvdFile', 'cfgFile')
+    # arrays stored as .npy files in the cache
+    cached_arrays = ('rawData', 'phase', 'error', 'bvd')
+    cache_version = 3
+
+    @staticmethod
+    def file_signature(path: str) -> list:
+        """Size, modification time and a hash of the first and last 64 kB of a file, so the file is not read
+        all. A change in the middle of a file that keeps its size and modification time is not detected.
+        """
+        stat = os.stat(path)
+        digest = sha1()
+        with open(path, "rb") as file:
+            digest.update(file.read(65536))
+            if stat.st_size > 65536:
+                file.seek(max(65536, stat.st_size - 65536))
+                digest.update(file.read(65536))
+        return [os.path.abspath(path), stat.st_size, stat.st_mtime_ns, digest.hexdigest()]
+
+    def cache_path(self) -> str:
+        """Cache folder of this run: name of the run and a hash of its full path"""
+        name = os.path.basename(self.rawFile)[:-len('.txt')]
+        return os.path.join(self.cache_dir, name + '_' + sha1(os.path.abspath(self.bvdFile).encode()).hexdigest()[:12])
+
+    def load_cache(self) -> bool:
+        """Sets the parsed attributes from the cache if the cache exists and the three files did not change
+        Returns
+        -------
+        True if the cache was used
+        """
+        if self.cache_dir == '':
+            return False
+        try:
+            path = self.cache_path()
+            if not os.path.isfile(path + os.sep + 'header.json'):
+                return False
+            with open(path + os.sep + 'header.json', "r") as file:
+                header = json.load(file)
+            if header['version'] != self.cache_version or \
+               header['files'] != [self.file_signature(i) for i in (self.rawFile, self.bvdFile, self.cfgFile)]:
+                return False
+            for key, value in header['values'].items():
+                setattr(self, key, value)
+            self.DT = datetime.fromisoformat(header['DT'])
+            if header['avgDT'] is not None:
+                self.avgDT = timedelta(*header['avgDT'])
+            path = path + os.sep + header['arrays']
+            self.map_arrays(path)
+            self.bvd = load(path + os.sep + 'bvd.npy').tolist()
+            return True
+        except Exception as e:
+            print("In function: " +  inspect.stack()[0][3] + " Exception: " + str(e))
+            return False
+
+    def save_cache(self) -> None:
+        """Stores the parsed arrays as .npy files and the parsed header/config values in header.json"""
+        if self.cache_dir == '':
+            return
+        try:
+            path = self.cache_path()
+            values = {}
+            for key, value in vars(self).items():
+                if key in self.not_cached or key in self.cached_arrays or key in ('DT', 'avgDT'):
+                    continue
+                if isinstance(value, (bool, int, float, str)):
+                    values[key] = value
+                elif isinstance(value, float64):
+                    values[key] = float(value)
+                else:
+                    # unexpected type, do not cache this run
+                    return
+            header = {'version': self.cache_version, \
+                      'files': [self.file_signature(i) for i in (self.rawFile, self.bvdFile, self.cfgFile)], \
+                      'values': values, 'DT': self.DT.isoformat(), 'avgDT': None}
+            if hasattr(self, 'avgDT'):
+                header['avgDT'] = [self.avgDT.days, self.avgDT.seconds, self.avgDT.microseconds]
+            os.makedirs(path, exist_ok=True)
+            # the arrays are written to a new folder and header.json is replaced last to point to it, so the
+            # arrays another magnicon_ccc object still maps are never overwritten (windows does not allow it)
+            # and an interrupted save is never used
+            arrays = mkdtemp(prefix='arrays_', dir=path)
+            for key in self.cached_arrays:
+                save(arrays + os.sep + key + '.npy', array(getattr(self, key), dtype=float64 if key == 'bvd' else None))
+            header['arrays'] = os.path.basename(arrays)
+            with open(path + os.sep + 'header.json.tmp', "w") as file:
+                json.dump(header, file)
+            os.replace(path + os.sep + 'header.json.tmp', path + os.sep + 'header.json')
+            # the parsed samples are dropped in favour of the memory mapped copy
+            self.map_arrays(arrays)
+            # the arrays of earlier saves, those that are still mapped are removed by a later save
+            for entry in os.scandir(path):
+                if entry.name not in ('header.json', header['arrays']):
+                    if entry.is_dir():
+                        rmtree(entry.path, ignore_errors=True)
+                    else:
+                        try:
+                            os.remove(entry.path)
+                        except OSError:
+                            pass
+        except Exception as e:
+            print("In function: " +  inspect.stack()[0][3] + " Exception: " + str(e))
+            pass
+
+    # raw sample arrays memory mapped from the cache, the samples are read from disk as they are used
+    mapped_arrays = ('rawData', 'phase', 'error')
+
+    def map_arrays(self, path: str) -> None:
+        """Sets the raw sample arrays to read only memory maps of their .npy files in the folder path,
+        so a long run is held once by the operating system page cache instead of in the process memory
+        """
+        for key in self.mapped_arrays:
+            setattr(self, key, load(path + os.sep + key + '.npy', mmap_mode='r'))
+
     def check_shared_drive_exists(self, drive_path):
         try:
             # Open the handle to the network share
@@ -313,18 +568,18 @@ class magnicon_ccc:
         # Calculations using the parsed data
         if self.dbdir != '':
             # use the directory supplied by user...
-            R = ResData(self.dbdir)
+            R = ResData.load(self.dbdir)
         # user directory not supplied...
         else:
             # if site is NIST...
             if self.site == 'NIST':
                 p = r'\\elwood.nist.gov\68_PML\68internal\Calibrations\MDSS Data\resist\vax_data\resistor data\ARMS\Analysis Files'
                 if self.check_shared_drive_exists(r'\\elwood.nist.gov\68_PML'):
-                    R = ResData(p)
+                    R = ResData.load(p)
             else:
                 # default to the local one supplied with this project
                 # print("Using ResDatabase.dat located at: ", base_dir + r'\data')
-                R = ResData(base_dir + r'\data')
+                R = ResData.load(base_dir + r'\data')
         # Finds the data on the two resistors in the CCC files from the resistor database
         if self.R1SN in R.ResDict:
             self.R1NomVal  = R.ResDict[self.R1SN]['NomVal']
@@ -407,6 +662,51 @@ class magnicon_ccc:
             sec = sec - i*cur
         return f'{"{:02d}".format(int(ts[0]))}:{"{:02d}".format(int(ts[1]))}:{"{:02d}".format(int(ts[2]))}'
 
+def magnicon_float(text: str) -> float:
+    """Number written by the Magnicon software, which writes not a number and infinity as +NaN000000000 and +Inf0"""
+    try:
+        return float(text)
+    except ValueError:
+        if text.lstrip('+-').upper().startswith('NAN'):
+            return nan
+        if text.lstrip('+-').upper().startswith('INF'):
+            return -inf if text.startswith('-') else inf
+        raise
+
+class growing_array:
+    """Array that values are appended to, like the samples of a run that is still being written. The capacity
+    doubles when it is full, so every value is copied O(1) times on average. The first values are kept as they
+    are (they can be a read only memory map) until values are appended to them.
+    """
+    def __init__(self, values=None) -> None:
+        self.data = empty(0, dtype=float64) if values is None else values
+        self.n = len(self.data)
+
+    def extend(self, values) -> None:
+        if self.n == 0:
+            self.data = values
+            self.n = len(values)
+            return
+        end = self.n + len(values)
+        if end > len(self.data):
+            data = empty(2*end, dtype=self.data.dtype)
+            data[:self.n] = self.data[:self.n]
+            self.data = data
+        self.data[self.n:end] = values
+        self.n = end
+
+    def values(self, tail=()):
+        """Returns the values followed by tail, the values that are not appended yet. tail is overwritten by
+        the next call.
+        """
+        end = self.n + len(tail)
+        if end > len(self.data):
+            data = empty(end, dtype=self.data.dtype)
+            data[:self.n] = self.data[:self.n]
+            self.data = data
+        self.data[self.n:end] = tail
+        return self.data[:end]
+
 # For testing
 if __name__ == '__main__':
     print("I am main")
\ No newline at end of file
@@ -15,7 +15,8 @@ __version__         =   "0.1"
 
 from numpy import sqrt, nan, sum, average, mean, std, array, cumsum, ones, \
                   dot, linalg, sort, arange, linspace, float64, abs, median, \
-                  ceil, min, max, multiply, fft, flipud
+                  ceil, min, max, multiply, fft, flipud, concatenate, diff, unique, rint, empty, \
+                  flatnonzero
 import math 
 import scipy
 import warnings
@@ -157,6 +158,65 @@ def adev(d, overlap, s):
         stderr.append((0.5/math.sqrt(x))*si)
     return s, array(std), array(stderr)
 
+def deviation(d, rate=1.0, overlapping=False, variance='Allan', taus='octave', noise=False):
+    """
+    Allan or Hadamard deviation of fractional frequency data with the estimators, tau lists and
+    errors (dev/sqrt(n)) of allantools adev, oadev, hdev and ohdev
+    taus, dev, dev_err, n = deviation(d, rate=1.0, overlapping=False, variance='Allan', taus='octave')
+    taus, dev, dev_err, n, alpha = deviation(d, rate, overlapping, variance, taus, noise=True)
+    taus is 'octave' (tau = 2^N), 'all' or a list of taus in seconds
+    The phase data x is integrated once, the Allan (Hadamard) variance at tau = m/rate is the mean
+    square of the second (third) differences x[i+2m] - 2x[i+m] + x[i] of the phase at lag m, every
+    sample is a start (overlapping) or only every m-th sample (non overlapping). Taus with less than
+    two differences are left out.
+    With noise the dominant power law noise alpha (see noise_types) at every tau is identified with
+    noise1D from the first differences of every m-th phase sample, i.e. the averages of m samples,
+    nan with less than 30 averages
+    """
+    if variance == 'Allan':
+        order, norm = 2, 2.0
+    elif variance == 'Hadamard':
+        order, norm = 3, 6.0
+    else:
+        raise ValueError('unknown variance: ' + str(variance))
+    d = array(d, dtype=float64)
+    # same phase as allantools: mean removed for precision, starts at zero
+    pd = concatenate(([0.], cumsum(d - mean(d))*(1.0/rate)))
+    N = len(pd)
+    if isinstance(taus, str) and taus == 'all':
+        m = arange(1, N)
+    elif isinstance(taus, str) and taus == 'octave':
+        m = 2**arange(int(math.log2(N)) + 1)
+    else:
+        m = unique(rint(array(taus, dtype=float64)*rate)).astype(int)
+    # at least two differences of the phase
+    if overlapping:
+        m = m[(m > 0) & (m < N) & (N - order*m > 1)]
+    else:
+        m = m[(m > 0) & (m < N) & (-(-N//m) - order > 1)]
+    if len(m) == 0:
+        raise ValueError('too few samples for a deviation: ' + str(len(d)))
+    dev = empty(len(m))
+    n = empty(len(m), dtype=int)
+    alpha = empty(len(m))
+    for i, mj in enumerate(m):
+        if noise or not overlapping:
+            # averages of mj samples (times mj/rate)
+            avg = diff(pd[::mj])
+        if overlapping:
+            v = pd
+            for k in range(order):
+                v = v[mj:] - v[:-mj]
+        else:
+            v = diff(avg, order - 1)
+        n[i] = len(v)
+        dev[i] = sqrt(dot(v, v)/(norm*n[i]))*rate/mj
+        if noise:
+            alpha[i] = noise1D(avg)[0] if len(avg) >= 30 else nan
+    if noise:
+        return m/rate, dev, dev/sqrt(n), n, alpha
+    return m/rate, dev, dev/sqrt(n), n
+
 def meanerr(meanvals, errvals):
     """
     mean, err = meanerr(meanvals, errvals)
@@ -279,6 +339,9 @@ def lagged(data, lag):
     lag = int(lag)
     return array(data[lag:]), array(data[0:(len(data)-lag)])
 
+# power law noise types by the exponent alpha of the frequency noise PSD (h_alpha*f^alpha)
+noise_types = {-2: 'Random Walk FM', -1: 'Flicker FM', 0: 'White FM', 1: 'Flicker PM', 2: 'White PM'}
+
 def noise1D(data):
     """
     POWER LAW NOISE IDENTIFICATION USING THE LAG 1
@@ -290,39 +353,20 @@ def noise1D(data):
     p = 0
     dmin = 0
     dmax=3
-    noise_type = ''
-   
+    data = array(data, dtype=float64)
     while not done:
-        r = []
         dmean = mean(data, dtype=float64)
         cov  = (std(data, ddof=1))**2
         cov = cov*(len(data) - 1)
-        for i, j in zip(data[0:], data[1:]):
-            num = ((i-dmean)*(j-dmean))
-            r.append(num)
-        r1 = sum(r)/cov
+        r1 = dot(data[:-1] - dmean, data[1:] - dmean)/cov
         delta = r1/(1+r1)
         if d > dmin and (delta<0.25 or d>=dmax):
             p = int(-2*(delta + d))
             done=True
         else:
-            new_data = []
-            for i, j in zip(data[0:], data[1:]):
-                new_data.append(j-i)
-            data = new_data
+            data = diff(data)
             d = d+1
-    if p == -2:
-        noise_type = 'Random Walk FM'
-    elif p == -1:
-        noise_type = 'Flicker FM'
-    elif p == 0:
-        noise_type = 'White FM'
-    elif p == 1:
-        noise_type = 'Flicker PM'
-    elif p == 2:
-        noise_type = 'White PM'
-        
-    return (p, noise_type)
+    return (p, noise_types.get(p, ''))
 
 def autoCorrelation(data):
     """
@@ -332,7 +376,37 @@ def autoCorrelation(data):
     Note: For stationary processes: p(0)=1 and p(-i)=p(i)
     lag, acf, pci and nci's are 1d arrays
     pci, nci are bounds for 95% confidence interval: |p(i)|>1.96*sqrt((1+2*sum(p(k)^2))/n)
-    cutoff_lag is the last lag value outside of the confidence band 
+    cutoff_lag is the last lag value outside of the confidence band
+    Same results as autoCorrelationLagged, the lagged products are summed for all lags at once from the
+    power spectrum of the zero padded data (Wiener-Khinchin) and the band from a cumulative sum, O(n log(n))
+    """
+    if len(data) < 50:
+        warnings.warn("Dataset is to small to generate valid auto-correlation for the process!", Warning)
+    data = array(data, dtype=float64)
+    n = len(data)
+    # Cov[Xt, Xt]=Var[Xt] for t=0 (0 lag)
+    cov = (std(data, ddof=1))**2
+    cov = cov*(n - 1)
+    # Useful estimates of p(i) can only made if  i<=n/4
+    num_lag = int(n/4)
+    lag = arange(num_lag)
+    # zero padded to at least 2n-1 samples so the circular correlation of the fft has no wrap around
+    nfft = 2**int(ceil(math.log2(max([2*n - 1, 1]))))
+    spec = fft.rfft(data - mean(data, dtype=float64), nfft)
+    acf = fft.irfft(spec.real**2 + spec.imag**2, nfft)[:num_lag]/cov
+    # 95% confidence band for the auto-correlation of Xt, 0 at lag 0 to keep len same
+    pci = concatenate(([0.], 1.96*sqrt((1 + 2*cumsum(acf[1:]**2))/n)))
+    outside = flatnonzero(abs(acf[1:]) > pci[1:len(acf)])
+    if len(outside) > 0:
+        cutoff_lag = int(min([lag[outside[-1] + 1], num_lag]))
+    else:
+        cutoff_lag = 0
+    return lag, acf, pci, -pci, cutoff_lag
+
+def autoCorrelationLagged(data):
+    """
+    lag, acf, pci, nci, cutoff_lag = autoCorrelationLagged(data)
+    Direct O(n^2) version of autoCorrelation from lagged copies of the data, kept as its reference
     """
     if len(data) < 50:
         warnings.warn("Dataset is to small to generate valid auto-correlation for the process!", Warning)
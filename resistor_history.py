@@ -0,0 +1,250 @@
+import sys, os
+import logging, inspect, json
+from time import perf_counter
+from datetime import datetime
+from argparse import ArgumentParser
+from multiprocessing import freeze_support
+from numpy import array, asarray, float64, int64, nan, isnan, isfinite, where, sqrt, unique, bincount, maximum, errstate
+
+# custom imports
+from ccc_analysis import ccc_analysis
+from run_catalog import run_catalog
+from batch_analysis import run_pool
+from ResDataBase import ResData
+
+logger = logging.getLogger(__name__)
+
+# seconds per year of the drifts of the resistor database
+YEAR = 365.25*24*60*60
+
+def history_record(text: str, RStatus: str='R1', **kwargs) -> dict:
+    """Result of the unknown resistor of one run: the unknown and standard serial numbers, the time stamp of
+    the middle of the run, the mean and standard deviation of the mean of the unknown in ppm at STP and
+    number of BVDs, and the values of the standard and the correction of the unknown the result depends
+    on. The keyword arguments are passed to ccc_analysis, the spectra and Allan deviations are not calculated.
+    Returns
+    -------
+    dict of the values, None if the run has no data
+    """
+    run = ccc_analysis(text, RStatus=RStatus, statistics=False, **kwargs)
+    if not run.run():
+        return None
+    dat, res = run.dat, run.res
+    # the unknown is R2 when R1 is the standard, as in the MDSS file
+    if RStatus == 'R1':
+        values = dict(SN=dat.R2SN, standard=dat.R1SN, value=res.meanR1, stdMean=res.stdMeanR1, \
+                      standardPPM=res.R1PPM, standardPred=res.R1STPPred, corr=res.R2corr)
+    else:
+        values = dict(SN=dat.R1SN, standard=dat.R2SN, value=res.meanR2, stdMean=res.stdMeanR2, \
+                      standardPPM=res.R2PPM, standardPred=res.R2STPPred, corr=res.R1corr)
+    values = {key: str(value) if key in ('SN', 'standard') else float(value) for key, value in values.items()}
+    values['timestamp'] = float(dat.timeStamp)
+    values['N'] = int(res.N)
+    return values
+
+def collect_run(text: str, **kwargs) -> tuple:
+    """history_record of a run for the process pool of collect
+    Returns
+    -------
+    (text, values or None, error message or None)
+    """
+    try:
+        return (text, history_record(text, **kwargs), None)
+    except Exception as e:
+        logger.warning('In function: ' + inspect.stack()[0][3] + ' File: ' + text + ' Error: ' + repr(e))
+        return (text, None, repr(e))
+
+def drift_fits(SN, timestamp, value, stdMean, R: ResData=None) -> dict:
+    """Weighted least squares drift lines of the results of every serial number at once, each result is
+    weighted by 1/stdMean**2. The line of a serial is fitted around its weighted mean time t0 so its value at
+    t0 and its drift are not correlated. The uncertainties are scaled by the Birge ratio sqrt(chi2/(n - 2))
+    when it is above one, i.e. when the runs scatter more than their standard deviations of the mean. Results
+    without a positive finite stdMean are left out.
+    Parameters
+    ----------
+    SN : serial number of each result
+    timestamp : posix time stamp of each result
+    value, stdMean : value and standard deviation of the mean of each result in ppm
+    R : resistor database to compare the fits with, None not to compare
+    Returns
+    -------
+    dict of arrays with one entry per serial number in sorted order: SN, n, t0, value (at t0), u_value,
+    drift (ppm/year), u_drift, birge, and with R also dbDrift, dbValue (prediction at t0), driftZ and valueZ
+    (difference of the fit and the database over the uncertainty of the fit), nan where they are not defined
+    """
+    SN = asarray(SN, dtype=object)
+    t, y, u = (asarray(i, dtype=float64) for i in (timestamp, value, stdMean))
+    ok = isfinite(t) & isfinite(y) & isfinite(u) & (u > 0)
+    SN, t, y, u = SN[ok], t[ok], y[ok], u[ok]
+    names, group = unique(SN.astype(str), return_inverse=True)
+    group = group.reshape(-1)
+    m = len(names)
+    w = 1/(u*u)
+    x = t/YEAR
+    with errstate(divide='ignore', invalid='ignore'):
+        n = bincount(group, minlength=m)
+        S = bincount(group, w, m)
+        x0 = bincount(group, w*x, m)/S
+        y0 = bincount(group, w*y, m)/S
+        dx = x - x0[group]
+        Sxx = bincount(group, w*dx*dx, m)
+        drift = bincount(group, w*dx*(y - y0[group]), m)/Sxx
+        drift = where(n > 1, drift, nan)
+        residual = y - y0[group] - where(n > 1, drift, 0)[group]*dx
+        chi2 = bincount(group, w*residual*residual, m)
+        birge = where(n > 2, sqrt(chi2/(n - 2)), nan)
+        scale = where(birge > 1, birge, 1)
+        fits = {'SN': names, 'n': n, 't0': x0*YEAR, 'value': y0, 'u_value': scale/sqrt(S), 'drift': drift, \
+                'u_drift': where(n > 1, scale/sqrt(Sxx), nan), 'birge': birge}
+        if R is not None:
+            rows = array([R.index.get(i, -1) for i in names], dtype=int64)
+            fits['dbDrift'] = where(rows >= 0, R.Drift[maximum(rows, 0)] if len(R.SN) else nan, nan)
+            fits['dbValue'] = R.predictedValuesUnix(list(names), fits['t0'])
+            fits['driftZ'] = (fits['drift'] - fits['dbDrift'])/fits['u_drift']
+            fits['valueZ'] = (fits['value'] - fits['dbValue'])/fits['u_value']
+    return fits
+
+class resistor_history:
+    """Results of the unknown resistor of every run of a run catalog, kept in a history table of the catalog
+    file and read into columns sorted by serial number and time for the drift fits. collect analyzes the
+    runs of the catalog that have no result yet or changed since their result, or with other settings.
+    """
+    history_version = 1
+    # settings of ccc_analysis that change the results
+    settings = ('RStatus', 'dbdir', 'site', 'outliers', 'temp1_path', 'temp2_path', 'R1OilDepth', 'R2OilDepth', 'c')
+    # column name, SQLite type
+    columns = (('SN', 'TEXT'), ('standard', 'TEXT'), ('timestamp', 'REAL'), ('value', 'REAL'), ('stdMean', 'REAL'), \
+               ('N', 'INTEGER'), ('standardPPM', 'REAL'), ('standardPred', 'REAL'), ('corr', 'REAL'), ('error', 'TEXT'))
+
+    def __init__(self, catalog: run_catalog) -> None:
+        self.catalog = catalog
+        self.db = catalog.db
+        self.db.execute('CREATE TABLE IF NOT EXISTS history (bvdFile TEXT PRIMARY KEY, signature TEXT, settings TEXT, ' + \
+                        ', '.join(name + ' ' + kind for name, kind in self.columns) + ')')
+        self.db.execute('CREATE INDEX IF NOT EXISTS history_SN ON history (SN)')
+        self.db.commit()
+
+    def collect(self, jobs=None, **kwargs) -> tuple:
+        """Analyzes the stopped runs of the catalog with BVDs whose result is missing, whose files changed or
+        that were analyzed with other settings, on a pool of jobs processes (one per core if None). The keyword
+        arguments are passed to ccc_analysis. The results of runs that left the catalog are deleted.
+        Returns
+        -------
+        (runs analyzed, runs that failed)
+        """
+        settings = json.dumps({'version': self.history_version, \
+                               **{key: kwargs.get(key, 'R1' if key == 'RStatus' else None) for key in self.settings}}, \
+                              sort_keys=True)
+        runs = [(row['bvdFile'], row['signature']) for row in self.db.execute( \
+                'SELECT runs.bvdFile, runs.signature FROM runs LEFT JOIN history ON runs.bvdFile = history.bvdFile ' + \
+                'WHERE runs.error IS NULL AND runs.stop IS NOT NULL AND runs.points > 0 AND (history.bvdFile IS NULL ' + \
+                'OR history.signature != runs.signature OR history.settings != ?)', (settings,))]
+        signatures = dict(runs)
+        if jobs is None:
+            jobs = os.cpu_count() or 1
+        jobs = max(1, min(jobs, len(runs)))
+        done = []
+        if jobs == 1:
+            done = [collect_run(text, **kwargs) for text, signature in runs]
+        else:
+            def finished(ct: int, result, error) -> None:
+                # a run whose worker process died, e.g. out of memory
+                done.append(result if error is None else (runs[ct][0], None, repr(error)))
+            run_pool(collect_run, [text for text, signature in runs], jobs, finished, **kwargs)
+        names = ['bvdFile', 'signature', 'settings'] + [name for name, kind in self.columns]
+        with self.db:
+            for text, values, error in done:
+                values = dict(values or {}, error=error)
+                self.db.execute(f'INSERT OR REPLACE INTO history ({", ".join(names)}) VALUES ({", ".join("?"*len(names))})', \
+                                [text, signatures[text], settings] + [values.get(name) for name, kind in self.columns])
+            self.db.execute('DELETE FROM history WHERE bvdFile NOT IN (SELECT bvdFile FROM runs)')
+        return (len(done), len([i for i in done if i[2] is not None]))
+
+    def history(self, SN: str=None, since=None, until=None, R: ResData=None) -> dict:
+        """Results of the runs of the serial number SN (all if None) that started from since up to until
+        (excluded), see run_catalog.find, as columns sorted by serial number and time. With the resistor
+        database R the results are referred to its current prediction of the standard: a result is
+        proportional to 1 + (ppm of the standard)/1e6, so a new calibration of a standard updates the history
+        without analyzing the runs again. The temperature and pressure coefficients stay those of the analysis.
+        Returns
+        -------
+        dict of arrays: bvdFile, SN, standard, timestamp, value, stdMean, N
+        """
+        conditions, args = ['history.SN IS NOT NULL'], []
+        if SN is not None:
+            conditions.append('history.SN = ?')
+            args.append(SN)
+        if since is not None:
+            conditions.append('runs.start >= ?')
+            args.append(str(since))
+        if until is not None:
+            conditions.append('runs.start < ?')
+            args.append(str(until))
+        rows = self.db.execute('SELECT history.* FROM history JOIN runs ON runs.bvdFile = history.bvdFile WHERE ' + \
+                               ' AND '.join(conditions) + ' ORDER BY history.SN, history.timestamp', args).fetchall()
+        columns = {name: array([row[name] for row in rows], dtype=object) for name in ('bvdFile', 'SN', 'standard')}
+        for name in ('timestamp', 'value', 'stdMean', 'N', 'standardPPM', 'standardPred', 'corr'):
+            columns[name] = array([row[name] for row in rows], dtype=float64)
+        if R is not None and len(rows):
+            pred = R.predictedValuesUnix(list(columns['standard']), columns['timestamp'])
+            ppm = columns['standardPPM']
+            ratio = where(isnan(pred), 1., (1 + (ppm - columns['standardPred'] + pred)/1e6)/(1 + ppm/1e6))
+            columns['value'] = (columns['value'] + 1e6 + columns['corr'])*ratio - 1e6 - columns['corr']
+            columns['stdMean'] = columns['stdMean']*ratio
+        return {key: columns[key] for key in ('bvdFile', 'SN', 'standard', 'timestamp', 'value', 'stdMean', 'N')}
+
+if __name__ == '__main__':
+    freeze_support()
+    parser = ArgumentParser(prog = 'resistor_history',
+                            description='Drift of the resistors of the runs of a run catalog (see run_catalog.py)',
+                            epilog='Fits a weighted drift line to the results of each resistor and compares it with the resistor database', add_help=True)
+    parser.add_argument('catalog', help='SQLite file of the run catalog', type=str)
+    parser.add_argument('--collect', help='Analyze the runs of the catalog without a result first', action='store_true')
+    parser.add_argument('-r', '--resistor', help='Only this resistor serial number', default=None, type=str)
+    parser.add_argument('--since', help='Runs that started from this date, YYYY[-MM[-DD]]', default=None, type=str)
+    parser.add_argument('--until', help='Runs that started before this date, YYYY[-MM[-DD]]', default=None, type=str)
+    parser.add_argument('--runs', help='Also list the result of every run', action='store_true')
+    parser.add_argument('-db', '--db_path', help='Specify resistor database directory', default="", type=str)
+    parser.add_argument('-s', '--site', help='Site where this program is used', default="", type=str)
+    parser.add_argument('-c', '--specific_gravity', help='Specific gravity of oil for oil type resistors', default=0.8465, type=float)
+    parser.add_argument('-k', '--cache_path', help='Specify cache directory of parsed runs (default: no cache)', default="", type=str)
+    parser.add_argument('--standard', help='Standard resistor (default: R1)', default='R1', choices=['R1', 'R2'])
+    parser.add_argument('--outliers', help='Remove BVD outside of 3 standard deviations', action='store_true')
+    parser.add_argument('-t1', '--temperature1', help='Environment log directory of R1', default='', type=str)
+    parser.add_argument('-t2', '--temperature2', help='Environment log directory of R2', default='', type=str)
+    parser.add_argument('--oil_depth1', help='Oil depth of R1 in mm (default: 0)', default=0, type=float)
+    parser.add_argument('--oil_depth2', help='Oil depth of R2 in mm (default: 0)', default=0, type=float)
+    parser.add_argument('-j', '--jobs', help='Number of runs analyzed in parallel (default: number of cores)', default=None, type=int)
+    parser.add_argument('-d', '--debug', help='Debugging mode', action='store_true')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.DEBUG if args.debug else logging.WARNING)
+    history = resistor_history(run_catalog(args.catalog))
+    if args.collect:
+        start = perf_counter()
+        analyzed, failed = history.collect(jobs=args.jobs, dbdir=args.db_path, site=args.site, RStatus=args.standard, \
+                                           outliers=args.outliers, temp1_path=args.temperature1, \
+                                           temp2_path=args.temperature2, R1OilDepth=args.oil_depth1, \
+                                           R2OilDepth=args.oil_depth2, c=args.specific_gravity, \
+                                           cache_dir=args.cache_path, debug_mode=args.debug)
+        print(f'Analyzed {analyzed} runs, {failed} failed in {perf_counter() - start:.1f} s')
+    from magnicon_ccc import base_dir
+    R = ResData.load(args.db_path if args.db_path != '' else base_dir + r'\data')
+    start = perf_counter()
+    columns = history.history(args.resistor, args.since, args.until, R)
+    fits = drift_fits(columns['SN'], columns['timestamp'], columns['value'], columns['stdMean'], R)
+    elapsed = perf_counter() - start
+    if args.runs:
+        for i in range(len(columns['SN'])):
+            print(f'{columns["SN"][i]:>10}  {datetime.fromtimestamp(columns["timestamp"][i]):%Y-%m-%d %H:%M}  ' + \
+                  f'{columns["value"][i]:12.4f} +/- {columns["stdMean"][i]:.4f} ppm  ({columns["standard"][i]})  ' + \
+                  f'{columns["bvdFile"][i]}')
+    print(f'{"SN":>10} {"runs":>5} {"t0":>10} {"value (ppm)":>24} {"database":>10} {"z":>6} ' + \
+          f'{"drift (ppm/year)":>24} {"database":>10} {"z":>6} {"birge":>6}')
+    for i in range(len(fits['SN'])):
+        print(f'{fits["SN"][i]:>10} {fits["n"][i]:5d} {datetime.fromtimestamp(fits["t0"][i]):%Y-%m-%d} ' + \
+              f'{fits["value"][i]:12.4f} +/- {fits["u_value"][i]:7.4f} {fits["dbValue"][i]:10.4f} {fits["valueZ"][i]:6.1f} ' + \
+              f'{fits["drift"][i]:12.4f} +/- {fits["u_drift"][i]:7.4f} {fits["dbDrift"][i]:10.4f} {fits["driftZ"][i]:6.1f} ' + \
+              f'{fits["birge"][i]:6.2f}')
+    print(f'{len(fits["SN"])} resistors, {len(columns["SN"])} runs fitted in {1000*elapsed:.2f} ms')
+    history.catalog.close()
+    sys.exit(0)
@@ -0,0 +1,192 @@
+import sys, os
+import logging, inspect, json
+import sqlite3
+from time import perf_counter
+from argparse import ArgumentParser
+
+# custom imports
+from magnicon_ccc import magnicon_ccc
+
+logger = logging.getLogger(__name__)
+
+class run_catalog:
+    """SQLite index of the runs of an archive of *_CCC folders. scan lists the folders of an archive and
+    reads the header of the raw data and config files and the summary row of the _bvd.txt file of the runs
+    that are new or whose files changed size or modification time since the last scan, find queries the
+    index without touching the archive. Times are stored as 'YYYY-MM-DD HH:MM:SS' text so they compare as
+    text, the stop time is NULL while a run is being measured.
+    """
+    catalog_version = 1
+    # column name, SQLite type, magnicon_ccc attribute
+    columns = (('start', 'TEXT', None), ('stop', 'TEXT', None), ('R1SN', 'TEXT', 'R1SN'), ('R2SN', 'TEXT', 'R2SN'), \
+               ('SHC', 'INTEGER', 'SHC'), ('ignored_first', 'INTEGER', 'ignored_first'), \
+               ('ignored_last', 'INTEGER', 'ignored_last'), ('N1', 'INTEGER', 'N1'), ('N2', 'INTEGER', 'N2'), \
+               ('NA', 'INTEGER', 'NA'), ('I1', 'REAL', 'I1'), ('I2', 'REAL', 'I2'), ('R1NomVal', 'REAL', 'R1NomVal'), \
+               ('R2NomVal', 'REAL', 'R2NomVal'), ('remarks', 'TEXT', 'comments'), ('points', 'INTEGER', None), \
+               ('bvdMean', 'REAL', None), ('bvdStdMean', 'REAL', None), ('error', 'TEXT', None))
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.db = sqlite3.connect(path)
+        self.db.row_factory = sqlite3.Row
+        if self.db.execute('PRAGMA user_version').fetchone()[0] != self.catalog_version:
+            # a catalog of another version is built again by the next scan
+            self.db.execute('DROP TABLE IF EXISTS runs')
+            self.db.execute('CREATE TABLE runs (bvdFile TEXT PRIMARY KEY, folder TEXT, name TEXT, signature TEXT, ' + \
+                            ', '.join(name + ' ' + kind for name, kind, key in self.columns) + ')')
+            for name in ('folder', 'start', 'R1SN', 'R2SN'):
+                self.db.execute(f'CREATE INDEX runs_{name} ON runs ({name})')
+            self.db.execute(f'PRAGMA user_version = {self.catalog_version}')
+            self.db.commit()
+
+    def close(self) -> None:
+        self.db.close()
+
+    @staticmethod
+    def is_run(name: str) -> bool:
+        """A _bvd.txt file whose name ends in a number before _bvd.txt, the same check as the GUI"""
+        return name.endswith('_bvd.txt') and name[:-len('_bvd.txt')][-1:].isnumeric()
+
+    @staticmethod
+    def entry_signature(entry) -> list:
+        """Size and modification time of a directory entry, None if the file does not exist. On windows the
+        directory listing holds them, so no file of a network share is opened.
+        """
+        if entry is None:
+            return None
+        stat = entry.stat()
+        return [stat.st_size, stat.st_mtime_ns]
+
+    @staticmethod
+    def read_run(bvdFile: str) -> dict:
+        """Header values of a run, from the header of its raw data and config files and the last row of its
+        _bvd.txt file, without reading the samples
+        """
+        values = dict.fromkeys(name for name, kind, key in run_catalog.columns)
+        try:
+            mag = magnicon_ccc(bvdFile, '', '', header_only=True)
+            for name, kind, key in run_catalog.columns:
+                if key is not None:
+                    values[name] = getattr(mag, key, None)
+            if hasattr(mag, 'avgDT'):
+                values['start'] = str(mag.DT - mag.avgDT)
+                values['stop'] = str(mag.DT + mag.avgDT)
+            else:
+                values['start'] = str(mag.DT)
+            summary = magnicon_ccc.bvd_summary(bvdFile)
+            if summary is not None:
+                values['points'], bvd, values['bvdMean'], values['bvdStdMean'] = summary
+            else:
+                values['points'] = 0
+        except Exception as e:
+            logger.warning('In function: ' + inspect.stack()[0][3] + ' File: ' + bvdFile + ' Error: ' + repr(e))
+            values['error'] = repr(e)
+        return values
+
+    def scan(self, root: str) -> tuple:
+        """Updates the runs under the folder root: the runs that are new or whose raw data, _bvd.txt or config
+        file changed are read again, the runs that were removed are deleted. The runs of a folder that
+        cannot be listed, e.g. a network share that is not available, are kept.
+        Returns
+        -------
+        (runs read, runs deleted, runs under root)
+        """
+        root = os.path.abspath(root)
+        prefix = os.path.join(root, '')
+        known = {row['bvdFile']: row['signature'] for row in self.db.execute( \
+                 'SELECT bvdFile, signature FROM runs WHERE folder = ? OR substr(folder, 1, ?) = ?', \
+                 (root, len(prefix), prefix))}
+        found, changed, unlisted = set(), [], []
+        folders = [root]
+        while folders:
+            folder = folders.pop()
+            try:
+                with os.scandir(folder) as listing:
+                    entries = {entry.name: entry for entry in listing}
+            except OSError as e:
+                logger.warning('In function: ' + inspect.stack()[0][3] + ' Folder: ' + folder + ' Error: ' + repr(e))
+                unlisted.append(folder + os.sep)
+                continue
+            for name, entry in entries.items():
+                if entry.is_dir():
+                    folders.append(entry.path)
+                elif self.is_run(name):
+                    run = name[:-len('_bvd.txt')]
+                    signature = json.dumps([self.entry_signature(entries.get(i)) \
+                                            for i in (run + '.txt', name, run + '_cccdrive.cfg')])
+                    found.add(entry.path)
+                    if known.get(entry.path) != signature:
+                        changed.append((entry.path, folder, run, signature))
+        removed = [i for i in known if i not in found and not any(i.startswith(j) for j in unlisted)]
+        names = ['bvdFile', 'folder', 'name', 'signature'] + [name for name, kind, key in self.columns]
+        with self.db:
+            for bvdFile, folder, run, signature in changed:
+                values = self.read_run(bvdFile)
+                self.db.execute(f'INSERT OR REPLACE INTO runs ({", ".join(names)}) VALUES ({", ".join("?"*len(names))})', \
+                                [bvdFile, folder, run, signature] + [values[name] for name, kind, key in self.columns])
+            self.db.executemany('DELETE FROM runs WHERE bvdFile = ?', [(i,) for i in removed])
+        return (len(changed), len(removed), len(found))
+
+    def find(self, resistor: str=None, since=None, until=None, folder: str=None, remarks: str=None) -> list:
+        """Runs that match all the given criteria, sorted by start time
+        Parameters
+        ----------
+        resistor : serial number of R1 or R2
+        since, until : runs that started from since up to until (excluded), a datetime or the beginning of a
+                       'YYYY-MM-DD HH:MM:SS' text, e.g. since='2024', until='2025' for the runs of 2024
+        folder : runs in this folder and its sub folders
+        remarks : text in the remarks, not case sensitive
+        Returns
+        -------
+        list of sqlite3.Row with the bvdFile, folder, name and the columns of the catalog
+        """
+        where, args = [], []
+        if resistor is not None:
+            where.append('(R1SN = ? OR R2SN = ?)')
+            args += [resistor, resistor]
+        if since is not None:
+            where.append('start >= ?')
+            args.append(str(since))
+        if until is not None:
+            where.append('start < ?')
+            args.append(str(until))
+        if folder is not None:
+            folder = os.path.abspath(folder)
+            prefix = os.path.join(folder, '')
+            where.append('(folder = ? OR substr(folder, 1, ?) = ?)')
+            args += [folder, len(prefix), prefix]
+        if remarks is not None:
+            where.append("instr(lower(remarks), lower(?)) > 0")
+            args.append(remarks)
+        return self.db.execute('SELECT * FROM runs' + (' WHERE ' + ' AND '.join(where) if where else '') + \
+                               ' ORDER BY start, bvdFile', args).fetchall()
+
+if __name__ == '__main__':
+    parser = ArgumentParser(prog = 'run_catalog',
+                            description='Index the Magnicon CCC runs of an archive and query the index',
+                            epilog='Lists the runs that match the query, all the runs without one', add_help=True)
+    parser.add_argument('catalog', help='SQLite file of the catalog, created if it does not exist', type=str)
+    parser.add_argument('--scan', help='Index the new and changed runs under this directory first', default=[], \
+                        action='append', type=str)
+    parser.add_argument('-r', '--resistor', help='Runs of this resistor serial number (R1 or R2)', default=None, type=str)
+    parser.add_argument('--since', help='Runs that started from this date, YYYY[-MM[-DD]]', default=None, type=str)
+    parser.add_argument('--until', help='Runs that started before this date, YYYY[-MM[-DD]]', default=None, type=str)
+    parser.add_argument('--folder', help='Runs under this directory', default=None, type=str)
+    parser.add_argument('--remarks', help='Runs with this text in the remarks', default=None, type=str)
+    parser.add_argument('-d', '--debug', help='Debugging mode', action='store_true')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.DEBUG if args.debug else logging.WARNING)
+    catalog = run_catalog(args.catalog)
+    for root in args.scan:
+        start = perf_counter()
+        read, deleted, total = catalog.scan(root)
+        print(f'Scanned {root}: {total} runs, {read} read, {deleted} deleted in {perf_counter() - start:.2f} s')
+    start = perf_counter()
+    runs = catalog.find(args.resistor, args.since, args.until, args.folder, args.remarks)
+    elapsed = perf_counter() - start
+    for run in runs:
+        print(f'{run["start"]}  {run["stop"] or "running":19}  {run["R1SN"]!s:>10} / {run["R2SN"]!s:<10} ' + \
+              f'{run["points"]!s:>6} BVDs  {run["bvdMean"]!s:>14}  {run["bvdFile"]}')
+    print(f'{len(runs)} runs in {1000*elapsed:.2f} ms')
+    catalog.close()
+    sys.exit(0)
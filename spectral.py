@@ -26,57 +26,50 @@ import numpy as np
 
 
 def subtract_drift(data,order): # order=0 only subtract mean, order 1 : mean +lin drift..
-    gen_func=[]
-    func1=range(len(data))
-    for i in range(order+1):
-        tmp=[k**i for k in func1]
-        if i!=0:
-            tmp=tmp-np.mean(tmp)
-            tmp=tmp/max(tmp)
-        gen_func.append(np.array(tmp))
-    A = np.zeros((order+1,order+1))
-    b = np.zeros((order+1,1))
-    for i in range(order+1):
-        for j in range(order+1):
-            A[i,j] = sum(gen_func[i]*gen_func[j])
-        b[i] = sum(gen_func[i]*data)
-    res=np.dot(np.linalg.inv(A),b)
-    sub=np.zeros((1,len(data)))
-    for i in range(order+1):
-        tmp=gen_func[i]*res[i]
-        sub=sub+tmp
-    ret=data-sub
-    return  ret[0]
+    """
+    Subtracts a least squares polynomial of the given order from data. The basis
+    is 1, and k**i (k=0..N-1) with the mean removed and scaled to a maximum of 1.
+    """
+    data=np.asarray(data,dtype=float)
+    k=np.arange(len(data),dtype=float)
+    gen_func=np.empty((len(data),order+1))
+    gen_func[:,0]=1.0
+    for i in range(1,order+1):
+        tmp=k**i-np.mean(k**i)
+        gen_func[:,i]=tmp/max(tmp)
+    res=np.linalg.lstsq(gen_func,data,rcond=None)[0]
+    return data-np.dot(gen_func,res)
 
 
 def f_rect(x,N):
     """
-    Calculates the rectangular window for a window of length N at the point x  elem 0..N-1
+    Calculates the rectangular window for a window of length N at the point x  elem 0..N-1,
+    x can be an array
     """
-    h=0.0
-    if (x>=0) and (x<=N-1):
-        h=1.0
-    return h
+    x=np.asarray(x,dtype=float)
+    h=np.where((x>=0) & (x<=N-1),1.0,0.0)
+    return h[()]
 
 
 def f_hann(x,N):
     """
-    Calculates the hann window for a window of length N at the point x  elem 0..N-1
+    Calculates the hann window for a window of length N at the point x  elem 0..N-1,
+    x can be an array
     """
-    h=0.0
-    if (x>=0) and (x<=N-1):
-        h=1.0-math.cos(2*math.pi*x/(N-1.0))
-    return h
+    x=np.asarray(x,dtype=float)
+    k=2*math.pi/(N-1.0)  # N=1 raises ZeroDivisionError like the scalar version did
+    h=np.where((x>=0) & (x<=N-1),1.0-np.cos(k*x),0.0)
+    return h[()]
 
 def f_welch(x,N):   #note that if winlen=N, x=0...N-1
     """
-    Calculates the welch window for a window of length N at the point x  elem 0..N-1
+    Calculates the welch window for a window of length N at the point x  elem 0..N-1,
+    x can be an array
     """
-    h=0.0
-    if (x>=0) and (x<=N-1):
-        d=(1.0*x-(1.0*(N-1))/2)/((1.0*N+1.0)/2.0)
-        h=1.0-d*d
-    return h
+    x=np.asarray(x,dtype=float)
+    d=(x-(1.0*(N-1))/2)/((1.0*N+1.0)/2.0)
+    h=np.where((x>=0) & (x<=N-1),1.0-d*d,0.0)
+    return h[()]
 
 def f_win(x,N,wtype=2):
     if wtype==0:
@@ -89,18 +82,15 @@ def f_win(x,N,wtype=2):
         return f_rect(x,N)
 
 def win_hann(winlen):
-    x=range(winlen)
-    h=[f_hann(i,winlen) for i in x]
-    return h
+    return f_hann(np.arange(winlen),winlen)
 
 def win_rect(winlen):
-    x=np.ones(winlen)
-    return list(x)
+    return np.ones(winlen)
 
 
 def win_hanning(winlen):
-    x=range(winlen)
-    h=[1-math.cos(math.pi*i/max(x))*math.cos(math.pi*i/max(x)) for i in x]
+    x=np.arange(winlen)
+    h=1-np.cos(math.pi*x/max(x))**2
     return h
 
 def calc_win(winlen,type=2):
@@ -111,12 +101,8 @@ def calc_win(winlen,type=2):
     return mywindow
 
 def norm_win(window):
-    s=0;
-    t=0;
-    for i in window:
-        s+=i*i
-        t+=1
-    return 1.0*s/t
+    window=np.asarray(window,dtype=float)
+    return float(np.dot(window,window))/len(window)
 
 def rho_win(L,D,j,wintype=2):
     """
@@ -128,14 +114,13 @@ def rho_win(L,D,j,wintype=2):
             1 - welch
             2 - hann
     """
-    mysum=0.0
-    wss=0.0
-    for i in range(L):
-        mysum+=f_win(i,L,wintype)*f_win(i-j*D,L,wintype)
-        wss+=f_win(i,L,wintype)*f_win(i,L,wintype)
+    i=np.arange(L)
+    w=f_win(i,L,wintype)
+    # python floats, a window that is 0 everywhere raises ZeroDivisionError
+    mysum=float(np.dot(w,f_win(i-j*D,L,wintype)))
+    wss=float(np.dot(w,w))
     return mysum*mysum/wss/wss
 
-
 def psd_rel_var(L,D,K,wintype=2):
     """
         Calculates the variance of the power spectral density relative to the
@@ -164,13 +149,22 @@ def get_segment_starts(N,L,D):
         ixK+L-1, with ix1=D,ix2=2*D,ix3=3*D...
         Note this is in python notation data[ix1:ix1+L]
     """
-    a=[0]
-    ss=0
-    if D==0: return a
-    while ss+D+L<=N:
-        ss=ss+D
-        a.append(ss)
-    return a
+    if D==0: return [0]
+    return [0]+list(range(D,N-L+1,D))
+
+
+def get_segments(data,L,D,K=None):
+    """
+        Returns the segments data[ix:ix+L] of get_segment_starts(N,L,D) stacked
+        in the rows of an array, the rows are views of data, not copies. With K
+        only the first K segments are returned.
+    """
+    data=np.asarray(data)
+    starts=get_segment_starts(len(data),L,D)
+    if K is not None:
+        starts=starts[:K]
+    # the starts are D apart (only [0] for D=0), so the segments are every D-th window
+    return np.lib.stride_tricks.sliding_window_view(data,L)[starts[0]:starts[-1]+1:max(D,1)]
 
 
 
@@ -214,17 +208,14 @@ def psd_rel_var_NLD(N,L,D,wintype=2):
 
 
 def r2fft(ind1,ind2):
-    newind  = ind1+ind2*complex(0,1)
-    fft    = np.fft.fft(newind)
-    dM=len(fft)
-    M=dM/2
-    fft1=np.empty(M+1,dtype=complex)
-    fft2=np.empty(M+1,dtype=complex)
-    fft1[0]=np.real(fft[0])
-    fft2[0]=np.imag(fft[0])
-    for k in range(1,M+1):
-        fft1[k] = (fft[k]+np.conjugate(fft[dM-k]))*0.5
-        fft2[k] = (fft[k]-np.conjugate(fft[dM-k]))*0.5*complex(0,-1)
+    """
+    Fourier transforms of the two real arrays ind1 and ind2 (also stacked in rows),
+    for k=0..M with M=len//2
+    """
+    dM=np.shape(ind1)[-1]
+    M=dM//2
+    fft1=np.fft.rfft(ind1,axis=-1)[...,:M+1]
+    fft2=np.fft.rfft(ind2,axis=-1)[...,:M+1]
     newtup=(fft1,fft2)
     return newtup
 
@@ -243,26 +234,12 @@ def mypsd(ind1,dt,wintype=2,L=0,D=0):
 #    ind1=ind1-np.mean(ind1)
     window = calc_win(L,wintype)
     wss = norm_win(window)
-    startix=get_segment_starts(N,L,D)
-    cum=[]
-    cumc=0;
-    for six in startix:
-        eix=six+L
-        newind1 = np.multiply(ind1[six:eix],window)
-        myfft   = np.fft.rfft(newind1)
-        myfft   = np.multiply(myfft,dt*math.sqrt(1.0/wss))
-        Sxx     = np.power(np.abs(myfft),2)
-        Sxx     = Sxx/dt/L
-        Gxx     = Sxx
-        Gxx[1:]=Gxx[1:]*2  # times 2, since we calculate the one sided psd
-        if len(cum)==0:
-            cum=Gxx
-        else:
-            cum=[cum[n]+Gxx[n] for n in range(len(Gxx))]
-        cumc+=1
-    if cumc>1:
-        cum = [cum[n]/cumc for n in range(len(cum))]
-    myfreq=[i*1.0/2.0/dt/(len(cum)-1) for i in range(len(cum))]
+    # all segments windowed and transformed at once
+    myfft = np.fft.rfft(get_segments(ind1,L,D)*window,axis=-1)*(dt*math.sqrt(1.0/wss))
+    Gxx = (myfft.real**2+myfft.imag**2)/dt/L
+    Gxx[:,1:]=Gxx[:,1:]*2  # times 2, since we calculate the one sided psd
+    cum = np.mean(Gxx,axis=0)
+    myfreq=np.arange(len(cum))*1.0/2.0/dt/(len(cum)-1)
     newtup=(cum,myfreq)
     return newtup
 
@@ -283,106 +260,74 @@ def mypsa(ind1,dt,wintype=2,L=0,D=0):
     return newtup
 
 
-def mycsd(ind1,ind2,dt,wintype=2,nr_of_segs=1):
+def two_segment_ffts(ind1,ind2,dt,wintype,nr_of_segs):
     """
-    calculates the cross spectral density
+    Windowed and scaled Fourier transforms of the nr_of_segs segments of ind1 and
+    ind2 (mean removed) that overlap by half, stacked in rows, and the segment length.
+    One segment is the whole data.
     """
     if len(ind1)!=len(ind2):
         print ("sizes don't match")
-        exit
     ind1=ind1-np.mean(ind1)
     ind2=ind2-np.mean(ind2)
     N = len(ind1)
     M=N//(nr_of_segs+1)
     dM=2*M
     if nr_of_segs==1:
+        M=N
         dM=N
-    cum=[]
-    cumc=0;
     window = calc_win(dM,wintype)
     wss = norm_win(window)
-    for i in range(nr_of_segs):
-        newind1 = np.multiply(ind1[i*M:i*M+dM],window)
-        newind2 = np.multiply(ind2[i*M:i*M+dM],window)
-        fft1,fft2=r2fft(newind1,newind2)
-        fft1   = np.multiply(fft1,dt*math.sqrt(1.0/wss))
-        fft2   = np.multiply(fft2,dt*math.sqrt(1.0/wss))
-        Sxy    = np.multiply(np.conjugate(fft1),fft2)/dt/dM
-        Gxy    = Sxy
-        Gxy[1:-1]=Gxy[1:-1]*2  # times 2, since we calculate the one sided psd
-        if len(cum)==0:
-            cum=Gxy
-        else:
-            cum=[cum[n]+Gxy[n] for n in range(len(Gxy))]
-        cumc+=1
-    if cumc>1:
-        cum = [cum[n]/cumc for n in range(len(cum))]
-    myfreq=[i*1.0/2.0/dt/(len(cum)-1) for i in range(len(cum))]
+    fft1,fft2=r2fft(get_segments(ind1,dM,M,nr_of_segs)*window,get_segments(ind2,dM,M,nr_of_segs)*window)
+    fft1   = fft1*(dt*math.sqrt(1.0/wss))
+    fft2   = fft2*(dt*math.sqrt(1.0/wss))
+    return fft1,fft2,dM
+
+
+def mycsd(ind1,ind2,dt,wintype=2,nr_of_segs=1):
+    """
+    calculates the cross spectral density
+    """
+    fft1,fft2,dM=two_segment_ffts(ind1,ind2,dt,wintype,nr_of_segs)
+    Gxy    = np.conjugate(fft1)*fft2/dt/dM
+    Gxy[:,1:-1]=Gxy[:,1:-1]*2  # times 2, since we calculate the one sided psd
+    cum = np.mean(Gxy,axis=0)
+    myfreq=np.arange(len(cum))*1.0/2.0/dt/(len(cum)-1)
     newtup=(cum,myfreq)
     return newtup
 
 
 
+def mycsdcoherence(ind1,ind2,dt,wintype=2,nr_of_segs=1):
+    """
+    Calculates the cross spectral density and the coherence from the same
+    Fourier transforms of the segments. Returns Gxy,coh,f
+    """
+    fft1,fft2,dM=two_segment_ffts(ind1,ind2,dt,wintype,nr_of_segs)
+    Gxx     = (fft1.real**2+fft1.imag**2)/dt/dM
+    Gyy     = (fft2.real**2+fft2.imag**2)/dt/dM
+    Gxy     = np.conjugate(fft1)*fft2/dt/dM
+    # times 2, since we calculate the one sided psd
+    Gxx[:,1:-1]=Gxx[:,1:-1]*2.0
+    Gyy[:,1:-1]=Gyy[:,1:-1]*2.0
+    Gxy[:,1:-1]=Gxy[:,1:-1]*2.0
+    cumGxx=np.mean(Gxx,axis=0)
+    cumGyy=np.mean(Gyy,axis=0)
+    cumGxy=np.mean(Gxy,axis=0)
+    #coherence is given by coh=|Gxy|^2/(Gxx Gyy)
+    coh=np.divide(np.power(np.abs(cumGxy),2),np.multiply(cumGxx,cumGyy))
+    myfreq=np.arange(len(coh))*1.0/2.0/dt/(len(coh)-1)
+    newtup=(cumGxy,coh,myfreq)
+    return newtup
+
+
 def mycoherence(ind1,ind2,dt,wintype=2,nr_of_segs=1):
     """
     coherence is given by coh=|Gxy|^2/(Gxx Gyy)
     Note if nr_of_segs=1 than coherence is always one.
     I still have to think about the statement above.
     """
-    if len(ind1)!=len(ind2):
-        print ("sizes don't match")
-        exit
-    ind1=ind1-np.mean(ind1)
-    ind2=ind2-np.mean(ind2)
-    N = len(ind1)
-    M=N//(nr_of_segs+1)
-    dM=2*M
-    if nr_of_segs==1:
-        dM=N
-    cumGxx=[]
-    cumGyy=[]
-    cumGxy=[]
-    cumc=0;
-    window = calc_win(dM,wintype)
-    wss = norm_win(window)
-    for i in range(nr_of_segs):
-        newind1 = np.multiply(ind1[i*M:i*M+dM],window)
-        newind2 = np.multiply(ind2[i*M:i*M+dM],window)
-        fft1,fft2=r2fft(newind1,newind2)
-        fft1   = np.multiply(fft1,dt*math.sqrt(1.0/wss))
-        fft2   = np.multiply(fft2,dt*math.sqrt(1.0/wss))
-
-        Sxx     = np.power(np.abs(fft1),2)
-        Sxx     = Sxx/dt/dM
-        Gxx     = Sxx
-        Gxx[1:-1]=Gxx[1:-1]*2.0  # times 2, since we calculate the one sided psd
-
-        Syy     = np.power(np.abs(fft2),2)
-        Syy     = Syy/dt/dM
-        Gyy     = Syy
-        Gyy[1:-1]=Gyy[1:-1]*2.0  # times 2, since we calculate the one sided psd
-
-        Sxy    = np.multiply(np.conjugate(fft1),fft2)/dt/dM
-        Gxy    = Sxy
-        Gxy[1:-1]=Gxy[1:-1]*2.0  # times 2, since we calculate the one sided psd
-
-        if len(cumGxx)==0:
-            cumGxx=Gxx
-            cumGyy=Gyy
-            cumGxy=Gxy
-        else:
-            for n in range(len(Gxx)):
-                cumGxx[n]=cumGxx[n]+Gxx[n]
-                cumGyy[n]=cumGyy[n]+Gyy[n]
-                cumGxy[n]=cumGxy[n]+Gxy[n]
-        cumc+=1
-    if cumc>1:
-        cumGxx=cumGxx/cumc
-        cumGyy=cumGyy/cumc
-        cumGxy=cumGxy/cumc
-    #coherence is given by coh=|Gxy|^2/(Gxx Gyy)
-    coh=np.divide(np.power(np.abs(cumGxy),2),np.multiply(cumGxx,cumGyy))
-    myfreq=[i*1.0/2.0/dt/(len(coh)-1) for i in range(len(coh))]
+    Gxy,coh,myfreq=mycsdcoherence(ind1,ind2,dt,wintype,nr_of_segs)
     newtup=(coh,myfreq)
     return newtup
 
@@ -390,51 +335,17 @@ def myresp(ind1,ind2,dt,wintype=2,nr_of_segs=1):
     """
     response is given by H=Gxy/Gxx
     """
-    if len(ind1)!=len(ind2):
-        print ("sizes don't match")
-        exit
-    ind1=ind1-np.mean(ind1)
-    ind2=ind2-np.mean(ind2)
-    N = len(ind1)
-    M=N//(nr_of_segs+1)
-    dM=2*M
-    if nr_of_segs==1:
-        dM=N
-    cumGxx=[]
-    cumGxy=[]
-    cumc=0;
-    window = calc_win(dM,wintype)
-    wss = norm_win(window)
-    for i in range(nr_of_segs):
-        newind1 = np.multiply(ind1[i*M:i*M+2*M],window)
-        newind2 = np.multiply(ind2[i*M:i*M+2*M],window)
-        fft1,fft2=r2fft(newind1,newind2)
-        fft1   = np.multiply(fft1,dt*math.sqrt(1.0/wss))
-        fft2   = np.multiply(fft2,dt*math.sqrt(1.0/wss))
-
-        Sxx     = np.power(np.abs(fft1),2)
-        Sxx     = Sxx/dt/dM
-        Gxx     = Sxx
-        Gxx[1:-1]=Gxx[1:-1]*2  # times 2, since we calculate the one sided psd
-
-        Sxy    = np.multiply(np.conjugate(fft1),fft2)/dt/dM
-        Gxy    = Sxy
-        Gxy[1:-1]=Gxy[1:-1]*2  # times 2, since we calculate the one sided psd
-
-        if len(cumGxx)==0:
-            cumGxx=Gxx
-            cumGxy=Gxy
-        else:
-            for n in range(len(Gxx)):
-                cumGxx[n]=cumGxx[n]+Gxx[n]
-                cumGxy[n]=cumGxy[n]+Gxy[n]
-        cumc+=1
-    if cumc>1:
-        cumGxx=cumGxx/cumc
-        cumGxy=cumGxy/cumc
+    fft1,fft2,dM=two_segment_ffts(ind1,ind2,dt,wintype,nr_of_segs)
+    Gxx     = (fft1.real**2+fft1.imag**2)/dt/dM
+    Gxy     = np.conjugate(fft1)*fft2/dt/dM
+    # times 2, since we calculate the one sided psd
+    Gxx[:,1:-1]=Gxx[:,1:-1]*2
+    Gxy[:,1:-1]=Gxy[:,1:-1]*2
+    cumGxx=np.mean(Gxx,axis=0)
+    cumGxy=np.mean(Gxy,axis=0)
     #response is given by H=Gxy/Gxx
     resp=np.divide(cumGxy,cumGxx)
-    myfreq=[i*1.0/2.0/dt/(len(resp)-1) for i in range(len(resp))]
+    myfreq=np.arange(len(resp))*1.0/2.0/dt/(len(resp)-1)
     newtup=(resp,myfreq)
     return newtup
 
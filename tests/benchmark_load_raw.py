@@ -0,0 +1,32 @@
+"""Benchmark of load_raw against the line by line parser it replaced on the bundled datasets,
+run as: python tests/benchmark_load_raw.py
+"""
+import os, sys
+from glob import glob
+from time import perf_counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from magnicon_ccc import magnicon_ccc, base_dir
+from test_magnicon_ccc import load_raw_lines
+
+def best(function, repeats: int=5) -> float:
+    # shortest of repeats calls, the file is in the page cache after the first one
+    times = []
+    for i in range(repeats):
+        start = perf_counter()
+        function()
+        times.append(perf_counter() - start)
+    return min(times)
+
+if __name__ == '__main__':
+    total_old, total_new = 0., 0.
+    for bvdFile in sorted(glob(base_dir + os.sep + '*_CCC' + os.sep + '*_bvd.txt')):
+        mag = magnicon_ccc(bvdFile, '', '')
+        t_old = best(lambda: load_raw_lines(mag.rawFile))
+        t_new = best(mag.load_raw)
+        total_old += t_old
+        total_new += t_new
+        print(f'{os.path.basename(mag.rawFile)}: {len(mag.rawData)} samples, lines: {1000*t_old:.1f} ms, ' + \
+              f'load_raw: {1000*t_new:.1f} ms, speedup: {t_old/t_new:.1f}x')
+    print(f'all runs: lines: {1000*total_old:.1f} ms, load_raw: {1000*total_new:.1f} ms, ' + \
+          f'speedup: {total_old/total_new:.1f}x')
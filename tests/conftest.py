@@ -0,0 +1,4 @@
+import os, sys
+
+# the modules of the project are imported from the directory above the tests
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,54 @@
+import os, shutil
+from datetime import timedelta, datetime as dt
+from dateutil.relativedelta import relativedelta
+from pytz import utc
+from numpy import allclose
+from ResDataBase import ResData
+
+base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def database(folder: str) -> str:
+    """Copies the bundled database to the path that ResData reads for the directory returned"""
+    bp = os.path.join(folder, 'data')
+    os.makedirs(bp)
+    shutil.copy(os.path.join(base_dir, 'data', 'ResDataBase.dat'), f'{bp}\\ResDataBase.dat')
+    return bp
+
+def parse_lines(datFile: str) -> dict:
+    # the line by line parser of previous versions
+    ref = {}
+    with open (datFile, "r") as f:
+        for line in f.readlines():
+            if line.startswith('CalDate'):
+                CalDate = float(line.split('=')[-1].rstrip(' \n'))
+                UnixDateObj = dt.fromtimestamp(CalDate, tz=utc) - relativedelta(years=66)
+                CorrCalDate = (UnixDateObj - dt(1970,1,1,0,0,tzinfo=utc)) / timedelta(seconds=1)
+            elif line.startswith('SN'):
+                SN = line.split('=')[-1].rstrip(' "\n').lstrip(' "')
+                ref[SN] = {'CalDate': CalDate, 'CorrCalDate': CorrCalDate}
+            elif '=' in line and line.split('=')[0].strip() in ResData.columns:
+                ref[SN][line.split('=')[0].strip()] = float(line.split('=')[-1].rstrip(' \n'))
+    return ref
+
+def test_parse(tmp_path):
+    R = ResData(database(str(tmp_path)))
+    assert len(R.SN) > 0
+    assert R.ResDict == parse_lines(R.datFile)
+
+def test_load_shared(tmp_path):
+    bp = database(str(tmp_path))
+    R = ResData.load(bp)
+    assert ResData.load(bp) is R and R.SN
+    # a changed file is parsed again
+    with open(R.datFile, 'a') as f:
+        f.write('\n')
+    assert ResData.load(bp) is not R
+
+def test_predicted_values(tmp_path):
+    R = ResData(database(str(tmp_path)))
+    SNs = list(R.ResDict)[:10]*30 + ['unknown']
+    times = [1.7e9 + 1000.*i for i in range(len(SNs))]
+    pred = R.predictedValuesUnix(SNs, times)
+    single = [R.predictedValueUnix(i, j) for i, j in zip(SNs, times)]
+    assert allclose(pred[:-1], single[:-1], rtol=1e-14, atol=0)
+    assert single[-1] is None and pred[-1] != pred[-1]
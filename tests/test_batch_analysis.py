@@ -0,0 +1,26 @@
+import os
+import pytest
+
+pytest.importorskip('win32file')
+from concurrent.futures.process import BrokenProcessPool
+from batch_analysis import run_pool
+
+def square(x: int) -> int:
+    # item 3 kills its worker process like a run that runs out of memory
+    if x == 3:
+        os._exit(1)
+    if x == 5:
+        raise ValueError('bad run')
+    return x*x
+
+@pytest.mark.parametrize('jobs', [2, 3])
+def test_run_pool_worker_death(jobs):
+    results = {}
+    def finished(ct, result, error):
+        assert ct not in results
+        results[ct] = (result, error)
+    run_pool(square, list(range(10)), jobs, finished)
+    assert sorted(results) == list(range(10))
+    assert isinstance(results[3][1], BrokenProcessPool)
+    assert isinstance(results[5][1], ValueError)
+    assert all(results[i] == (i*i, None) for i in range(10) if i not in (3, 5))
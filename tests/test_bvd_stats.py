@@ -0,0 +1,44 @@
+import os
+import pytest
+
+pytest.importorskip('win32file')
+from glob import glob
+from types import SimpleNamespace
+from numpy import array_equal
+from magnicon_ccc import magnicon_ccc, base_dir
+from bvd_stats import bvd_stat
+
+runs = sorted(glob(base_dir + os.sep + '*_CCC' + os.sep + '*_bvd.txt'))
+
+def assert_same_stats(old: tuple, new: tuple) -> None:
+    # bvdList, V1, V2, A, B, stdA, stdB, AA, BB, stdbvdList and the used half cycles AA_used, BB_used
+    for i, j in zip(old[:10], new[:10]):
+        assert array_equal(i, j, equal_nan=True)
+    for i, j in zip(old[10:], new[10:]):
+        assert len(i) == len(j) and all(array_equal(k, l) for k, l in zip(i, j))
+
+@pytest.mark.parametrize('bvdFile', runs, ids=os.path.basename)
+def test_update_follow(bvdFile):
+    # the samples are appended in steps of 997 samples (cutting half cycles) like a followed run
+    mag = magnicon_ccc(bvdFile, '', '')
+    for ignored_first, ignored_last in ((mag.ignored_first, mag.ignored_last), (5, 4)):
+        run = SimpleNamespace(SHC=mag.SHC, rawData=mag.rawData[:0], phase=mag.phase[:0])
+        followed = bvd_stat(bvdFile, ignored_first, ignored_last, run, False)
+        for end in list(range(0, len(mag.rawData), 997)) + [len(mag.rawData)]:
+            run.rawData, run.phase = mag.rawData[:end], mag.phase[:end]
+            followed.update()
+            full = bvd_stat(bvdFile, ignored_first, ignored_last, run, False)
+            assert_same_stats(full.send_bvd_stats(), followed.send_bvd_stats())
+        # the whole run against the loop engine
+        full._process_thread_new()
+        assert_same_stats(full.send_bvd_stats(), followed.send_bvd_stats())
+
+@pytest.mark.parametrize('bvdFile', runs, ids=os.path.basename)
+def test_array_engine(bvdFile):
+    mag = magnicon_ccc(bvdFile, '', '')
+    for ignored_first, ignored_last in ((mag.ignored_first, mag.ignored_last), (0, 0), (3, 0), (5, 4)):
+        bvd_stat_obj = bvd_stat(bvdFile, ignored_first, ignored_last, mag, False)
+        bvd_stat_obj._process_thread_new()
+        old = bvd_stat_obj.send_bvd_stats()
+        bvd_stat_obj._process_thread_vec()
+        assert_same_stats(old, bvd_stat_obj.send_bvd_stats())
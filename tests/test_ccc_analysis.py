@@ -0,0 +1,99 @@
+import os
+import pytest
+
+pytest.importorskip('win32file')
+from functools import lru_cache
+from glob import glob
+from random import Random
+from numpy import allclose, array_equal, array, mean
+from scipy import signal
+from magnicon_ccc import base_dir
+from ccc_analysis import ccc_analysis, ccc_results, calc_allan, get_allan_pool, welch_psd, \
+                         calc_coherence
+
+runs = sorted(glob(base_dir + os.sep + '*_CCC' + os.sep + '*_bvd.txt'))
+names = [i for i in ccc_results.attributes if i not in ccc_results.point_lists]
+
+@lru_cache(maxsize=None)
+def analysis(bvdFile: str):
+    run = ccc_analysis(bvdFile)
+    if not run.run() or run.res.N < 10:
+        pytest.skip('fewer than 10 BVDs')
+    return run
+
+def results(run, V1, V2, corr_bvdList, stdbvdList, bvdList_chk) -> ccc_results:
+    return ccc_results(run.dat, V1, V2, corr_bvdList, stdbvdList, bvdList_chk, run.R1Temp, run.R2Temp, \
+                       run.R1TotPres, run.R2TotPres)
+
+def assert_same(res, other) -> None:
+    for i in names:
+        assert allclose(getattr(res, i), getattr(other, i), rtol=1e-9, atol=0, equal_nan=True), i
+    for i in ccc_results.point_lists:
+        assert array_equal(getattr(res, i), getattr(other, i)), i
+
+@pytest.mark.parametrize('bvdFile', runs, ids=os.path.basename)
+def test_delete_restore(bvdFile):
+    # the statistics from the running sums after every delete against a calculation of the remaining BVDs
+    run = analysis(bvdFile)
+    res = results(run, run.V1, run.V2, run.corr_bvdList, run.stdbvdList, run.bvdList_chk)
+    rand = Random(0)
+    # half of the BVDs, at most 200 of the long runs
+    for i in range(min(res.N//2, 200)):
+        res.delete(rand.randrange(res.N))
+        assert_same(res, results(run, res.V1, res.V2, res.corr_bvdList, res.stdbvdList, res.bvdList_chk))
+    while res.deleted != []:
+        res.restore()
+    assert_same(res, results(run, run.V1, run.V2, run.corr_bvdList, run.stdbvdList, run.bvdList_chk))
+
+@pytest.mark.parametrize('bvdFile', runs, ids=os.path.basename)
+def test_extend(bvdFile):
+    # the results of the first BVDs are extended in steps like a followed run, the last BVD of every step is
+    # not complete yet and changes in the next one
+    run = analysis(bvdFile)
+    inputs = [run.V1, run.V2, run.corr_bvdList, run.stdbvdList, run.bvdList_chk]
+    grown = results(run, *(i[:2] for i in inputs))
+    grown.delete(0)
+    for end in list(range(3, len(run.V1), 7)) + [len(run.V1)]:
+        step = [i[:end] for i in inputs]
+        if end < len(run.V1):
+            step[2] = step[2][:-1] + [step[2][-1]*1.01]
+        grown.extend(*step)
+    assert grown.N == len(run.V1) - 1
+    assert_same(grown, results(run, grown.V1, grown.V2, grown.corr_bvdList, grown.stdbvdList, grown.bvdList_chk))
+
+@pytest.mark.parametrize('bvdFile', runs, ids=os.path.basename)
+def test_calc_allan_pool(bvdFile):
+    # the raw BV deviations on a pool of two processes against all seven series in turn
+    run = analysis(bvdFile)
+    allan_args = (run.dat, run.corr_bvdList, run.V1, run.V2, run.AA, run.BB, run.A, run.B, False, 'Allan', 'all')
+    serial = calc_allan(*allan_args, processes=1)
+    try:
+        pooled = calc_allan(*allan_args, processes=2)
+    finally:
+        get_allan_pool(0)
+    assert list(serial) == list(pooled)
+    for key in serial:
+        assert all(array_equal(i, j, equal_nan=True) for i, j in zip(serial[key], pooled[key]))
+
+@pytest.mark.parametrize('bvdFile', runs, ids=os.path.basename)
+def test_welch_psd_one_segment(bvdFile):
+    # one segment is the periodogram of scipy.signal.welch
+    run = analysis(bvdFile)
+    for d, fs in ((run.corr_bvdList, 1./run.dat.fullCyc), (run.A, run.dat.dt), (run.B, run.dat.dt)):
+        ref = signal.welch(array(d), fs=fs, window='hann', nperseg=len(d), scaling='density', axis=-1, \
+                           average='mean', return_onesided=True)
+        res = welch_psd(d, fs)
+        assert allclose(ref[0], res[0]) and allclose(ref[1], res[1], rtol=1e-9, atol=0)
+        assert len(welch_psd(d, fs, segments=8)[1]) == len(d)//8//2 + 1
+
+@pytest.mark.parametrize('bvdFile', runs, ids=os.path.basename)
+def test_calc_coherence(bvdFile):
+    run = analysis(bvdFile)
+    coh = calc_coherence(run.dat, run.V1, run.V2, run.A, run.B)
+    # the 8 segments of spectral start every M samples and are 2*M long, the mean of the whole series is removed
+    x, y = array(run.V1) - mean(run.V1), array(run.V2) - mean(run.V2)
+    M = len(x)//9
+    ref = signal.coherence(x[:9*M], y[:9*M], fs=1./run.dat.fullCyc, window=signal.get_window('hann', 2*M, False), \
+                           nperseg=2*M, noverlap=M, detrend=False)
+    assert allclose(ref[0], coh['coh_C12'][0]) and allclose(ref[1][1:-1], coh['coh_C12'][2][1:-1])
+    assert len(coh['coh_bv'][0]) > 0
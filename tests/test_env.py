@@ -0,0 +1,36 @@
+from datetime import datetime
+from os import sep, scandir
+from numpy import arange, sin, pi, allclose
+from numpy.random import default_rng
+from pandas import read_csv, concat
+from env import env, env_store, EPOCH
+
+# runs within a day, over midnight, of one second, over four days and without logs
+runs = [('4/5/2024 06:14:18 PM', '4/5/2024 06:20:18 PM'), ('4/5/2024 10:00:00 PM', '4/6/2024 02:30:00 AM'), \
+        ('4/6/2024 11:59:59 PM', '4/6/2024 11:59:59 PM'), ('4/5/2024 01:30:00 PM', '4/8/2024 09:15:00 AM'), \
+        ('4/9/2024 01:00:00 AM', '4/9/2024 02:00:00 AM')]
+
+def write_logs(folder: str, days: int, step: float) -> None:
+    """Writes days of logs of the temperature and pressure every step seconds from 4/5/2024 on"""
+    rng = default_rng(0)
+    start = datetime.timestamp(datetime(2024, 4, 5))
+    for day in range(days):
+        TS = start + 86400*day + arange(0, 86400., step)
+        T = 23 + 0.01*sin(2*pi*TS/3600) + 0.001*rng.normal(size=len(TS))
+        P = 101.3 + 0.01*rng.normal(size=len(TS))
+        with open(folder + sep + 'Room-E014_' + datetime.fromtimestamp(TS[0]).strftime('%Y%m%d') + '.txt', 'w') as f:
+            f.write('\n'.join(f'{t + EPOCH:.3f}\t{a:.6f}\t{b:.6f}' for t, a, b in zip(TS, T, P)) + '\n')
+
+def test_statistics(tmp_path, monkeypatch):
+    # the statistics of the store against a pandas filter of all the files, the files are read in chunks
+    folder = str(tmp_path)
+    write_logs(folder, 4, 5.)
+    monkeypatch.setattr(env_store, 'chunk_rows', 1000)
+    df = concat([read_csv(folder + sep + i.name, sep='\t', names=['TS','T','P']) for i in scandir(folder)])
+    df['TS'] = df['TS'] - EPOCH
+    for begin, end in runs:
+        obj = env(folder, begin, end)
+        sel = df[(df['TS'] >= obj.start_timestamp) & (df['TS'] <= obj.end_timestamp)]
+        ref = (round(sel['T'].mean(), 6), sel['T'].std(), round(sel['P'].mean(), 6)*1e3, sel['P'].std()*1e3, len(sel))
+        assert allclose(obj.calc_statistics(), ref, rtol=1e-9, atol=0, equal_nan=True)
+        assert allclose(obj.calc_average(), (ref[0], ref[2]), rtol=1e-9, atol=0, equal_nan=True)
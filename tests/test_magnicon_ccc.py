@@ -0,0 +1,139 @@
+import os, shutil
+import pytest
+
+pytest.importorskip('win32file')
+from glob import glob
+from numpy import array_equal
+from magnicon_ccc import magnicon_ccc, base_dir, magnicon_float
+
+runs = sorted(glob(base_dir + os.sep + '*_CCC' + os.sep + '*_bvd.txt'))
+header_keys = ['R1 Info', 'R2 Info', 'number of samples per half cycle', 'ignored first samples', \
+               'ignored last samples', 'remarks', 'stop date', 'start date', 'stop time', 'start time']
+
+def load_raw_lines(rawFile: str) -> tuple:
+    # the line by line parser that read_data_block replaced
+    rawData, phase, error = [], [], []
+    collectData = False
+    with open(rawFile, "rb") as file:
+        for line in file.read().decode('latin-1').splitlines(True):
+            if any(line.startswith(key) for key in header_keys):
+                continue
+            elif collectData:
+                rawData.append(float(line.split('\t')[0]))
+                phase.append(int(line.split('\t')[1]))
+                error.append(int(line.split('\t')[2]))
+            elif line.startswith('data(V)'):
+                collectData = True
+    return rawData, phase, error
+
+@pytest.mark.parametrize('bvdFile', runs, ids=os.path.basename)
+def test_read_data_block(bvdFile):
+    rawFile = bvdFile[:-len('_bvd.txt')] + '.txt'
+    with open(rawFile, "rb") as file:
+        for line in file:
+            if line.startswith(b'data(V)'):
+                break
+        new = magnicon_ccc.read_data_block(file)
+    for i, j in zip(load_raw_lines(rawFile), new):
+        assert list(i) == list(j)
+
+def load_bvd_lines(bvdFile: str) -> tuple:
+    # the line by line parser of the _bvd.txt table that the bulk read replaced
+    bvd, start = [], False
+    with open(bvdFile, "r") as file:
+        for line in file.readlines():
+            if line.startswith('#points'):
+                start = True
+            if start and line.split()[0].isnumeric():
+                bvd.append(magnicon_float(line.split()[1]))
+    array = line.split()
+    return bvd, [magnicon_float(i) for i in array[2:4]] if array[0].isnumeric() else [0, 0]
+
+@pytest.mark.parametrize('bvdFile', runs, ids=os.path.basename)
+def test_load_bvd(bvdFile):
+    bvd, summary = load_bvd_lines(bvdFile)
+    mag = magnicon_ccc(bvdFile, '', '')
+    assert mag.bvd == bvd
+    assert array_equal(summary, [mag.bvdMean, mag.stddrt], equal_nan=True)
+    # the last row read from the end of the file, in blocks that cut its lines
+    for size in (16, 4096):
+        last = magnicon_ccc.bvd_summary(bvdFile, size)
+        if bvd:
+            assert last[:2] == (len(bvd), bvd[-1]) and array_equal(last[2:], summary, equal_nan=True)
+        else:
+            assert last is None
+
+def test_read_bvd_table_long(tmp_path):
+    # a multi-day run: the table of the longest run repeated 35 times
+    bvdFile = max(runs, key=os.path.getsize)
+    with open(bvdFile, 'rb') as file:
+        header, table = file.read().split(b'#points')
+    titles, rows = table.split(b'\n', 1)
+    longFile = str(tmp_path / 'long_bvd.txt')
+    with open(longFile, 'wb') as file:
+        file.write(header + b'#points' + titles + b'\n' + rows*35)
+    with open(longFile, 'rb') as file:
+        file.seek(len(header))
+        file.readline()
+        new = magnicon_ccc.read_bvd_table(file)
+    assert len(new) == 35*len(magnicon_ccc(bvdFile, '', '').bvd)
+    assert new == load_bvd_lines(longFile)[0]
+
+@pytest.mark.parametrize('bvdFile', runs, ids=os.path.basename)
+def test_cache(bvdFile, tmp_path):
+    # the first load parses the three files of the run, the second one loads them from the cache
+    cache_dir = str(tmp_path)
+    parsed = magnicon_ccc(bvdFile, '', '', cache_dir)
+    cached = magnicon_ccc(bvdFile, '', '', cache_dir)
+    assert vars(parsed).keys() == vars(cached).keys()
+    for key, value in vars(parsed).items():
+        assert array_equal(value, vars(cached)[key], equal_nan=isinstance(value, float))
+
+def live_copy(bvdFile: str, folder: str) -> tuple:
+    """Copies the _bvd.txt and config files of a run into folder, returns the raw data file of the copy, the
+    raw data file with the placeholders of a running measurement and the raw data file of the stopped run
+    """
+    mag = magnicon_ccc(bvdFile, '', '', header_only=True)
+    for i in (mag.bvdFile, mag.cfgFile):
+        shutil.copy(i, folder)
+    with open(mag.rawFile, 'rb') as file:
+        raw = file.read()
+    lines = raw.split(b'\n')
+    for ct, line in enumerate(lines[:8]):
+        name, value = line.split(b'\t', 1)
+        if name.startswith(b'stop') or name.startswith(b'com rel. humid') or b'temp' in name:
+            # the Magnicon software writes placeholders of the same length while the run is measured
+            lines[ct] = name + b'\t' + b''.join(b'x' if chr(i).isdigit() else bytes([i]) for i in value)
+    live = b'\n'.join(lines)
+    assert len(live) == len(raw)
+    return os.path.join(folder, os.path.basename(mag.rawFile)), live, raw
+
+def test_append_raw_until_stopped(tmp_path):
+    # a stopped run with samples, copied as it was while measured
+    bvdFile = next(i for i in runs if '240507_001_1834' in i)
+    rawFile, live, raw = live_copy(bvdFile, str(tmp_path))
+    start = live.index(b'\n', live.index(b'data(V)')) + 1
+    # the first read ends inside a line
+    end = start + 20007
+    with open(rawFile, 'wb') as file:
+        file.write(live[:end])
+    mag = magnicon_ccc(os.path.join(str(tmp_path), os.path.basename(bvdFile)), '', '')
+    assert mag.endDate == 'xx/xx/xx xx:xx:xx'
+    added = len(mag.rawData)
+    while end < len(live):
+        with open(rawFile, 'ab') as file:
+            file.write(live[end:end + 12345])
+        end += 12345
+        appended = mag.append_raw()
+        assert appended >= 0
+        added += appended
+    full = magnicon_ccc(bvdFile, '', '')
+    assert added == len(full.rawData)
+    for key in magnicon_ccc.mapped_arrays:
+        assert array_equal(getattr(mag, key), getattr(full, key))
+    # the run stops: the placeholders are replaced, the file keeps its length
+    with open(rawFile, 'wb') as file:
+        file.write(raw)
+    assert mag.append_raw() == -1
+    stopped = magnicon_ccc(mag.bvdFile, '', '')
+    assert stopped.endDate == full.endDate and stopped.append_raw() == 0
@@ -0,0 +1,66 @@
+import os, gc, shutil
+import pytest
+
+pytest.importorskip('win32file')
+psutil = pytest.importorskip('psutil')
+from glob import glob
+from multiprocessing import get_context
+from numpy import argmax
+from magnicon_ccc import magnicon_ccc, base_dir
+from bvd_stats import bvd_stat
+
+def long_run(folder: str, repeats: int) -> str:
+    """Copies a bundled run into folder with the whole cycles of its samples from the first rampdown on
+    repeated, returns the _bvd.txt file of the copy
+    """
+    bvdFile = sorted(glob(base_dir + os.sep + '*_CCC' + os.sep + '*_bvd.txt'))[0]
+    mag = magnicon_ccc(bvdFile, '', '')
+    start = int(argmax(mag.phase == 4))
+    length = (len(mag.phase) - start)//(2*mag.SHC)*2*mag.SHC
+    with open(mag.rawFile, 'rb') as file:
+        lines = file.read().splitlines(keepends=True)
+    first = lines.index(mag.dataTitles.encode('latin-1')) + 1
+    name = os.path.basename(mag.rawFile)
+    with open(os.path.join(folder, name), 'wb') as file:
+        file.write(b''.join(lines[:first]))
+        file.write(b''.join(lines[first + start:first + start + length])*repeats)
+    for i in (mag.bvdFile, mag.cfgFile):
+        shutil.copy(i, folder)
+    return os.path.join(folder, os.path.basename(mag.bvdFile))
+
+def parsed(bvdFile: str) -> tuple:
+    # the run parsed without the cache and processed by the loop engine, as before the arrays were mapped
+    mag = magnicon_ccc(bvdFile, '', '')
+    bvd_stat_obj = bvd_stat(bvdFile, mag.ignored_first, mag.ignored_last, mag, False)
+    bvd_stat_obj._process_thread_new()
+    return mag, bvd_stat_obj
+
+def mapped(bvdFile: str, cache_dir: str) -> tuple:
+    mag = magnicon_ccc(bvdFile, '', '', cache_dir)
+    return mag, bvd_stat(bvdFile, mag.ignored_first, mag.ignored_last, mag, False)
+
+def resident(function, *args) -> float:
+    """MB of resident memory held by the objects that function returns, including the pages of the memory
+    mapped files that were read
+    """
+    process = psutil.Process()
+    gc.collect()
+    before = process.memory_info().rss
+    held = function(*args)
+    gc.collect()
+    return (process.memory_info().rss - before)/2**20
+
+def measure(function, *args) -> float:
+    # every measurement starts from a new process
+    with get_context('spawn').Pool(1) as pool:
+        return pool.apply(resident, (function,) + args)
+
+def test_mapped_run_memory(tmp_path):
+    bvdFile = long_run(str(tmp_path), 300)
+    cache_dir = str(tmp_path / 'cache')
+    # the first load parses the run and fills the cache
+    samples = len(magnicon_ccc(bvdFile, '', '', cache_dir).rawData)
+    before = measure(parsed, bvdFile)
+    after = measure(mapped, bvdFile, cache_dir)
+    assert after < before/2, \
+        f'{samples} samples, resident memory parsed: {before:.1f} MB, memory mapped: {after:.1f} MB'
@@ -0,0 +1,71 @@
+import os, warnings
+import pytest
+from glob import glob
+from numpy import allclose, cumsum, full
+from numpy.random import default_rng
+import mystat
+
+# allantools estimators of the overlapping and variance arguments of mystat.deviation
+estimators = {(False, 'Allan'): 'adev', (True, 'Allan'): 'oadev', (False, 'Hadamard'): 'hdev', (True, 'Hadamard'): 'ohdev'}
+
+def assert_same_acf(data) -> None:
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        ref, res = mystat.autoCorrelationLagged(data), mystat.autoCorrelation(data)
+    for i, j in zip(ref[:4], res[:4]):
+        assert len(i) == len(j)
+        assert allclose(i, j, rtol=1e-9, atol=1e-12, equal_nan=True)
+    assert ref[4] == res[4]
+
+@pytest.mark.parametrize('n', [0, 1, 4, 7, 50, 51, 99, 256, 1001])
+def test_autocorrelation_random(n):
+    rng = default_rng(n)
+    assert_same_acf(list(rng.normal(size=n)))
+    # a random walk has a long correlation, most lags are outside of the confidence band
+    assert_same_acf(list(cumsum(rng.normal(size=n))))
+
+@pytest.mark.parametrize('n', [8, 51, 100])
+def test_autocorrelation_constant(n):
+    assert_same_acf(full(n, 1.5e-7))
+
+def test_autocorrelation_runs():
+    pytest.importorskip('win32file')
+    from magnicon_ccc import magnicon_ccc, base_dir
+    from bvd_stats import bvd_stat
+    runs = sorted(glob(base_dir + os.sep + '*_CCC' + os.sep + '*_bvd.txt'))
+    assert runs
+    for bvdFile in runs:
+        mag = magnicon_ccc(bvdFile, '', '')
+        bvd = bvd_stat(bvdFile, mag.ignored_first, mag.ignored_last, mag, False)
+        for data in (bvd.bvdList, bvd.A, bvd.B):
+            assert_same_acf(data)
+
+def assert_same_deviation(data, rate: float) -> None:
+    allantools = pytest.importorskip('allantools')
+    for (overlapping, variance), name in estimators.items():
+        for taus in ('octave', 'all'):
+            ref = getattr(allantools, name)(data, rate=rate, data_type='freq', taus=taus)
+            res = mystat.deviation(data, rate, overlapping, variance, taus)
+            assert all(len(i) == len(j) for i, j in zip(ref, res))
+            # same taus and number of differences, the deviations and their errors to rounding
+            assert (ref[0] == res[0]).all() and (ref[3] == res[3]).all()
+            assert allclose(res[1], ref[1], rtol=1e-10, atol=0) and allclose(res[2], ref[2], rtol=1e-10, atol=0)
+
+@pytest.mark.parametrize('n', [10, 33, 128, 1001])
+def test_deviation_random(n):
+    rng = default_rng(n)
+    assert_same_deviation(rng.normal(size=n), 0.25)
+    assert_same_deviation(cumsum(rng.normal(size=n)), 2.0)
+
+def test_deviation_runs():
+    pytest.importorskip('win32file')
+    from magnicon_ccc import magnicon_ccc, base_dir
+    from bvd_stats import bvd_stat
+    for bvdFile in sorted(glob(base_dir + os.sep + '*_CCC' + os.sep + '*_bvd.txt')):
+        mag = magnicon_ccc(bvdFile, '', '')
+        bvd = bvd_stat(bvdFile, mag.ignored_first, mag.ignored_last, mag, False)
+        if len(bvd.bvdList) < 10:
+            continue
+        # the rates of calc_allan
+        for data, rate in ((bvd.bvdList, 1./mag.fullCyc), (bvd.AA, mag.timeBase/mag.intTime), (bvd.A, 1./mag.dt)):
+            assert_same_deviation(data, rate)
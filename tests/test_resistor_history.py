@@ -0,0 +1,109 @@
+import pytest
+
+pytest.importorskip('win32file')
+from numpy import allclose, array, array_equal, isnan, polyfit, polyval, sqrt, nan
+from numpy.random import default_rng
+from ResDataBase import ResData
+from run_catalog import run_catalog
+from resistor_history import drift_fits, resistor_history, YEAR
+from test_ResDataBase import database
+
+def results(serials: dict, seed: int=0) -> tuple:
+    """Results (SN, timestamp, value, stdMean) of the serials, number of runs keyed by serial number, in
+    mixed order
+    """
+    rng = default_rng(seed)
+    SN, t, y, u = [], [], [], []
+    for ct, (name, n) in enumerate(serials.items()):
+        times = 1.6e9 + YEAR*rng.uniform(0, 4, n)
+        SN += [name]*n
+        t += list(times)
+        u += list(rng.uniform(0.005, 0.05, n))
+        y += list(ct + 0.01*(ct - 1)*times/YEAR + rng.normal(0, 0.03, n))
+    order = rng.permutation(len(SN))
+    return tuple(array(i, dtype=object if i is SN else float)[order] for i in (SN, t, y, u))
+
+def test_drift_fits_polyfit():
+    serials = {'1001': 12, '1002': 5, 'F058A': 3, 'GaAs 8': 40}
+    SN, t, y, u = results(serials)
+    fits = drift_fits(SN, t, y, u)
+    assert list(fits['SN']) == sorted(serials)
+    for i, name in enumerate(fits['SN']):
+        sel = SN == name
+        x = t[sel]/YEAR
+        assert fits['n'][i] == serials[name]
+        p, cov = polyfit(x, y[sel], 1, w=1/u[sel], cov='unscaled')
+        x0 = fits['t0'][i]/YEAR
+        assert allclose(fits['drift'][i], p[0], rtol=1e-9, atol=0)
+        assert allclose(fits['value'][i], polyval(p, x0), rtol=1e-9, atol=1e-12)
+        # the Birge ratio scales the uncertainties when it is above one
+        birge = sqrt((((y[sel] - polyval(p, x))/u[sel])**2).sum()/(serials[name] - 2))
+        assert allclose(fits['birge'][i], birge, rtol=1e-9, atol=0)
+        scale = max(birge, 1)
+        assert allclose(fits['u_drift'][i], scale*sqrt(cov[0, 0]), rtol=1e-9, atol=0)
+        # the uncertainty of the line at its weighted mean time
+        p0, cov0 = polyfit(x - x0, y[sel], 1, w=1/u[sel], cov='unscaled')
+        assert allclose(fits['u_value'][i], scale*sqrt(cov0[1, 1]), rtol=1e-9, atol=0)
+    assert 'dbDrift' not in fits
+
+def test_drift_fits_few_points():
+    SN = ['one', 'two', 'two', 'three', 'three', 'three', 'bad', 'bad']
+    t = array([1, 1, 2, 1, 2, 3, 1, 2])*YEAR
+    y = array([1.5, 1., 2., 1., 2., 3.5, 1., 2.])
+    u = array([0.1, 0.1, 0.1, 0.1, 0.1, 0.1, 0., nan])
+    fits = drift_fits(SN, t, y, u)
+    # the results without a positive stdMean are left out
+    assert list(fits['SN']) == ['one', 'three', 'two'] and list(fits['n']) == [1, 3, 2]
+    one, three, two = range(3)
+    # one result: its value, no drift
+    assert fits['value'][one] == 1.5 and allclose(fits['u_value'][one], 0.1)
+    assert isnan(fits['drift'][one]) and isnan(fits['u_drift'][one]) and isnan(fits['birge'][one])
+    # two results: the line through them, no Birge ratio and unscaled uncertainties
+    assert allclose(fits['drift'][two], 1.) and allclose(fits['value'][two], 1.5)
+    assert allclose(fits['u_drift'][two], 0.1*sqrt(2)) and isnan(fits['birge'][two])
+    assert not isnan(fits['birge'][three])
+
+def test_drift_fits_database(tmp_path):
+    R = ResData(database(str(tmp_path)))
+    known = [i for i in R.SN if i != ''][:2]
+    SN, t, y, u = results({known[0]: 6, known[1]: 4, 'unknown': 4})
+    fits = drift_fits(SN, t, y, u, R)
+    rows = [R.index[i] for i in known]
+    assert array_equal(fits['dbDrift'][:2], R.Drift[rows]) and isnan(fits['dbDrift'][2])
+    assert allclose(fits['dbValue'][:2], [R.predictedValueUnix(i, j) for i, j in zip(known, fits['t0'][:2])], \
+                    rtol=1e-12, atol=0)
+    assert allclose(fits['driftZ'][:2], (fits['drift'][:2] - R.Drift[rows])/fits['u_drift'][:2], rtol=1e-12, atol=0)
+    assert allclose(fits['valueZ'][:2], (fits['value'][:2] - fits['dbValue'][:2])/fits['u_value'][:2], \
+                    rtol=1e-12, atol=0)
+    assert isnan(fits['driftZ'][2]) and isnan(fits['valueZ'][2])
+
+def test_history_database_prediction(tmp_path):
+    R = ResData(database(str(tmp_path)))
+    standard = [i for i in R.SN if i != ''][0]
+    catalog = run_catalog(str(tmp_path / 'catalog.sqlite'))
+    history = resistor_history(catalog)
+    timestamps = [1.6e9, 1.65e9, 1.7e9]
+    # the standard of the last run is not in the database
+    standards = [standard, standard, 'unknown']
+    with catalog.db:
+        for ct, (timestamp, name) in enumerate(zip(timestamps, standards)):
+            bvdFile = f'run{ct}_bvd.txt'
+            catalog.db.execute('INSERT INTO runs (bvdFile, start) VALUES (?, ?)', (bvdFile, f'2024-01-0{ct + 1}'))
+            # the first run was analyzed with the current prediction of the standard, the second with one
+            # that is 0.5 ppm lower
+            pred = R.predictedValueUnix(name, timestamp) if name != 'unknown' else 0.
+            standardPred = pred - 0.5*(ct == 1)
+            catalog.db.execute('INSERT INTO history (bvdFile, SN, standard, timestamp, value, stdMean, N, standardPPM, ' + \
+                               'standardPred, corr) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', \
+                               (bvdFile, 'DUT', name, timestamp, 2.5, 0.02, 100, standardPred + 0.3, standardPred, 0.1))
+    kept = history.history()
+    rescaled = history.history(R=R)
+    assert array_equal(kept['value'], [2.5]*3) and array_equal(kept['stdMean'], [0.02]*3)
+    assert allclose(rescaled['value'][[0, 2]], 2.5, rtol=0, atol=1e-9)
+    assert allclose(rescaled['stdMean'][[0, 2]], 0.02, rtol=1e-12, atol=0)
+    # a 0.5 ppm higher standard raises the result by about 0.5 ppm
+    ppm = R.predictedValueUnix(standard, timestamps[1]) - 0.5 + 0.3
+    ratio = (1 + (ppm + 0.5)/1e6)/(1 + ppm/1e6)
+    assert allclose(rescaled['value'][1], (2.5 + 1e6 + 0.1)*ratio - 1e6 - 0.1, rtol=0, atol=1e-9)
+    assert allclose(rescaled['value'][1], 3.0, rtol=0, atol=1e-4)
+    catalog.close()
@@ -0,0 +1,75 @@
+import os, shutil
+import pytest
+
+pytest.importorskip('win32file')
+from glob import glob
+from magnicon_ccc import base_dir
+from run_catalog import run_catalog
+
+@pytest.fixture
+def archive(tmp_path):
+    """Copy of the bundled *_CCC folders and a catalog of it"""
+    root = tmp_path / 'archive'
+    for folder in glob(base_dir + os.sep + '*_CCC'):
+        shutil.copytree(folder, root / os.path.basename(folder))
+    catalog = run_catalog(str(tmp_path / 'catalog.sqlite'))
+    yield str(root), catalog
+    catalog.close()
+
+def names(rows) -> list:
+    return [row['name'] for row in rows]
+
+def test_scan_again(archive):
+    root, catalog = archive
+    runs = len(glob(os.path.join(root, '*_CCC', '*_bvd.txt')))
+    assert catalog.scan(root) == (runs, 0, runs)
+    # nothing changed
+    assert catalog.scan(root) == (0, 0, runs)
+    # a catalog opened again keeps its runs
+    assert run_catalog(catalog.path).scan(root) == (0, 0, runs)
+
+def test_scan_changed_and_removed(archive):
+    root, catalog = archive
+    total = catalog.scan(root)[2]
+    rawFile = os.path.join(root, '2024-05-07_CCC', '240507_001_1834.txt')
+    st = os.stat(rawFile)
+    os.utime(rawFile, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    assert catalog.scan(root) == (1, 0, total)
+    for i in glob(os.path.join(root, '2024-05-08_CCC', '240508_001_1100*')):
+        os.remove(i)
+    assert catalog.scan(root) == (0, 1, total - 1)
+    assert '240508_001_1100' not in names(catalog.find())
+    assert len(catalog.find()) == total - 1
+
+def test_scan_unlisted_folder(archive, monkeypatch):
+    # the runs of a folder that cannot be listed, like a share that is not available, are kept
+    root, catalog = archive
+    total = catalog.scan(root)[2]
+    unlisted = os.path.join(root, '2018-03-09_CCC')
+    scandir = os.scandir
+    def failing_scandir(path):
+        if path == unlisted:
+            raise PermissionError(path)
+        return scandir(path)
+    monkeypatch.setattr(os, 'scandir', failing_scandir)
+    assert catalog.scan(root) == (0, 0, total - 6)
+    assert len(catalog.find(folder=unlisted)) == 6
+    monkeypatch.undo()
+    shutil.rmtree(unlisted)
+    assert catalog.scan(root) == (0, 6, total - 6)
+
+def test_find(archive):
+    root, catalog = archive
+    catalog.scan(root)
+    rows = catalog.find(since='2018', until='2019')
+    assert names(rows) == ['180309_00' + str(i) + '_' + j for i, j in \
+                           zip(range(1, 7), ('1122', '1414', '1520', '1604', '1648', '1737'))]
+    assert all(row['points'] == 100 and row['stop'] > row['start'] for row in rows)
+    # R1 or R2, sorted by start time
+    assert names(catalog.find(resistor='1218')) == ['180309_001_1122', '180309_002_1414', '180309_003_1520']
+    assert names(catalog.find(resistor='1216', since='2018-03-09 16:30')) == ['180309_005_1648']
+    rows = catalog.find(resistor='F058A', folder=os.path.join(root, '2024-05-09_CCC'))
+    assert names(rows) == ['240509_001_0248', '240509_002_1540']
+    # the last run is still being measured
+    assert rows[-1]['stop'] is None and rows[-1]['points'] == 0
+    assert catalog.find(since='2025') == []
@@ -0,0 +1,62 @@
+import math
+import pytest
+import numpy as np
+import spectral
+
+@pytest.mark.parametrize('N,L,D', [(10, 10, 5), (10, 4, 2), (11, 4, 3), (10, 3, 0), (10, 1, 0), (7, 7, 0), (9, 2, 20)])
+def test_segments_of_segment_starts(N, L, D):
+    data = np.arange(N, dtype=float)
+    starts = spectral.get_segment_starts(N, L, D)
+    for K in (None, 1, 2):
+        segs = spectral.get_segments(data, L, D, K)
+        expected = starts if K is None else starts[:K]
+        assert segs.shape == (len(expected), L)
+        for row, ix in zip(segs, expected):
+            assert (row == data[ix:ix + L]).all()
+
+def mypsd_loop(ind1, dt, wintype, L, D):
+    # the segment by segment PSD that mypsd replaced
+    N = len(ind1)
+    if L == 0: L = N
+    if D == 0: D = L//2
+    window = spectral.calc_win(L, wintype)
+    wss = spectral.norm_win(window)
+    cum = []
+    for six in spectral.get_segment_starts(N, L, D):
+        myfft = np.fft.rfft(np.multiply(ind1[six:six + L], window))*(dt*math.sqrt(1.0/wss))
+        Gxx = np.power(np.abs(myfft), 2)/dt/L
+        Gxx[1:] = Gxx[1:]*2
+        cum.append(Gxx)
+    return np.mean(cum, axis=0)
+
+# a hann window of one sample divides by zero (calc_win)
+@pytest.mark.parametrize('L,D,wintype', [(L, D, wintype) for L, D in ((0, 0), (1, 0), (64, 0), (64, 16), (100, 100)) \
+                                         for wintype in (0, 1, 2) if (L, wintype) != (1, 2)])
+def test_mypsd_segments(L, D, wintype):
+    x = np.random.default_rng(L + D).normal(size=1000)
+    psd, f = spectral.mypsd(x, 0.5, wintype, L, D)
+    assert np.allclose(psd, mypsd_loop(x, 0.5, wintype, L, D), rtol=1e-12, atol=0)
+
+@pytest.mark.parametrize('L', [2**14, 4096])
+def test_mypsd_welch(L):
+    signal = pytest.importorskip('scipy.signal')
+    x = np.random.default_rng(0).normal(size=2**14)
+    psd, f = spectral.mypsd(x, 0.5, 2, L, L//2)
+    # the hann window of spectral is the symmetric one, mypsd also doubles the nyquist bin
+    ref = signal.welch(x, fs=2.0, window=signal.get_window('hann', L, fftbins=False), nperseg=L, noverlap=L//2, \
+                       detrend=False)
+    assert np.allclose(psd[:-1], ref[1][:-1]) and np.allclose(f, ref[0])
+
+@pytest.mark.parametrize('N,segments', [(2**12, 8), (1001, 4), (100, 2)])
+def test_mycoherence_scipy(N, segments):
+    signal = pytest.importorskip('scipy.signal')
+    rng = np.random.default_rng(N)
+    x = rng.normal(size=N)
+    y = x + rng.normal(size=N)
+    coh, f = spectral.mycoherence(x, y, 0.5, 2, segments)
+    # the segments start every M samples and are 2*M long, the mean of the whole series is removed
+    M = N//(segments + 1)
+    ref = signal.coherence((x - x.mean())[:(segments + 1)*M], (y - y.mean())[:(segments + 1)*M], fs=2.0, \
+                           window=signal.get_window('hann', 2*M, fftbins=False), nperseg=2*M, noverlap=M, detrend=False)
+    assert np.allclose(f, ref[0]) and np.allclose(coh[1:-1], ref[1][1:-1])
+    assert np.array_equal(coh, spectral.mycsdcoherence(x, y, 0.5, 2, segments)[1])